@@ -0,0 +1,237 @@
+"""
+EC - AI Cost Estimation System
+Image Analysis Module
+
+Concurrent OCR & OBJECT ANALYSIS over all images (or tiles) of one
+request. Images are analyzed under an asyncio semaphore, and the row
+sets are merged into one {columns, rows} result: duplicates from
+overlapping tiles or repeated uploads removed, rows in stable list_id
+order, and the result checked with utils.validate_ai_response().
+
+A model is any object with an analyze(data) method, coroutine or plain
+function, returning {'columns', 'rows'}; MockVisionModel stands in for
+the vision model locally.
+"""
+
+import asyncio
+import hashlib
+import inspect
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from compact import expand_rows
+from config import Config
+from metrics import metrics
+from utils import list_id_sort_key, normalize_text, validate_ai_response
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_COLUMNS = [
+    'list_id', 'Component', 'Description', 'W', 'L', 'H',
+    'Quantity', 'Unit', 'price_per_unit', 'total_cost', 'remark'
+]
+
+class MockVisionModel:
+    """
+    Deterministic local stand-in for the vision model.
+    
+    Every distinct image yields the same rows on every call, derived
+    from the hash of its bytes, after an optional simulated latency.
+    """
+    
+    def __init__(self, latency: float = 0.0, rows_per_image: int = 5,
+                 responses: Optional[Dict[bytes, Dict[str, Any]]] = None):
+        """
+        Args:
+            latency (float): Seconds each call sleeps
+            rows_per_image (int): Rows generated per image
+            responses (dict, optional): Fixed results keyed by image bytes
+        """
+        self.latency = latency
+        self.rows_per_image = rows_per_image
+        self.responses = responses or {}
+        self.calls = 0
+    
+    async def analyze(self, data: bytes) -> Dict[str, Any]:
+        """
+        Analyzes one image.
+        
+        Args:
+            data (bytes): Image content
+        
+        Returns:
+            dict: {'columns', 'rows'} with positional rows
+        """
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if data in self.responses:
+            return self.responses[data]
+        
+        rng = random.Random(hashlib.sha256(data).digest())
+        rows = []
+        for _ in range(self.rows_per_image):
+            type_code = rng.choice(list(Config.COMPONENT_TYPES))
+            component_code = rng.choice(list(Config.COMPONENT_CODES))
+            width = round(rng.uniform(0.5, 6), 2)
+            length = round(rng.uniform(0.5, 6), 2)
+            rows.append([
+                f'{type_code}-{component_code}-{rng.randint(1, 20):02d}',
+                Config.COMPONENT_CODES[component_code],
+                Config.COMPONENT_TYPES[type_code],
+                str(width), str(length), '-',
+                str(round(width * length, 2)), rng.choice(Config.VALID_UNITS),
+                '-', '-', 'Mock'
+            ])
+        return {'columns': list(ANALYSIS_COLUMNS), 'rows': rows}
+
+async def call_model(model, data: bytes) -> Dict[str, Any]:
+    """
+    Calls model.analyze(), running plain functions in a worker thread so
+    they do not block the event loop.
+    """
+    analyze = getattr(model, 'analyze', model)
+    if inspect.iscoroutinefunction(analyze):
+        return await analyze(data)
+    return await asyncio.to_thread(analyze, data)
+
+def merge_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merges per-image results into one table.
+    
+    Columns are the union in first-seen order. Rows (positional lists,
+    dicts or compact dictionary-coded rows) are aligned to them, missing
+    cells become '-', identical rows after text normalization are kept
+    once, and the rest are sorted by list_id; equal list_ids keep image
+    order.
+    
+    Args:
+        results (list): {'columns', 'rows'} results in image order
+    
+    Returns:
+        dict: 'columns', positional 'rows' and the 'duplicates' count
+    """
+    columns = []
+    for result in results:
+        for column in result['columns']:
+            if column not in columns:
+                columns.append(column)
+    
+    merged = []
+    seen = set()
+    duplicates = 0
+    for result in results:
+        source_columns = result['columns']
+        for row in expand_rows(source_columns, result['rows'], result.get('dictionaries')):
+            values = dict(zip(source_columns, row))
+            aligned = [values.get(column, '-') for column in columns]
+            key = tuple(normalize_text(value) for value in aligned)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            merged.append(aligned)
+    
+    if 'list_id' in columns:
+        position = columns.index('list_id')
+        merged.sort(key=lambda row: list_id_sort_key(row[position]))
+    
+    return {'columns': columns, 'rows': merged, 'duplicates': duplicates}
+
+async def analyze_images(images: List[Any], model, concurrency: Optional[int] = None,
+                         cache=None) -> Dict[str, Any]:
+    """
+    Analyzes images concurrently and merges the results.
+    
+    Args:
+        images (list): Image bytes, or preprocess_images() entries with 'data'
+        model: Vision model, see module docstring
+        concurrency (int, optional): Simultaneous model calls, defaults
+            to Config.VISION_CONCURRENCY
+        cache (ImageAnalysisCache, optional): Consulted before the model
+    
+    Returns:
+        dict: Result with success, merged 'columns' and 'rows',
+        'validation', per-image 'errors', 'failed' image count, 'partial'
+        (some images failed while others succeeded), cache 'hits',
+        'duplicates', 'elapsed' and message
+    """
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency or Config.VISION_CONCURRENCY)
+    hits = 0
+    
+    async def analyze_one(image):
+        nonlocal hits
+        data = image['data'] if isinstance(image, dict) else image
+        if cache is not None:
+            # Cache calls hash the upload: keep them off the event loop
+            cached, _ = await asyncio.to_thread(cache.get, data)
+            if cached is not None:
+                hits += 1
+                return cached
+        async with semaphore:
+            with metrics.span('analysis.image'):
+                result = await call_model(model, data)
+        if cache is not None:
+            try:
+                await asyncio.to_thread(cache.put, data, result)
+            except Exception as e:
+                # The model result is still good; only the cache entry is lost
+                logger.warning(f"Failed to cache image analysis: {e}")
+                metrics.increment('analysis.cache_failed')
+        return result
+    
+    outcomes = await asyncio.gather(*(analyze_one(image) for image in images), return_exceptions=True)
+    
+    results = []
+    errors = {}
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, BaseException):
+            errors[index] = str(outcome)
+            continue
+        check = validate_ai_response(outcome)
+        if not check['valid']:
+            errors[index] = '; '.join(check['errors'])
+            continue
+        results.append(outcome)
+    
+    merged = merge_results(results)
+    validation = validate_ai_response({'columns': merged['columns'], 'rows': merged['rows']})
+    metrics.increment('analysis.images', len(images))
+    metrics.increment('analysis.failed', len(errors))
+    
+    return {
+        'success': bool(results) and validation['valid'],
+        'columns': merged['columns'],
+        'rows': merged['rows'],
+        'validation': validation,
+        'errors': errors,
+        'failed': len(errors),
+        'partial': bool(results) and bool(errors),
+        'images': len(images),
+        'hits': hits,
+        'duplicates': merged['duplicates'],
+        'elapsed': time.perf_counter() - start,
+        'message': (
+            f"Analyzed {len(results)} of {len(images)} images into {len(merged['rows'])} rows"
+            + (f", {len(errors)} failed" if errors else "")
+        )
+    }
+
+def run_analysis(images: List[Any], model, concurrency: Optional[int] = None,
+                 cache=None) -> Dict[str, Any]:
+    """
+    Synchronous entry point for analyze_images().
+    
+    Args:
+        images (list): Image bytes or preprocess_images() entries
+        model: Vision model
+        concurrency (int, optional): Simultaneous model calls
+        cache (ImageAnalysisCache, optional): Consulted before the model
+    
+    Returns:
+        dict: See analyze_images()
+    """
+    return asyncio.run(analyze_images(images, model, concurrency, cache))
@@ -0,0 +1,270 @@
+"""
+EC - AI Cost Estimation System Benchmarks
+
+Measures the Excel generation path stage by stage on synthetic cost
+sheets and compares the results against a stored baseline.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --threshold 0.25
+"""
+
+import argparse
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import openpyxl
+
+from config import Config
+from excel import (
+    create_cost_sheet_template, process_ai_analyzed_data, insert_dynamic_data,
+    generate_cost_sheet
+)
+
+# Row counts benchmarked by default
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+
+# Allowed slowdown / memory growth before a stage counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Stages faster than this are too noisy to compare against a baseline
+MIN_COMPARABLE_SECONDS = 0.005
+
+COLUMNS = [
+    'list_id', 'Component', 'Description', 'W', 'L', 'H',
+    'Quantity', 'Unit', 'price_per_unit', 'total_cost', 'remark'
+]
+
+def build_synthetic_rows(count, seed=0):
+    """
+    Builds deterministic sample rows from the configured categories.
+    
+    Args:
+        count (int): Number of rows
+        seed (int): Random seed
+    
+    Returns:
+        list: Positional rows matching COLUMNS
+    """
+    rng = random.Random(seed)
+    type_codes = list(Config.COMPONENT_TYPES)
+    component_codes = list(Config.COMPONENT_CODES)
+    rows = []
+    
+    for i in range(count):
+        type_code = rng.choice(type_codes)
+        component_code = rng.choice(component_codes)
+        width = round(rng.uniform(0.5, 12), 2)
+        length = round(rng.uniform(0.5, 12), 2)
+        height = rng.choice(['-', str(round(rng.uniform(0.1, 4), 2))])
+        quantity = round(width * length, 2)
+        price = round(rng.uniform(50, 2000), 2)
+        rows.append([
+            f'{type_code}-{component_code}-{i % 100:02d}',
+            Config.COMPONENT_CODES[component_code],
+            f'{Config.COMPONENT_TYPES[type_code]} item {i}',
+            str(width), str(length), height,
+            str(quantity), rng.choice(Config.VALID_UNITS),
+            f'{price:.2f}', f'{quantity * price:.2f}', 'Synthetic'
+        ])
+    
+    return rows
+
+def measure(func, repeat=1):
+    """
+    Runs a stage for wall time, then once more under tracemalloc.
+    
+    Args:
+        func (callable): Stage to run; must be repeatable
+        repeat (int): Timed runs, the fastest one is kept
+    
+    Returns:
+        tuple: (result of the last run, seconds, peak bytes)
+    """
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds = min(seconds, time.perf_counter() - start)
+    
+    tracemalloc.start()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    
+    return result, seconds, peak
+
+def benchmark_size(count, repeat=1):
+    """
+    Benchmarks every stage of the Excel path for one data size.
+    
+    Args:
+        count (int): Number of rows
+        repeat (int): Timed runs per stage
+    
+    Returns:
+        dict: Stage name -> {'seconds', 'peak_bytes'[, 'output_bytes']}
+    """
+    rows = build_synthetic_rows(count)
+    stages = {}
+    
+    wb, seconds, peak = measure(create_cost_sheet_template, repeat)
+    stages['template'] = {'seconds': seconds, 'peak_bytes': peak}
+    
+    table, seconds, peak = measure(lambda: process_ai_analyzed_data(COLUMNS, rows), repeat)
+    stages['process'] = {'seconds': seconds, 'peak_bytes': peak}
+    
+    def insert():
+        wb = create_cost_sheet_template()
+        insert_dynamic_data(wb.active, table)
+        return wb
+    
+    # Template build time is included, it is small next to insertion
+    wb, seconds, peak = measure(insert, repeat)
+    stages['insert'] = {'seconds': seconds, 'peak_bytes': peak}
+    
+    def save():
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer.getbuffer().nbytes
+    
+    size, seconds, peak = measure(save, repeat)
+    stages['save'] = {'seconds': seconds, 'peak_bytes': peak, 'output_bytes': size}
+    
+    result, seconds, peak = measure(
+        lambda: generate_cost_sheet(COLUMNS, rows, streaming=True, output='bytes'), repeat
+    )
+    stages['streaming'] = {
+        'seconds': seconds, 'peak_bytes': peak, 'output_bytes': len(result['content'])
+    }
+    
+    return stages
+
+def run_benchmarks(sizes, repeat=1):
+    """
+    Benchmarks all requested data sizes.
+    
+    Args:
+        sizes (list): Row counts
+        repeat (int): Timed runs per stage
+    
+    Returns:
+        dict: Run metadata and per-size stage results
+    """
+    results = {}
+    for count in sizes:
+        print(f"Benchmarking {count} rows...", file=sys.stderr)
+        results[str(count)] = benchmark_size(count, repeat)
+    
+    return {
+        'meta': {
+            'system': Config.SYSTEM_NAME,
+            'version': Config.VERSION,
+            'python': platform.python_version(),
+            'openpyxl': openpyxl.__version__,
+            'timestamp': datetime.now().isoformat(),
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+def compare_to_baseline(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Lists stages that got slower or hungrier than the baseline allows.
+    
+    Args:
+        current (dict): Output of run_benchmarks()
+        baseline (dict): Stored output of an earlier run
+        threshold (float): Allowed relative growth, e.g. 0.25 for 25%
+    
+    Returns:
+        list: Human-readable regression descriptions
+    """
+    regressions = []
+    
+    for size, stages in current['results'].items():
+        for stage, metrics in stages.items():
+            reference = baseline.get('results', {}).get(size, {}).get(stage)
+            if not reference:
+                continue
+            
+            for metric in ('seconds', 'peak_bytes', 'output_bytes'):
+                if metric not in metrics or metric not in reference:
+                    continue
+                if metric == 'seconds' and reference[metric] < MIN_COMPARABLE_SECONDS:
+                    continue
+                limit = reference[metric] * (1 + threshold)
+                if metrics[metric] > limit:
+                    regressions.append(
+                        f"{size} rows / {stage} / {metric}: "
+                        f"{metrics[metric]:.6g} > {reference[metric]:.6g} (+{threshold:.0%})"
+                    )
+    
+    return regressions
+
+def print_report(report):
+    """
+    Prints a table of the benchmark results.
+    
+    Args:
+        report (dict): Output of run_benchmarks()
+    """
+    print(f"{'rows':>8} {'stage':<10} {'seconds':>10} {'peak MB':>10} {'output KB':>10}")
+    for size, stages in report['results'].items():
+        for stage, metrics in stages.items():
+            output = metrics.get('output_bytes')
+            output = f"{output / 1024:.1f}" if output is not None else '-'
+            print(f"{size:>8} {stage:<10} {metrics['seconds']:>10.4f} "
+                  f"{metrics['peak_bytes'] / 1024 / 1024:>10.2f} {output:>10}")
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    
+    Args:
+        argv (list, optional): Arguments, defaults to sys.argv
+    
+    Returns:
+        int: Exit code, 1 when a regression was found
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the cost-sheet Excel path")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="row counts to benchmark")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="timed runs per stage, the fastest is kept")
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--baseline', help="compare against this JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative regression (default: 0.25)")
+    args = parser.parse_args(argv)
+    
+    report = run_benchmarks(args.sizes, args.repeat)
+    print_report(report)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against baseline")
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+EC - AI Cost Estimation System
+Cache Module
+
+Bounded in-process cache with LRU eviction and TTL expiry, plus a
+wrapper that puts it in front of any price matcher. Defaults come from
+Config.CACHE_TTL and Config.CACHE_MAX_ENTRIES.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from config import Config
+from metrics import metrics
+from pricing import PriceEntry, price_rows
+from utils import normalize_text
+
+# Marks a missing key, so None can be cached
+_MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire ttl seconds after they
+    were stored.
+    
+    Counters ('hits', 'misses', 'evictions', 'expirations') are kept on
+    the instance for sizing and are also sent to the metrics module as
+    'cache.<counter>' with a 'cache' label.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 name: str = 'default', clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_entries (int, optional): Capacity, defaults to Config.CACHE_MAX_ENTRIES
+            ttl (float, optional): Lifetime in seconds, defaults to
+                Config.CACHE_TTL; 0 or less disables expiry
+            name (str): Label used in metrics
+            clock (callable): Monotonic time source
+        """
+        self.max_entries = max_entries if max_entries is not None else Config.CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else Config.CACHE_TTL
+        self.name = name
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns a cached value and marks it recently used.
+        
+        Args:
+            key (hashable): Cache key
+            default (any): Returned when the key is missing or expired
+        
+        Returns:
+            any: Cached value or default
+        """
+        value = self._get(key)
+        return default if value is _MISSING else value
+    
+    def _get(self, key: Hashable) -> Any:
+        counter = 'misses'
+        expired = False
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                value = _MISSING
+                self.misses += 1
+            elif item[1] is not None and item[1] <= self.clock():
+                del self._data[key]
+                value = _MISSING
+                self.misses += 1
+                self.expirations += 1
+                expired = True
+            else:
+                self._data.move_to_end(key)
+                value = item[0]
+                self.hits += 1
+                counter = 'hits'
+        metrics.increment(f'cache.{counter}', cache=self.name)
+        if expired:
+            metrics.increment('cache.expirations', cache=self.name)
+        return value
+    
+    def set(self, key: Hashable, value: Any):
+        """
+        Stores a value, evicting the least recently used entries when
+        the cache is full.
+        
+        Args:
+            key (hashable): Cache key
+            value (any): Value to store, None included
+        """
+        expires = self.clock() + self.ttl if self.ttl and self.ttl > 0 else None
+        evicted = 0
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > max(self.max_entries, 0):
+                self._data.popitem(last=False)
+                evicted += 1
+            self.evictions += evicted
+        if evicted:
+            metrics.increment('cache.evictions', evicted, cache=self.name)
+    
+    def get_or_set(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value, computing and storing it on a miss.
+        
+        compute() runs outside the lock, so concurrent misses on one key
+        may both compute it; the last result wins.
+        
+        Args:
+            key (hashable): Cache key
+            compute (callable): Produces the value
+        
+        Returns:
+            any: Cached or computed value
+        """
+        value = self._get(key)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+    
+    def keys(self) -> List[Hashable]:
+        """
+        Returns the unexpired keys, least recently used first, without
+        counting lookups or changing the LRU order.
+        
+        Returns:
+            list: Snapshot of the keys
+        """
+        now = self.clock()
+        with self._lock:
+            return [key for key, (_, expires) in self._data.items() if expires is None or expires > now]
+    
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Drops one key.
+        
+        Args:
+            key (hashable): Cache key
+        
+        Returns:
+            bool: True if the key was cached
+        """
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+    
+    def clear(self):
+        """
+        Drops every entry; counters are kept.
+        """
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the cache counters.
+        
+        Returns:
+            dict: size, capacity, ttl, hits, misses, evictions,
+            expirations and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+class CachedMatcher:
+    """
+    Caches the results of any price matcher exposing
+    lookup(list_id, component, description, unit), such as PriceTable,
+    MappedPriceTable or PriceSnapshot, or of a PriceSource.
+    
+    Keys are the normalized (list_id, component, description, unit) plus
+    the price-list version, so rows differing only in case, width or
+    punctuation share an entry, and a PriceSource reload never serves
+    prices cached from the previous snapshot.
+    """
+    
+    def __init__(self, matcher, cache: Optional[TTLCache] = None):
+        """
+        Args:
+            matcher: Price matcher to wrap, or a PriceSource whose current
+                snapshot is used for every lookup
+            cache (TTLCache, optional): Cache to use, a new one from Config by default
+        """
+        self.matcher = matcher
+        self.cache = cache if cache is not None else TTLCache(name='pricing')
+    
+    @staticmethod
+    def cache_key(list_id: Any, component: Any, description: Any, unit: Any = None,
+                  version: Optional[str] = None) -> Tuple[str, str, str, str, str]:
+        """
+        Builds the normalized cache key of a row.
+        
+        Args:
+            list_id (any): Item code
+            component (any): Component or work type
+            description (any): Item description
+            unit (any, optional): Unit of measurement
+            version (str, optional): Price-list version the row is priced with
+        
+        Returns:
+            tuple: Normalized key
+        """
+        return (
+            str(list_id).strip() if list_id else '',
+            normalize_text(component),
+            normalize_text(description),
+            normalize_text(unit),
+            version or ''
+        )
+    
+    def lookup(self, list_id: Any, component: Any, description: Any,
+               unit: Any = None) -> Tuple[Optional[PriceEntry], Optional[str]]:
+        """
+        Resolves one row through the cache, see PriceTable.lookup().
+        
+        Args:
+            list_id (any): Item code
+            component (any): Component or work type
+            description (any): Item description
+            unit (any, optional): Unit of measurement
+        
+        Returns:
+            tuple: (entry or None, 'list_id' / 'description' or None)
+        """
+        # Resolve the snapshot once, so the key and the lookup agree
+        matcher = self.matcher.current() if hasattr(self.matcher, 'current') else self.matcher
+        key = self.cache_key(list_id, component, description, unit, getattr(matcher, 'version', None))
+        return self.cache.get_or_set(
+            key, lambda: matcher.lookup(list_id, component, description, unit)
+        )
+    
+    def price_rows(self, columns: List[str], rows: List[List[Any]]) -> Dict[str, Any]:
+        """
+        Fills price_per_unit and total_cost, see PriceTable.price_rows().
+        
+        Args:
+            columns (list): Column headers from AI analysis
+            rows (list): Positional data rows
+        
+        Returns:
+            dict: Priced rows and match statistics
+        """
+        return price_rows(self, columns, rows)
@@ -0,0 +1,226 @@
+"""
+EC - AI Cost Estimation System
+Category Pricing Module
+
+Prices a cost sheet per component category instead of in one call.
+Rows are partitioned by the type code of their list_id
+(Config.COMPONENT_TYPES), every partition is priced against only its
+slice of the price list with hybrid_price_rows(), partitions run
+concurrently under Config.PRICING_CONCURRENCY, and the priced rows are
+merged back in list_id order.
+
+Rows without a known type code form the 'other' partition, priced
+against the whole list.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from hybrid_pricing import hybrid_price_rows
+from metrics import metrics
+from price_index import PriceIndex, get_price_index
+from pricing import PriceTable
+from utils import OTHER_SECTION, line_sections, list_id_sort_key, parse_list_id
+
+# Price-list slices keyed by table source, with the table they were cut from
+_slice_cache = {}
+
+class PriceSlice:
+    """
+    One category's part of the price list with its search index.
+    """
+    
+    def __init__(self, table, index: Optional[PriceIndex] = None):
+        """
+        Args:
+            table: PriceTable (or MappedPriceTable) of the category
+            index (PriceIndex, optional): Index over table, built when omitted
+        """
+        self.table = table
+        self.index = index if index is not None else PriceIndex.from_price_table(table)
+
+def slice_price_list(table, index: Optional[PriceIndex] = None) -> Dict[str, PriceSlice]:
+    """
+    Cuts a price list into one slice per type code. Entries without a
+    valid list_id are only in the OTHER_SECTION slice, which is the
+    whole table itself with its shared index (get_price_index()).
+    
+    Args:
+        table: PriceTable or MappedPriceTable
+        index (PriceIndex, optional): Index over the whole table
+    
+    Returns:
+        dict: Type code or OTHER_SECTION -> PriceSlice
+    """
+    # MappedPriceTable decodes its entries on every access
+    entries = table.entries
+    groups: Dict[str, list] = {}
+    for entry in entries:
+        type_code = parse_list_id(entry.list_id).get('type_code') if entry.list_id else None
+        if type_code in Config.COMPONENT_TYPES:
+            groups.setdefault(type_code, []).append(entry)
+    
+    source = getattr(table, 'source', None) or getattr(table, 'path', None)
+    slices = {
+        code: PriceSlice(PriceTable(entries, source=f'{source}#{code}'))
+        for code, entries in groups.items()
+    }
+    slices[OTHER_SECTION] = PriceSlice(table, index if index is not None else get_price_index(table, entries))
+    return slices
+
+def get_price_slices(table, index: Optional[PriceIndex] = None) -> Dict[str, PriceSlice]:
+    """
+    Returns the slices of a price list, cut once per loaded table.
+    
+    Args:
+        table: PriceTable or MappedPriceTable
+        index (PriceIndex, optional): Index over the whole table
+    
+    Returns:
+        dict: See slice_price_list()
+    """
+    key = getattr(table, 'source', None) or getattr(table, 'path', None) or id(table)
+    cached = _slice_cache.get(key)
+    if cached is None or cached[0] is not table:
+        cached = (table, slice_price_list(table, index))
+        _slice_cache[key] = cached
+    return cached[1]
+
+def partition_rows(columns: List[str], rows: List[List[Any]]) -> Dict[str, List[int]]:
+    """
+    Groups row indexes by the type code of their list_id.
+    
+    Args:
+        columns (list): Column headers
+        rows (list): Positional rows
+    
+    Returns:
+        dict: Type code or OTHER_SECTION -> row indexes, in
+        COMPONENT_TYPES order
+    """
+    position = columns.index('list_id') if 'list_id' in columns else None
+    list_ids = [row[position] if position is not None and position < len(row) else '' for row in rows]
+    partitions: Dict[str, List[int]] = {}
+    for i, section in enumerate(line_sections(list_ids)):
+        partitions.setdefault(section, []).append(i)
+    order = list(Config.COMPONENT_TYPES) + [OTHER_SECTION]
+    return {key: partitions[key] for key in order if key in partitions}
+
+async def price_categories(columns: List[str], rows: List[List[Any]], table, model=None,
+                           concurrency: Optional[int] = None,
+                           settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Prices every category partition concurrently and merges the rows.
+    
+    Args:
+        columns (list): Column headers from AI analysis
+        rows (list): Positional data rows
+        table: PriceTable or MappedPriceTable with the whole price list
+        model (optional): Pricing model, see hybrid_price_rows()
+        concurrency (int, optional): Partitions priced at once, defaults
+            to Config.PRICING_CONCURRENCY
+        settings (dict, optional): Overrides for Config.HYBRID_PRICING
+    
+    Returns:
+        dict: Result with success, merged 'columns' and 'rows' in list_id
+        order, 'sources' and original row index ('order') per merged row,
+        per-partition 'partitions' reports (rows, price entries, split,
+        tokens, timings, elapsed, prompt), partition 'errors', the
+        summed 'split' and 'tokens', 'elapsed' and message
+    """
+    start = time.perf_counter()
+    slices = get_price_slices(table)
+    partitions = partition_rows(columns, rows)
+    semaphore = asyncio.Semaphore(concurrency or Config.PRICING_CONCURRENCY)
+    
+    async def price_partition(key, indexes):
+        part = slices.get(key, slices[OTHER_SECTION])
+        async with semaphore:
+            with metrics.span('pricing.partition', category=key):
+                return await asyncio.to_thread(
+                    hybrid_price_rows, columns, [rows[i] for i in indexes],
+                    part.table, part.index, model, settings
+                )
+    
+    keys = list(partitions)
+    outcomes = await asyncio.gather(
+        *(price_partition(key, partitions[key]) for key in keys), return_exceptions=True
+    )
+    
+    # Same layout price_rows() gives every partition
+    merged_columns = list(columns) + [
+        name for name in ('price_per_unit', 'total_cost') if name not in columns
+    ]
+    merged = []
+    reports = {}
+    errors = {}
+    split: Dict[str, int] = {}
+    tokens = {'prompt': 0, 'full': 0, 'avoided': 0}
+    for key, outcome in zip(keys, outcomes):
+        indexes = partitions[key]
+        if isinstance(outcome, BaseException):
+            # Keep the partition's rows, unpriced
+            errors[key] = str(outcome)
+            reports[key] = {'rows': len(indexes), 'error': str(outcome)}
+            for i in indexes:
+                row = list(rows[i])
+                merged.append((i, row + ['-'] * (len(merged_columns) - len(row)), None))
+            continue
+        if not outcome['success']:
+            errors[key] = outcome['error']
+        for i, row, source in zip(indexes, outcome['rows'], outcome['sources']):
+            merged.append((i, row, source))
+        for name, count in outcome['split'].items():
+            split[name] = split.get(name, 0) + count
+        for name in tokens:
+            tokens[name] += outcome['tokens'][name]
+        reports[key] = {
+            'rows': len(indexes),
+            'price_entries': len(slices.get(key, slices[OTHER_SECTION]).table),
+            'split': outcome['split'],
+            'tokens': outcome['tokens'],
+            'timings': outcome['timings'],
+            'elapsed': outcome['elapsed'],
+            'prompt': outcome['prompt']
+        }
+    
+    # Stable: rows sharing a list_id keep their sheet order
+    position = merged_columns.index('list_id') if 'list_id' in merged_columns else None
+    merged.sort(key=lambda item: (
+        list_id_sort_key(item[1][position]) if position is not None else (1,), item[0]
+    ))
+    
+    return {
+        'success': not errors,
+        'columns': merged_columns,
+        'rows': [row for _, row, _ in merged],
+        'sources': [source for _, _, source in merged],
+        'order': [i for i, _, _ in merged],
+        'partitions': reports,
+        'errors': errors,
+        'split': split,
+        'tokens': tokens,
+        'elapsed': time.perf_counter() - start,
+        'message': f"Priced {len(merged)} rows in {len(keys)} category partitions"
+    }
+
+def run_category_pricing(columns: List[str], rows: List[List[Any]], table, model=None,
+                         concurrency: Optional[int] = None,
+                         settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Synchronous entry point for price_categories().
+    
+    Args:
+        columns (list): Column headers from AI analysis
+        rows (list): Positional data rows
+        table: PriceTable or MappedPriceTable with the whole price list
+        model (optional): Pricing model, see hybrid_price_rows()
+        concurrency (int, optional): Partitions priced at once
+        settings (dict, optional): Overrides for Config.HYBRID_PRICING
+    
+    Returns:
+        dict: See price_categories()
+    """
+    return asyncio.run(price_categories(columns, rows, table, model, concurrency, settings))
@@ -0,0 +1,288 @@
+"""
+EC - AI Cost Estimation System
+Compact Response Module
+
+Compact AI output contract. Column names are sent once, rows are
+positional arrays, and repetitive text columns (Component, Unit) may be
+dictionary-coded: the response lists their distinct values once and
+rows carry the index instead of the text. Every cell of a coded column
+must be a valid index, or '-' for a missing cell; a streamed response
+must send 'dictionaries' before 'rows'.
+
+    {
+        "columns": ["list_id", "Component", "Description", ...],
+        "dictionaries": {"Component": ["Flooring", "Structure"], "Unit": ["sqm"]},
+        "rows": [["100-01-01", 0, "Carpet flooring", ...]]
+    }
+
+validate_ai_response() and generate_cost_sheet() accept this shape
+directly. Run this module to measure the savings against the verbose
+row-object shape.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Columns dictionary-coded by default
+DICTIONARY_COLUMNS = ('Component', 'Unit')
+
+# Rough BPE-style tokenization: short letter runs, up to three digits, or
+# any other non-space character (punctuation, Thai) per token
+_TOKEN = re.compile(r'[A-Za-z]{1,6}|\d{1,3}|\S')
+
+def is_code(value: Any, dictionary: Sequence[Any]) -> bool:
+    """True when value is a valid index into dictionary."""
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < len(dictionary)
+
+def code_error(value: Any, dictionary: Sequence[Any]) -> Optional[str]:
+    """
+    Describes why a cell of a dictionary-coded column is not a valid
+    code; '-' marks a missing cell and is accepted.
+    
+    Args:
+        value (any): Cell value
+        dictionary (sequence): Distinct values of the column
+    
+    Returns:
+        str: Error message, None when valid
+    """
+    if value == '-' or is_code(value, dictionary):
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"Code {value} is out of range for {len(dictionary)} values"
+    return f"Code {value!r} is not an integer"
+
+def row_code_errors(columns: List[str], row: Any,
+                    dictionaries: Optional[Dict[str, Sequence[Any]]]) -> List[Tuple[str, str]]:
+    """
+    Checks the dictionary-coded cells of one row.
+    
+    Args:
+        columns (list): Column headers
+        row (list or dict): Positional row or row object
+        dictionaries (dict, optional): Column -> distinct values
+    
+    Returns:
+        list: (column, message) for every invalid code
+    """
+    errors = []
+    for i, column in enumerate(columns):
+        if not dictionaries or not isinstance(dictionaries.get(column), list):
+            continue
+        if isinstance(row, dict):
+            if column not in row:
+                continue
+            value = row[column]
+        elif i < len(row):
+            value = row[i]
+        else:
+            continue
+        message = code_error(value, dictionaries[column])
+        if message:
+            errors.append((column, message))
+    return errors
+
+def decode_values(values: List[Any], dictionary: Sequence[Any]) -> List[Any]:
+    """
+    Replaces dictionary codes in one column by their values; '-' cells
+    are kept.
+    
+    Args:
+        values (list): Column values
+        dictionary (sequence): Distinct values of the column
+    
+    Returns:
+        list: Decoded values
+    
+    Raises:
+        ValueError: If a value is not a valid code
+    """
+    decoded = []
+    for value in values:
+        message = code_error(value, dictionary)
+        if message:
+            raise ValueError(message)
+        decoded.append(value if value == '-' else dictionary[value])
+    return decoded
+
+def expand_rows(columns: List[str], rows: List[Any],
+                dictionaries: Optional[Dict[str, Sequence[Any]]] = None) -> List[List[Any]]:
+    """
+    Converts rows of either shape into plain positional rows.
+    
+    Args:
+        columns (list): Column headers
+        rows (list): Positional rows or row objects
+        dictionaries (dict, optional): Column -> distinct values
+    
+    Returns:
+        list: Positional rows with dictionary codes decoded
+    
+    Raises:
+        ValueError: If a coded cell is not a valid code, see
+            dictionary_errors()
+    """
+    coded = [
+        (i, column, dictionaries[column]) for i, column in enumerate(columns)
+        if dictionaries and column in dictionaries
+    ]
+    expanded = []
+    for index, row in enumerate(rows):
+        if isinstance(row, dict):
+            row = [row.get(column, '-') for column in columns]
+        elif coded:
+            row = list(row)
+        for i, column, dictionary in coded:
+            if i >= len(row):
+                continue
+            message = code_error(row[i], dictionary)
+            if message:
+                raise ValueError(f"Row {index}, {column}: {message}")
+            if row[i] != '-':
+                row[i] = dictionary[row[i]]
+        expanded.append(row)
+    return expanded
+
+def expand_response(response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts a response of either shape into {'columns', 'rows'} with
+    plain positional rows.
+    
+    Args:
+        response (dict): AI response
+    
+    Returns:
+        dict: Expanded response
+    """
+    return {
+        'columns': response['columns'],
+        'rows': expand_rows(response['columns'], response['rows'], response.get('dictionaries'))
+    }
+
+def compact_response(response: Dict[str, Any],
+                     dictionary_columns: Sequence[str] = DICTIONARY_COLUMNS) -> Dict[str, Any]:
+    """
+    Encodes a response in the compact shape, e.g. for prompt examples.
+    
+    Args:
+        response (dict): AI response of either shape
+        dictionary_columns (sequence): Columns to dictionary-code
+    
+    Returns:
+        dict: Compact response
+    """
+    columns = response['columns']
+    rows = [list(row) for row in expand_rows(columns, response['rows'], response.get('dictionaries'))]
+    dictionaries = {}
+    for column in dictionary_columns:
+        if column not in columns:
+            continue
+        i = columns.index(column)
+        values = list(dict.fromkeys(row[i] for row in rows if i < len(row)))
+        codes = {value: code for code, value in enumerate(values)}
+        for row in rows:
+            if i < len(row):
+                row[i] = codes[row[i]]
+        dictionaries[column] = values
+    
+    # Dictionaries before rows, so streamed rows can be decoded on arrival
+    compact = {'columns': columns}
+    if dictionaries:
+        compact['dictionaries'] = dictionaries
+    compact['rows'] = rows
+    return compact
+
+def dictionary_errors(response: Dict[str, Any]) -> List[str]:
+    """
+    Checks the 'dictionaries' of a compact response and every coded
+    cell of its rows: a code must be an integer index into its
+    dictionary.
+    
+    Args:
+        response (dict): AI response
+    
+    Returns:
+        list: Error messages, empty when valid or absent
+    """
+    dictionaries = response.get('dictionaries')
+    if dictionaries is None:
+        return []
+    if not isinstance(dictionaries, dict):
+        return ["Dictionaries must be a dictionary"]
+    
+    errors = []
+    columns = response.get('columns') if isinstance(response.get('columns'), list) else []
+    for column, values in dictionaries.items():
+        if column not in columns:
+            errors.append(f"Dictionary for unknown column: {column}")
+        elif not isinstance(values, list):
+            errors.append(f"Dictionary for {column} must be a list")
+    
+    rows = response.get('rows')
+    if isinstance(rows, list):
+        for index, row in enumerate(rows):
+            if isinstance(row, (dict, list)):
+                errors.extend(
+                    f"Row {index}, {column}: {message}"
+                    for column, message in row_code_errors(columns, row, dictionaries)
+                )
+    return errors
+
+def estimate_json_tokens(text: str) -> int:
+    """
+    Estimates the model tokens of JSON text. Used to compare response
+    shapes, not to bill requests.
+    
+    Args:
+        text (str): Serialized response
+    
+    Returns:
+        int: Estimated tokens
+    """
+    return len(_TOKEN.findall(text))
+
+def response_size(response: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Measures a response as the model would emit it (compact JSON, UTF-8).
+    
+    Args:
+        response (dict): AI response
+    
+    Returns:
+        dict: 'bytes' and estimated 'tokens'
+    """
+    text = json.dumps(response, ensure_ascii=False, separators=(',', ':'))
+    return {'bytes': len(text.encode('utf-8')), 'tokens': estimate_json_tokens(text)}
+
+def measure_savings(columns: List[str], rows: List[List[Any]],
+                    dictionary_columns: Sequence[str] = DICTIONARY_COLUMNS) -> Dict[str, Any]:
+    """
+    Compares the verbose row-object shape with the compact shape.
+    
+    Args:
+        columns (list): Column headers
+        rows (list): Positional rows
+        dictionary_columns (sequence): Columns to dictionary-code
+    
+    Returns:
+        dict: Sizes of both shapes and the relative byte and token savings
+    """
+    verbose = response_size({'columns': columns, 'rows': [dict(zip(columns, row)) for row in rows]})
+    compact = response_size(compact_response({'columns': columns, 'rows': rows}, dictionary_columns))
+    return {
+        'rows': len(rows),
+        'verbose': verbose,
+        'compact': compact,
+        'bytes_saved': 1 - compact['bytes'] / verbose['bytes'],
+        'tokens_saved': 1 - compact['tokens'] / verbose['tokens']
+    }
+
+if __name__ == "__main__":
+    from benchmark import COLUMNS, build_synthetic_rows
+    
+    for count in (10, 50, 200):
+        report = measure_savings(COLUMNS, build_synthetic_rows(count))
+        print(f"{count:>4} rows: {report['verbose']['bytes']:>7} -> {report['compact']['bytes']:>7} bytes "
+              f"({report['bytes_saved']:.0%} saved), {report['verbose']['tokens']:>6} -> "
+              f"{report['compact']['tokens']:>6} tokens ({report['tokens_saved']:.0%} saved)")
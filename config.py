@@ -20,6 +20,9 @@ class Config:
     VISION_DETAIL = "high"
     TEMPERATURE = 1.0
     
+    # Simultaneous vision model calls per request
+    VISION_CONCURRENCY = int(os.environ.get('VISION_CONCURRENCY', 4))
+    
     # Excel Template Configuration
     EXCEL_TEMPLATE = {
         'title': 'Cost Sheet',
@@ -51,6 +54,69 @@ class Config:
     # Dimension Configuration
     DIMENSIONS = ['W', 'L', 'H']
     
+    # Columns holding numbers (dimensions, quantities and prices)
+    NUMERIC_COLUMNS = ['W', 'L', 'H', 'Quantity', 'price_per_unit', 'total_cost']
+    
+    # Price Database Configuration (same CSV as the Knowledge Retrieval node)
+    PRICE_DATABASE = {
+        'path': 'Price-ncc-doc.csv',
+        'binary_path': 'Price-ncc-doc.bin',
+        'encoding': 'utf-8-sig',
+        'reload_interval': 30  # seconds between file change checks
+    }
+    
+    # Hybrid pricing: index matches priced locally need this BM25
+    # confidence and lead over the runner-up; the rest go to the model
+    # with prompt_candidates candidates each
+    HYBRID_PRICING = {
+        'confidence_threshold': 0.6,  # exact text scores 1.0, see PriceIndex.search()
+        'min_margin': 0.1,
+        'prompt_candidates': 3,
+        'report_baseline': False  # build the every-row prompt for tokens['full'] instead of estimating it
+    }
+    
+    # Category partitions priced at once
+    PRICING_CONCURRENCY = int(os.environ.get('PRICING_CONCURRENCY', 4))
+    
+    # Cache Configuration (CACHE_TTL in seconds)
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 3600))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+    
+    # Image Analysis Cache (max_distance: dHash bits allowed to differ, -1 = exact bytes only)
+    IMAGE_CACHE = {
+        'max_entries': int(os.environ.get('IMAGE_CACHE_MAX_ENTRIES', 500)),
+        'ttl': CACHE_TTL,
+        'max_distance': int(os.environ.get('IMAGE_CACHE_MAX_DISTANCE', -1)),  # >= 0 enables perceptual candidates
+        'hash_size': 8
+    }
+    
+    # Image Preprocessing before vision analysis (sizes in pixels)
+    IMAGE_PREPROCESSING = {
+        'max_side': 1536,
+        'tile_threshold': 4096,  # long side that gets tiled instead of downsampled
+        'tile_overlap': 64,
+        'whitespace_threshold': 245,  # gray level counted as background
+        'crop_margin': 16,
+        'format': 'JPEG',
+        'jpeg_quality': 85,
+        'duplicate_distance': -1,  # exact duplicates only; dHash bits >= 0 opts in
+        'max_workers': 4,
+        # Vision token estimate: one unit per small image or per tile
+        'token_small_side': 384,
+        'token_tile_side': 768,
+        'tokens_per_tile': 258
+    }
+    
+    # Local pipeline: retries of the Excel node (the HTTP node's retry
+    # policy), overall timeout in seconds and the local storage directory
+    PIPELINE = {
+        'retries': int(os.environ.get('RETRY_ATTEMPTS', 3)),
+        'timeout': int(os.environ.get('TIMEOUT', 300)),
+        'storage_dir': os.environ.get('STORAGE_DIR', 'output'),
+        # Estimate from the uploads that could be read; skipped ones are listed in the answer
+        'allow_partial_ocr': os.environ.get('ALLOW_PARTIAL_OCR', 'true').lower() == 'true'
+    }
+    
     # API Configuration (placeholder values)
     API_ENDPOINTS = {
         'windmill': 'https://api.example.com/windmill',
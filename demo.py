@@ -6,7 +6,8 @@ All sensitive data has been replaced with sample data.
 """
 
 import json
-from excel import main as generate_excel
+from compact import expand_rows, measure_savings
+from excel import generate_cost_sheet
 from utils import validate_ai_response, log_processing_step
 from config import get_config
 
@@ -16,58 +17,28 @@ def demo_ai_analysis():
     """
     print("=== EC AI Cost Estimation System Demo ===\n")
     
-    # Sample AI response (simulating what would come from Gemini)
+    # Sample AI response (simulating what would come from Gemini), in the
+    # compact contract: columns once, positional rows, and Component/Unit
+    # coded against 'dictionaries'
     sample_ai_response = {
         "columns": [
             "list_id", "Component", "Description", "W", "L", "H",
             "Quantity", "Unit", "price_per_unit", "total_cost", "remark"
         ],
+        "dictionaries": {
+            "Component": ["Flooring", "Structure", "Graphic"],
+            "Unit": ["sqm"]
+        },
         "rows": [
-            {
-                "list_id": "100-01-01",
-                "Component": "Flooring",
-                "Description": "Carpet flooring",
-                "W": "10.0",
-                "L": "5.0",
-                "H": "0.1",
-                "Quantity": "50.0",
-                "Unit": "sqm",
-                "price_per_unit": "150.00",
-                "total_cost": "7500.00",
-                "remark": "Sample flooring"
-            },
-            {
-                "list_id": "100-02-01",
-                "Component": "Structure",
-                "Description": "Wall panel",
-                "W": "3.0",
-                "L": "2.5",
-                "H": "2.5",
-                "Quantity": "15.0",
-                "Unit": "sqm",
-                "price_per_unit": "200.00",
-                "total_cost": "3000.00",
-                "remark": "Sample structure"
-            },
-            {
-                "list_id": "102-01-01",
-                "Component": "Graphic",
-                "Description": "Printed vinyl",
-                "W": "2.0",
-                "L": "1.5",
-                "H": "-",
-                "Quantity": "3.0",
-                "Unit": "sqm",
-                "price_per_unit": "80.00",
-                "total_cost": "240.00",
-                "remark": "Sample graphic"
-            }
+            ["100-01-01", 0, "Carpet flooring", "10.0", "5.0", "0.1", "50.0", 0, "150.00", "7500.00", "Sample flooring"],
+            ["100-02-01", 1, "Wall panel", "3.0", "2.5", "2.5", "15.0", 0, "200.00", "3000.00", "Sample structure"],
+            ["102-01-01", 2, "Printed vinyl", "2.0", "1.5", "-", "3.0", 0, "80.00", "240.00", "Sample graphic"]
         ]
     }
     
     # Validate AI response
     print("1. Validating AI Response...")
-    validation_result = validate_ai_response(sample_ai_response)
+    validation_result = validate_ai_response(sample_ai_response, strict=True)
     
     if validation_result['valid']:
         print("SUCCESS: AI response validation passed")
@@ -77,23 +48,23 @@ def demo_ai_analysis():
         print(f"ERROR: Validation failed: {validation_result['errors']}")
         return
     
-    # Extract columns and rows
+    # Rows are already positional; no per-row rebuild is needed
     columns = sample_ai_response['columns']
-    rows = []
+    rows = sample_ai_response['rows']
+    dictionaries = sample_ai_response['dictionaries']
     
-    for row_data in sample_ai_response['rows']:
-        row = []
-        for col in columns:
-            row.append(row_data.get(col, '-'))
-        rows.append(row)
+    print(f"SUCCESS: Received {len(rows)} rows with {len(columns)} columns")
     
-    print(f"SUCCESS: Extracted {len(rows)} rows with {len(columns)} columns")
+    savings = measure_savings(columns, expand_rows(columns, rows, dictionaries))
+    print(f"INFO: Compact response is {savings['compact']['bytes']} bytes instead of "
+          f"{savings['verbose']['bytes']} ({savings['bytes_saved']:.0%} smaller, "
+          f"about {savings['tokens_saved']:.0%} fewer tokens)")
     
     # Generate Excel file
     print("\n2. Generating Excel Cost Sheet...")
     log_processing_step("Starting Excel generation", f"Rows: {len(rows)}, Columns: {len(columns)}")
     
-    result = generate_excel(columns, rows)
+    result = generate_cost_sheet(columns, rows, dictionaries=dictionaries)
     
     if result['success']:
         print(f"SUCCESS: Excel file generated: {result['filename']}")
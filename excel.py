@@ -7,47 +7,72 @@ for exhibition booth projects using AI-analyzed data.
 """
 
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.packaging.custom import StringProperty
 from openpyxl.utils import get_column_letter
+import io
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import os
 
+import numpy as np
+
+from config import Config
+from metrics import metrics
+from styles import get_column_role, get_style_registry
+from table import CostTable
+
+# Header section configuration
+HEADER_DATA = {
+    'A1': 'Cost Sheet',
+    'A2': 'Project',
+    'E2': 'Booth',
+    'K2': 'Decoration',
+    'N2': 'Date of cost',
+    'A3': 'Showday',
+    'E3': 'Budget',
+    'N3': 'Designer',
+    'A4': 'Place',
+    'E4': 'Cost',
+    'N4': 'Sales',
+    'A5': 'No.',
+    'B5': 'Descriptions',
+    'E5': 'Size',
+    'K5': 'Units',
+    'M5': 'Price of unit',
+    'N5': 'Amounts',
+    'O5': 'Remarks'
+}
+
+# Header grid width (columns A-O)
+HEADER_COLUMNS = 15
+
+# Rows processed at a time by the streaming writer
+STREAMING_CHUNK_ROWS = 5000
+
+# Precompiled template as (cache key, header cells); see get_compiled_template()
+_template_cache = None
+
 def create_cost_sheet_template():
     """
     Creates the base Excel template with professional formatting.
     
+    The header cells are stamped from the precompiled template, so no
+    header values or style objects are rebuilt per call.
+    
     Returns:
         openpyxl.Workbook: Configured workbook with template structure
     """
     wb = openpyxl.Workbook()
     ws = wb.active
     
-    # Header section configuration
-    header_data = {
-        'A1': 'Cost Sheet',
-        'A2': 'Project',
-        'E2': 'Booth',
-        'K2': 'Decoration',
-        'N2': 'Date of cost',
-        'A3': 'Showday',
-        'E3': 'Budget',
-        'N3': 'Designer',
-        'A4': 'Place',
-        'E4': 'Cost',
-        'N4': 'Sales',
-        'A5': 'No.',
-        'B5': 'Descriptions',
-        'E5': 'Size',
-        'K5': 'Units',
-        'M5': 'Price of unit',
-        'N5': 'Amounts',
-        'O5': 'Remarks'
-    }
-    
     # Apply header data
-    for cell, value in header_data.items():
-        ws[cell] = value
+    for row, header_row in enumerate(get_compiled_template(), start=1):
+        for col, (value, role) in enumerate(header_row, start=1):
+            if value is not None:
+                ws.cell(row=row, column=col, value=value)
     
     # Apply professional formatting
     apply_template_formatting(ws)
@@ -61,66 +86,117 @@ def apply_template_formatting(ws):
     Args:
         ws: openpyxl worksheet object
     """
-    # Font configurations
-    title_font = Font(name='Calibri', size=26, bold=True)
-    header_font = Font(name='Calibri', size=11, bold=True)
+    styles = get_style_registry(ws.parent)
     
-    # Fill configurations
-    header_fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
-    total_fill = PatternFill(start_color='808080', end_color='808080', fill_type='solid')
+    # Apply formatting to headers
+    for row, header_row in enumerate(get_compiled_template(), start=1):
+        for col, (value, role) in enumerate(header_row, start=1):
+            styles.apply(ws.cell(row=row, column=col), role)
+
+def compile_cost_sheet_template(template_config):
+    """
+    Resolves the header grid into plain (value, style role) cells.
     
-    # Border configuration
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    Args:
+        template_config (dict): Excel template configuration
     
-    # Apply formatting to headers
-    for row in range(1, 6):
-        for col in range(1, 16):
-            cell = ws.cell(row=row, column=col)
-            cell.font = header_font
-            cell.border = thin_border
-            if row == 1:
-                cell.font = title_font
+    Returns:
+        tuple: One tuple of cells per header row
+    """
+    header_data = dict(HEADER_DATA, A1=template_config['title'])
+    
+    header_rows = []
+    for row in range(1, template_config['header_rows'] + 1):
+        role = 'title' if row == 1 else 'header'
+        header_rows.append(tuple(
+            (header_data.get(f'{get_column_letter(col)}{row}'), role)
+            for col in range(1, HEADER_COLUMNS + 1)
+        ))
+    
+    return tuple(header_rows)
 
-def process_ai_analyzed_data(columns, rows):
+def get_compiled_template():
+    """
+    Returns the precompiled header, building it once per process.
+    
+    The cache is keyed on Config.VERSION and the contents of
+    Config.EXCEL_TEMPLATE, so any configuration change rebuilds it.
+    
+    Returns:
+        tuple: One tuple of (value, style role) cells per header row
+    """
+    global _template_cache
+    
+    key = (Config.VERSION, tuple(sorted(Config.EXCEL_TEMPLATE.items())))
+    cache = _template_cache
+    if cache is None or cache[0] != key:
+        cache = (key, compile_cost_sheet_template(Config.EXCEL_TEMPLATE))
+        _template_cache = cache
+    
+    return cache[1]
+
+def clear_template_cache():
+    """
+    Drops the precompiled template so the next sheet rebuilds it.
+    """
+    global _template_cache
+    _template_cache = None
+
+def process_ai_analyzed_data(columns, rows, dictionaries=None):
     """
     Processes AI-analyzed data and prepares it for Excel insertion.
     
     Args:
         columns (list): Column headers from AI analysis
         rows (list): Data rows from AI analysis
+        dictionaries (dict, optional): Values of dictionary-coded
+            columns in a compact response, see compact.py
     
     Returns:
-        dict: Processed data ready for Excel generation
+        CostTable: Processed data ready for Excel generation
     """
-    processed_data = {
-        'columns': columns,
-        'rows': []
-    }
+    # Map AI data to Excel structure
+    table = CostTable.from_rows(columns, rows, dictionaries)
     
-    for row in rows:
-        processed_row = {}
-        
-        # Map AI data to Excel structure
-        for i, col in enumerate(columns):
-            if i < len(row):
-                processed_row[col] = row[i]
-        else:
-                processed_row[col] = '-'
-        
-        # Validate and process dimensions
-        processed_row = validate_dimensions(processed_row)
-        
-        # Calculate quantities based on type
-        processed_row = calculate_quantities(processed_row)
-        
-        processed_data['rows'].append(processed_row)
+    # Validate and process dimensions
+    table = validate_table_dimensions(table)
+    
+    # Calculate quantities based on type
+    table = calculate_table_quantities(table)
+    
+    return table
+
+def validate_table_dimensions(table):
+    """
+    Validates dimension columns of a table; non-positive or invalid
+    values become missing, as in validate_dimensions().
+    
+    Args:
+        table (CostTable): Table with W, L, H columns
+    
+    Returns:
+        CostTable: Validated table
+    """
+    for dim in Config.DIMENSIONS:
+        if dim in table:
+            values = table[dim]
+            table[dim] = np.where(values > 0, values, np.nan)
+            table.text.pop(dim, None)
     
-    return processed_data
+    return table
+
+def calculate_table_quantities(table):
+    """
+    Calculates quantities of a table based on component type and dimensions.
+    
+    Args:
+        table (CostTable): Table with component information
+    
+    Returns:
+        CostTable: Table with calculated quantities
+    """
+    # Quantities from AI analysis are kept as-is, see calculate_quantities()
+    return table
 
 def validate_dimensions(row_data):
     """
@@ -180,23 +256,24 @@ def insert_dynamic_data(ws, processed_data):
     
     Args:
         ws: openpyxl worksheet object
-        processed_data (dict): Processed data from AI analysis
+        processed_data (CostTable): Processed data from AI analysis
     """
     # Data insertion logic
-    start_row = 6  # Starting after headers
+    start_row = Config.EXCEL_TEMPLATE['data_start_row']  # Starting after headers
+    styles = get_style_registry(ws.parent)
+    columns = processed_data.columns
     
-    for i, row_data in enumerate(processed_data['rows']):
+    for i, values in enumerate(processed_data.iter_rows()):
         row_num = start_row + i
         
         # Insert data based on column mapping
-        for col_idx, col_name in enumerate(processed_data['columns']):
-            cell = ws.cell(row=row_num, column=col_idx + 1)
-            cell.value = row_data.get(col_name, '-')
+        for col_idx, col_name in enumerate(columns):
+            cell = ws.cell(row=row_num, column=col_idx + 1, value=values[col_idx])
             
             # Apply appropriate formatting
-            apply_cell_formatting(cell, col_name, row_data)
+            apply_cell_formatting(cell, col_name, None, styles)
 
-def apply_cell_formatting(cell, col_name, row_data):
+def apply_cell_formatting(cell, col_name, row_data, styles=None):
     """
     Applies appropriate formatting to cells based on content type.
     
@@ -204,73 +281,333 @@ def apply_cell_formatting(cell, col_name, row_data):
         cell: openpyxl cell object
         col_name (str): Column name
         row_data (dict): Row data
+        styles (StyleRegistry, optional): Registry of the cell's workbook
     """
-    # Number formatting for dimensions and prices
-    if col_name in ['W', 'L', 'H', 'Quantity', 'price_per_unit', 'total_cost']:
+    role = get_column_role(col_name)
+    if role is None:
+        return
+    
+    # Number formatting for dimensions and prices; CostTable values are
+    # already floats, only text needs the parse check
+    if role == 'number' and not isinstance(cell.value, (int, float)):
         try:
-            value = float(cell.value)
-            cell.number_format = '#,##0.00'
+            float(cell.value)
         except (ValueError, TypeError):
-            pass
+            return
+    
+    # Text wrapping for descriptions uses the 'text' role
+    styles = styles or get_style_registry(cell.parent.parent)
+    styles.apply(cell, role)
+
+def iter_row_chunks(rows, size):
+    """
+    Splits rows into consecutive lists of at most size rows.
+    
+    Args:
+        rows (iterable): Data rows
+        size (int): Maximum rows per chunk
     
-    # Text wrapping for descriptions
-    if col_name in ['Description', 'Component']:
-        cell.alignment = Alignment(wrap_text=True, vertical='top')
+    Yields:
+        list: Next chunk of rows
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class StreamingCostSheet:
+    """
+    Write-only cost sheet built in a single forward pass.
+    
+    Produces the same layout as create_cost_sheet_template() followed by
+    insert_dynamic_data(), but rows are serialized as they are appended
+    so memory stays bounded regardless of the number of line items.
+    """
+    
+    def __init__(self, columns, dictionaries=None):
+        """
+        Creates the write-only workbook and writes the header section.
+        
+        Args:
+            columns (list): Column headers from AI analysis
+            dictionaries (dict, optional): Values of dictionary-coded
+                columns, see compact.py
+        """
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.row_count = 0
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+        self.styles = get_style_registry(self.wb)
+        self._write_header()
+    
+    def _write_header(self):
+        """
+        Writes the precompiled header grid row by row.
+        """
+        header_rows = get_compiled_template()
+        
+        for header_row in header_rows:
+            cells = []
+            for value, role in header_row:
+                cell = WriteOnlyCell(self.ws, value=value)
+                self.styles.apply(cell, role)
+                cells.append(cell)
+            self.ws.append(cells)
+        
+        # Pad up to the configured first data row
+        for _ in range(len(header_rows) + 1, Config.EXCEL_TEMPLATE['data_start_row']):
+            self.ws.append([])
+    
+    def append_rows(self, rows):
+        """
+        Processes a chunk of AI rows and writes it below the previous rows.
+        
+        Args:
+            rows (list): Data rows from AI analysis
+        """
+        with metrics.span('cost_sheet.process', mode='streaming'):
+            table = process_ai_analyzed_data(self.columns, rows, self.dictionaries)
+        
+        with metrics.span('cost_sheet.insert', mode='streaming'):
+            self.append_table(table)
+    
+    def append_table(self, table):
+        """
+        Writes the rows of a processed table below the previous rows.
+        
+        Args:
+            table (CostTable): Processed data with the sheet's columns
+        """
+        for values in table.iter_rows():
+            cells = []
+            for col_name, value in zip(self.columns, values):
+                cell = WriteOnlyCell(self.ws, value=value)
+                apply_cell_formatting(cell, col_name, None, self.styles)
+                cells.append(cell)
+            self.ws.append(cells)
+        self.row_count += len(table)
+    
+    def save(self, filename):
+        """
+        Finalizes the workbook. A write-only workbook can only be saved once.
+        
+        Args:
+            filename: Destination path or writable binary stream
+        """
+        self.wb.save(filename)
+
+def set_document_property(wb, name, value):
+    """
+    Records a custom document property (File > Properties > Custom).
+    
+    Args:
+        wb (Workbook): Regular or write-only workbook
+        name (str): Property name
+        value: Property value, stored as text
+    """
+    if name in wb.custom_doc_props.names:
+        del wb.custom_doc_props[name]
+    wb.custom_doc_props.append(StringProperty(name=name, value=str(value)))
+
+def default_filename(prefix='Cost_Sheet'):
+    """
+    Builds the timestamped file name of a generated workbook.
+    
+    Args:
+        prefix (str): Name before the timestamp
+    
+    Returns:
+        str: e.g. 'Cost_Sheet_20241201_093000.xlsx'
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f'{prefix}_{timestamp}.xlsx'
 
-def generate_cost_sheet(columns, rows):
+def save_cost_sheet(wb, filename, output, result, mode='memory'):
+    """
+    Writes a finished workbook to its output target.
+    
+    Args:
+        wb: Workbook or StreamingCostSheet
+        filename (str): File name used when saving to disk
+        output: Output target, see generate_cost_sheet()
+        result (dict): Result dict; 'content' or 'buffer' is added to it
+        mode (str): Metrics label of the writer
+    """
+    with metrics.span('cost_sheet.save', mode=mode):
+        if output is None or output == 'file':
+            # Save file (in production, this would upload to cloud storage)
+            wb.save(filename)
+        elif output in ('bytes', 'buffer'):
+            # Keep the xlsx in memory, no filesystem write
+            buffer = io.BytesIO()
+            wb.save(buffer)
+            if output == 'bytes':
+                result['content'] = buffer.getvalue()
+            else:
+                buffer.seek(0)
+                result['buffer'] = buffer
+            metrics.observe('cost_sheet.output_bytes', buffer.getbuffer().nbytes, mode=mode)
+        elif hasattr(output, 'write'):
+            # Caller-supplied stream (upload body, HTTP response, ...)
+            wb.save(output)
+        else:
+            raise ValueError(f"Unsupported output: {output!r}")
+
+def generate_cost_sheet(columns, rows, streaming=False, output=None, filename=None,
+                        price_version=None, dictionaries=None):
     """
     Main function to generate cost sheet from AI-analyzed data.
     
     Args:
         columns (list): Column headers from AI analysis
         rows (list): Data rows from AI analysis
+        streaming (bool): Write rows in a single forward pass with bounded
+            memory instead of building the workbook in memory
+        output: Where the xlsx goes. None or 'file' saves to the working
+            directory, 'bytes' returns it under 'content', 'buffer'
+            returns a rewound io.BytesIO under 'buffer', and any object
+            with a write() method receives it directly
+        filename (str, optional): File name, defaults to a timestamped name
+        price_version (str, optional): Price snapshot the rows were priced
+            with; stored as the 'price_version' document property
+        dictionaries (dict, optional): Values of dictionary-coded columns
+            when rows come from a compact response, see compact.py
     
     Returns:
         dict: Result with file information
     """
+    mode = 'streaming' if streaming else 'memory'
+    
     try:
-        # Create template
-        wb = create_cost_sheet_template()
-        ws = wb.active
-        
-        # Process AI data
-        processed_data = process_ai_analyzed_data(columns, rows)
+        if streaming:
+            # Header, then rows chunk by chunk as they are processed
+            with metrics.span('cost_sheet.template', mode=mode):
+                wb = StreamingCostSheet(columns, dictionaries)
+            for chunk in iter_row_chunks(rows, STREAMING_CHUNK_ROWS):
+                wb.append_rows(chunk)
+            styles = wb.styles
+            row_count = wb.row_count
+        else:
+            # Create template
+            with metrics.span('cost_sheet.template', mode=mode):
+                wb = create_cost_sheet_template()
+                ws = wb.active
+            
+            # Process AI data
+            with metrics.span('cost_sheet.process', mode=mode):
+                processed_data = process_ai_analyzed_data(columns, rows, dictionaries)
+            
+            # Insert dynamic data
+            with metrics.span('cost_sheet.insert', mode=mode):
+                insert_dynamic_data(ws, processed_data)
+            styles = get_style_registry(wb)
+            row_count = len(processed_data)
         
-        # Insert dynamic data
-        insert_dynamic_data(ws, processed_data)
+        if price_version is not None:
+            set_document_property(wb.wb if streaming else wb, 'price_version', price_version)
         
         # Generate filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'Cost_Sheet_{timestamp}.xlsx'
-        
-        # Save file (in production, this would upload to cloud storage)
-        wb.save(filename)
+        if filename is None:
+            filename = default_filename()
         
-        return {
+        result = {
             'success': True,
             'filename': filename,
+            'styles_created': styles.created,
             'message': 'Cost sheet generated successfully'
         }
+        if price_version is not None:
+            result['price_version'] = price_version
+        
+        save_cost_sheet(wb, filename, output, result, mode)
+        
+        metrics.increment('cost_sheet.rows', row_count, mode=mode)
+        metrics.increment('cost_sheet.generated', mode=mode)
+        return result
         
     except Exception as e:
+        metrics.increment('cost_sheet.failed', mode=mode)
         return {
             'success': False,
             'error': str(e),
             'message': 'Failed to generate cost sheet'
         }
 
-def main(columns, rows):
+def generate_cost_sheets(jobs, max_workers=None, streaming=False, output=None,
+                         price_version=None):
+    """
+    Generates many cost sheets in parallel over a process pool.
+    
+    Args:
+        jobs (iterable): (columns, rows) tuples, one per cost sheet
+        max_workers (int, optional): Pool size, defaults to the CPU count
+        streaming (bool): Use the bounded-memory write-only writer
+        output: None/'file' or 'bytes'; results must be picklable, so
+            buffers and caller streams are not supported here
+        price_version (str, optional): Price snapshot recorded in every sheet
+    
+    Returns:
+        dict: Batch summary with one generate_cost_sheet() result per job
+    """
+    if not (output is None or output in ('file', 'bytes')):
+        raise ValueError(f"Unsupported batch output: {output!r}")
+    
+    jobs = list(jobs)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    start = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                generate_cost_sheet, columns, rows, streaming, output,
+                f'Cost_Sheet_{timestamp}_{index:04d}.xlsx', price_version
+            )
+            for index, (columns, rows) in enumerate(jobs)
+        ]
+        
+        # Errors stay with their job, including worker crashes
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({
+                    'success': False,
+                    'error': str(e),
+                    'message': 'Failed to generate cost sheet'
+                })
+    
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for result in results if not result['success'])
+    
+    return {
+        'success': failed == 0,
+        'results': results,
+        'jobs': len(results),
+        'failed': failed,
+        'elapsed': elapsed,
+        'jobs_per_sec': len(results) / elapsed if elapsed > 0 else 0.0
+    }
+
+def main(columns, rows, streaming=False, output=None):
     """
     Main entry point for cost sheet generation.
     
     Args:
         columns (list): Column headers
         rows (list): Data rows
+        streaming (bool): Use the bounded-memory write-only writer
+        output: Output target, see generate_cost_sheet()
     
     Returns:
         dict: Generation result
     """
-    return generate_cost_sheet(columns, rows)
+    return generate_cost_sheet(columns, rows, streaming=streaming, output=output)
 
 # Example usage (for demonstration only)
 if __name__ == "__main__":
@@ -0,0 +1,416 @@
+"""
+EC - AI Cost Estimation System
+Hybrid Pricing Module
+
+Prices cost-sheet rows locally where the price list answers with
+confidence and sends only the rest to the PRICE-KNOWLEDGE model:
+
+1. Local batch: list_id or exact description (PriceTable.lookup()),
+   then the BM25 price index when its best candidate clears
+   Config.HYBRID_PRICING['confidence_threshold'] by a clear margin and
+   has the row's unit.
+2. Model: the remaining rows go out in one compact prompt, each with its
+   top index candidates instead of the whole price list.
+
+The model's answers are checked like local matches: each must name one
+of the row's candidates in the row's unit, and is priced from that
+price-list entry. The result reports the local/model split, the prompt
+tokens avoided against sending every row to the model with its
+candidates, and the latency of every stage.
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compact import estimate_json_tokens
+from config import Config
+from metrics import metrics
+from money import format_money, line_totals, to_quantity, to_satang
+from price_index import PriceIndex
+from pricing import PriceEntry, price_rows, select_by_unit
+from utils import normalize_text
+
+PRICING_PROMPT = (
+    "Price every row using its candidate price-list items "
+    "[list_id, description, unit, price]. Reply with JSON only: "
+    '{"columns":["row","list_id","price_per_unit"],"rows":[[row,list_id,price],...]}. '
+    "Use null for list_id and price when no candidate fits."
+)
+
+class IndexMatcher:
+    """
+    Price matcher that falls back to the price index.
+    
+    lookup() returns the base matcher's answer when it has one, else the
+    best index candidate as method 'index' if it is confident enough.
+    The method of every lookup is recorded in call order, and index
+    candidates of every query are kept for the model prompt.
+    """
+    
+    def __init__(self, matcher, index: PriceIndex, threshold: float,
+                 min_margin: float, top_k: int):
+        """
+        Args:
+            matcher: PriceTable or compatible object with lookup()
+            index (PriceIndex): Index over the same price list
+            threshold (float): Lowest confidence priced locally
+            min_margin (float): Confidence lead required over the runner-up
+            top_k (int): Candidates kept per query
+        """
+        self.matcher = matcher
+        self.index = index
+        self.threshold = threshold
+        self.min_margin = min_margin
+        self.top_k = max(top_k, 2)
+        self.candidates: Dict[str, List[Dict[str, Any]]] = {}
+        self.methods: List[Optional[str]] = []
+    
+    @staticmethod
+    def query(component: Any, description: Any) -> str:
+        """Index query of a row: description then component."""
+        return f"{description or ''} {component or ''}".strip()
+    
+    def lookup(self, list_id: Any, component: Any, description: Any,
+               unit: Any = None) -> Tuple[Optional[PriceEntry], Optional[str]]:
+        """
+        Resolves one row, see PriceTable.lookup().
+        
+        Returns:
+            tuple: (entry or None, 'list_id' / 'description' / 'index' or None)
+        """
+        entry, method = self._lookup(list_id, component, description, unit)
+        self.methods.append(method)
+        return entry, method
+    
+    def search(self, component: Any, description: Any) -> List[Dict[str, Any]]:
+        """
+        Index candidates of a row, searched once per query.
+        
+        Args:
+            component (any): Component or work type
+            description (any): Item description
+        
+        Returns:
+            list: Candidates, see PriceIndex.search()
+        """
+        query = self.query(component, description)
+        if query not in self.candidates:
+            self.candidates[query] = self.index.search(query, self.top_k)
+        return self.candidates[query]
+    
+    def _lookup(self, list_id, component, description, unit):
+        entry, method = self.matcher.lookup(list_id, component, description, unit)
+        if entry is not None:
+            return entry, method
+        
+        candidates = self.search(component, description)
+        if not candidates:
+            return None, None
+        
+        best = candidates[0]
+        runner_up = candidates[1]['confidence'] if len(candidates) > 1 else 0.0
+        if (best['confidence'] >= self.threshold
+                and best['confidence'] - runner_up >= self.min_margin
+                and select_by_unit([best['entry']], normalize_text(unit)) is not None):
+            return best['entry'], 'index'
+        return None, None
+
+class MockPricingModel:
+    """
+    Local stand-in for the PRICE-KNOWLEDGE model: answers every row with
+    its first candidate in the row's unit (see select_by_unit()) after an
+    optional simulated latency.
+    """
+    
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency (float): Seconds each call sleeps
+        """
+        self.latency = latency
+        self.calls = 0
+        self.prompts = []
+    
+    def complete(self, prompt: str) -> str:
+        """
+        Args:
+            prompt (str): build_pricing_prompt() output
+        
+        Returns:
+            str: JSON response text
+        """
+        self.calls += 1
+        self.prompts.append(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        payload = json.loads(prompt.split('\n', 1)[1])
+        unit_at = payload['columns'].index('Unit')
+        rows = []
+        for row in payload['rows']:
+            candidates = payload['candidates'].get(str(row[0]), [])
+            entries = [PriceEntry(c[0], None, c[1], c[2], c[3]) for c in candidates]
+            entry = select_by_unit(entries, normalize_text(row[unit_at]))
+            rows.append([row[0], entry.list_id, entry.price] if entry else [row[0], None, None])
+        return json.dumps({'columns': ['row', 'list_id', 'price_per_unit'], 'rows': rows})
+
+def build_pricing_prompt(columns: List[str], rows: List[List[Any]], indexes: List[int],
+                         candidates: Dict[int, List[Dict[str, Any]]]) -> str:
+    """
+    Builds the compact model prompt for the rows left after local pricing.
+    
+    Args:
+        columns (list): Column headers
+        rows (list): Positional rows
+        indexes (list): Row indexes to send
+        candidates (dict): Row index -> index candidates
+    
+    Returns:
+        str: Instructions, a newline, then the JSON payload
+    """
+    position = {name: i for i, name in enumerate(columns)}
+    sent = ('list_id', 'Component', 'Description', 'Unit')
+    
+    def cell(row, name):
+        i = position.get(name)
+        return row[i] if i is not None and i < len(row) else None
+    
+    payload = {
+        'columns': ['row'] + list(sent),
+        'rows': [[i] + [cell(rows[i], name) for name in sent] for i in indexes],
+        'candidates': {
+            str(i): [
+                [c['entry'].list_id, c['entry'].description, c['entry'].unit, c['entry'].price]
+                for c in candidates.get(i, [])
+            ]
+            for i in indexes
+        }
+    }
+    return PRICING_PROMPT + '\n' + json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+def _row_index(value: Any) -> Optional[int]:
+    """
+    Reads a row index the model may have sent as a number or text.
+    """
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else None
+
+def parse_pricing_response(response: Any, candidates: Dict[int, List[Dict[str, Any]]],
+                           units: Optional[Dict[int, Any]] = None) -> Dict[str, Any]:
+    """
+    Reads the model's prices and checks them like a local match: the
+    list_id must be one of the row's candidates and priced in the row's
+    unit (select_by_unit()), and the price is that entry's.
+    
+    Columns the model renamed fall back to the requested order
+    (row, list_id, price_per_unit).
+    
+    Args:
+        response (str or dict): Model output, optionally in a code fence
+        candidates (dict): Row index -> index candidates, for the rows sent
+        units (dict, optional): Row index -> row unit
+    
+    Returns:
+        dict: 'prices' (row index -> unit price) and the 'rejected'
+        count of answers naming an unknown row, a list_id outside the
+        row's candidates or an entry in another unit; rows the model
+        left null are neither
+    """
+    if isinstance(response, str):
+        text = response.strip()
+        response = json.loads(text[text.find('{'):text.rfind('}') + 1])
+    
+    expected = ['row', 'list_id', 'price_per_unit']
+    columns = response.get('columns')
+    columns = columns if isinstance(columns, list) else expected
+    row_at, list_id_at, price_at = (
+        columns.index(name) if name in columns else position for position, name in enumerate(expected)
+    )
+    units = units or {}
+    prices = {}
+    rejected = 0
+    for row in response.get('rows', []):
+        if not isinstance(row, list) or len(row) <= max(row_at, list_id_at, price_at):
+            rejected += 1
+            continue
+        list_id, price = row[list_id_at], row[price_at]
+        if list_id is None and price is None:
+            continue
+        
+        index = _row_index(row[row_at])
+        if index not in candidates or index in prices:
+            rejected += 1
+            continue
+        named = [c['entry'] for c in candidates[index] if c['entry'].list_id == str(list_id).strip()]
+        entry = select_by_unit(named, normalize_text(units.get(index)))
+        if entry is None:
+            rejected += 1
+            continue
+        prices[index] = entry.price
+    return {'prices': prices, 'rejected': rejected}
+
+def apply_prices(columns: List[str], rows: List[List[Any]], prices: Dict[int, float]):
+    """
+    Writes unit prices and fixed-point totals into priced rows in place.
+    
+    Args:
+        columns (list): Column headers including price_per_unit and total_cost
+        rows (list): Positional rows, padded to columns
+        prices (dict): Row index -> unit price in baht
+    """
+    if not prices:
+        return
+    position = {name: i for i, name in enumerate(columns)}
+    indexes = list(prices)
+    quantity_at = position.get('Quantity')
+    
+    satang, valid = to_satang([prices[i] for i in indexes])
+    quantities, has_quantity = to_quantity([
+        rows[i][quantity_at] if quantity_at is not None else None for i in indexes
+    ])
+    totals = line_totals(quantities, satang)
+    for k, i in enumerate(indexes):
+        if not valid[k]:
+            continue
+        rows[i][position['price_per_unit']] = format_money(satang[k])
+        rows[i][position['total_cost']] = format_money(totals[k]) if has_quantity[k] else '-'
+
+def hybrid_price_rows(columns: List[str], rows: List[List[Any]], matcher, index: PriceIndex,
+                      model=None, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Prices rows locally where possible and with the model otherwise.
+    
+    Args:
+        columns (list): Column headers from AI analysis
+        rows (list): Positional data rows
+        matcher: PriceTable or compatible object with lookup()
+        index (PriceIndex): Index over the same price list
+        model (optional): Object with complete(prompt) or a callable
+            returning the model's JSON text; without one the prompt is
+            returned for the caller to send
+        settings (dict, optional): Overrides for Config.HYBRID_PRICING
+    
+    Returns:
+        dict: Priced 'columns' and 'rows', per-row 'sources' ('list_id',
+        'description', 'index', 'model' or None), the 'split' counts
+        (with model answers 'rejected' by parse_pricing_response()),
+        'prompt' and 'tokens' (prompt sent, full prompt of every row
+        with its candidates, avoided), per-stage 'timings' and the
+        total 'elapsed'. The full prompt is estimated from the per-row
+        size of the prompt sent unless settings['report_baseline'] asks
+        to build it; either way outside the timings.
+    """
+    settings = {**Config.HYBRID_PRICING, **(settings or {})}
+    start = time.perf_counter()
+    timings = {}
+    
+    # Stage 1: local batch
+    stage = time.perf_counter()
+    with metrics.span('pricing.hybrid', stage='local'):
+        local = IndexMatcher(matcher, index, settings['confidence_threshold'],
+                             settings['min_margin'], settings['prompt_candidates'])
+        result = price_rows(local, columns, rows)
+        columns, priced = result['columns'], result['rows']
+        unmatched = result['unmatched']
+        
+        position = {name: i for i, name in enumerate(columns)}
+        
+        def cell(row, name):
+            i = position.get(name)
+            return row[i] if i is not None and i < len(row) else None
+        
+        def row_candidates(i):
+            found = local.search(cell(priced[i], 'Component'), cell(priced[i], 'Description'))
+            return found[:settings['prompt_candidates']]
+        
+        candidates = {i: row_candidates(i) for i in unmatched}
+    timings['local'] = time.perf_counter() - stage
+    
+    # price_rows() looks every row up once, in order
+    sources = list(local.methods)
+    
+    # Stage 2: one compact prompt for the remainder
+    stage = time.perf_counter()
+    prompt = build_pricing_prompt(columns, priced, unmatched, candidates) if unmatched else None
+    sent = estimate_json_tokens(prompt) if prompt else 0
+    timings['prompt'] = time.perf_counter() - stage
+    
+    model_priced = {}
+    rejected = 0
+    error = None
+    if prompt and model is not None:
+        stage = time.perf_counter()
+        try:
+            with metrics.span('pricing.hybrid', stage='model'):
+                complete = getattr(model, 'complete', model)
+                parsed = parse_pricing_response(
+                    complete(prompt), candidates, {i: cell(priced[i], 'Unit') for i in unmatched}
+                )
+            model_priced, rejected = parsed['prices'], parsed['rejected']
+            apply_prices(columns, priced, model_priced)
+            for i in model_priced:
+                sources[i] = 'model'
+        except Exception as e:
+            error = str(e)
+            model_priced = {}
+        timings['model'] = time.perf_counter() - stage
+    
+    # Baseline: every row sent to the model with its price-list candidates
+    if not priced:
+        full = 0
+    elif settings['report_baseline']:
+        everything = {i: candidates.get(i) or row_candidates(i) for i in range(len(priced))}
+        full = estimate_json_tokens(
+            build_pricing_prompt(columns, priced, list(range(len(priced))), everything)
+        )
+    else:
+        # Scale the per-row size of the prompt sent (or of one row when
+        # everything was priced locally) to all rows
+        sample, sample_tokens = unmatched, sent
+        if not unmatched:
+            sample = [0]
+            sample_tokens = estimate_json_tokens(
+                build_pricing_prompt(columns, priced, sample, {0: row_candidates(0)})
+            )
+        overhead = estimate_json_tokens(build_pricing_prompt(columns, priced, [], {}))
+        full = overhead + round((sample_tokens - overhead) * len(priced) / len(sample))
+    tokens = {'prompt': sent, 'full': full, 'avoided': full - sent}
+    
+    split = {
+        'rows': len(priced),
+        'local': len(priced) - len(unmatched),
+        'list_id': result['methods'].get('list_id', 0),
+        'description': result['methods'].get('description', 0),
+        'index': result['methods'].get('index', 0),
+        'model': len(model_priced),
+        'rejected': rejected,
+        'unpriced': len(unmatched) - len(model_priced)
+    }
+    metrics.increment('pricing.hybrid_local', split['local'])
+    metrics.increment('pricing.hybrid_model', split['model'])
+    metrics.increment('pricing.hybrid_rejected', split['rejected'])
+    metrics.increment('pricing.tokens_avoided', tokens['avoided'])
+    
+    response = {
+        'success': error is None,
+        'columns': columns,
+        'rows': priced,
+        'sources': sources,
+        'split': split,
+        'prompt': prompt,
+        'tokens': tokens,
+        'timings': timings,
+        'elapsed': time.perf_counter() - start,
+        'message': f"Priced {split['local']} of {split['rows']} rows locally, "
+                   f"{split['model']} by the model, {split['unpriced']} unpriced"
+    }
+    if error is not None:
+        response['error'] = error
+    return response
@@ -0,0 +1,293 @@
+"""
+EC - AI Cost Estimation System
+Image Cache Module
+
+Content-addressed cache of OCR & OBJECT ANALYSIS results, looked up by
+the SHA-256 of each upload's bytes.
+
+Perceptual matching by difference hash (dHash) is opt-in
+(Config.IMAGE_CACHE['max_distance'] >= 0) and never serves a result on
+its own: two drawings or tables sharing a layout hash alike even when
+their text differs. A near match is only a candidate, used when the
+caller's confirm() accepts it for the new upload.
+
+Only results accepted by utils.validate_ai_response() are stored.
+"""
+
+import hashlib
+import io
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from cache import TTLCache
+from config import Config
+from metrics import metrics
+from utils import validate_ai_response
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; exact matching still works
+    Image = None
+
+def exact_hash(data: bytes) -> str:
+    """
+    Hashes the raw image bytes.
+    
+    Args:
+        data (bytes): Uploaded file content
+    
+    Returns:
+        str: SHA-256 hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def perceptual_hash(data: bytes, hash_size: int = 8) -> Optional[int]:
+    """
+    Computes the difference hash of encoded image bytes, see image_dhash().
+    
+    Args:
+        data (bytes): Uploaded file content
+        hash_size (int): Bits per side, the hash has hash_size² bits
+    
+    Returns:
+        int: Hash value, None without Pillow or for unreadable images
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image_dhash(image, hash_size)
+    except Exception:
+        return None
+
+def image_dhash(image, hash_size: int = 8) -> int:
+    """
+    Computes the difference hash of an image: the grayscale image is
+    shrunk to (hash_size + 1) × hash_size and each bit records whether a
+    pixel is brighter than its right neighbour. Resizing, re-encoding
+    and small edits change only a few bits.
+    
+    Args:
+        image (PIL.Image): Decoded image
+        hash_size (int): Bits per side
+    
+    Returns:
+        int: Hash value
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    """
+    Counts the differing bits of two hashes.
+    """
+    return bin(a ^ b).count('1')
+
+def copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copies a {'columns', 'rows'} result so callers cannot alter the
+    cached one.
+    """
+    return {
+        **result,
+        'columns': list(result['columns']),
+        'rows': [list(row) if isinstance(row, list) else dict(row) for row in result['rows']]
+    }
+
+class ImageAnalysisCache:
+    """
+    Cache of image analysis results by exact bytes, with optional
+    perceptual candidates: the result of the nearest cached image within
+    max_distance dHash bits, see candidate().
+    
+    Both levels are TTLCache instances, so capacity, TTL and the
+    hit/miss/eviction counters work as for price lookups; stats() adds
+    the combined hit rate. Lookups run in worker threads, so the
+    counters here are updated under a lock like TTLCache's.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 max_distance: Optional[int] = None, hash_size: Optional[int] = None):
+        """
+        Args:
+            max_entries (int, optional): Cached images, defaults to
+                Config.IMAGE_CACHE['max_entries']
+            ttl (float, optional): Lifetime in seconds, defaults to
+                Config.IMAGE_CACHE['ttl']
+            max_distance (int, optional): Largest dHash distance offered
+                as a candidate; negative disables perceptual matching.
+                Defaults to Config.IMAGE_CACHE['max_distance'] (-1)
+            hash_size (int, optional): dHash size, defaults to
+                Config.IMAGE_CACHE['hash_size']
+        """
+        settings = Config.IMAGE_CACHE
+        max_entries = max_entries if max_entries is not None else settings['max_entries']
+        ttl = ttl if ttl is not None else settings['ttl']
+        self.max_distance = max_distance if max_distance is not None else settings['max_distance']
+        self.hash_size = hash_size if hash_size is not None else settings['hash_size']
+        self.results = TTLCache(max_entries, ttl, name='image_exact')
+        self.perceptual = TTLCache(max_entries, ttl, name='image_perceptual')
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.perceptual_candidates = 0
+        self.perceptual_confirmed = 0
+        self.misses = 0
+    
+    @property
+    def perceptual_enabled(self) -> bool:
+        """True when Pillow is available and perceptual matching is on."""
+        return Image is not None and self.max_distance >= 0
+    
+    def _nearest(self, phash: int) -> Optional[str]:
+        """
+        Finds the exact hash of the closest cached image.
+        """
+        best, best_distance = None, self.max_distance + 1
+        for candidate in self.perceptual.keys():
+            distance = hamming_distance(phash, candidate)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        if best is None:
+            return None
+        return self.perceptual.get(best)
+    
+    def get(self, data: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Looks an image up by its exact bytes.
+        
+        Args:
+            data (bytes): Uploaded file content
+        
+        Returns:
+            tuple: (copy of the cached result or None, 'exact' or None)
+        """
+        result = self.results.get(exact_hash(data))
+        if result is None:
+            with self._lock:
+                self.misses += 1
+            metrics.increment('image_cache.lookups', match='miss')
+            return None, None
+        
+        with self._lock:
+            self.exact_hits += 1
+        metrics.increment('image_cache.lookups', match='exact')
+        return copy_result(result), 'exact'
+    
+    def candidate(self, data: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Finds the result of the nearest cached image by perceptual hash.
+        The result belongs to a different upload and must be confirmed
+        before it is used for this one.
+        
+        Args:
+            data (bytes): Uploaded file content
+        
+        Returns:
+            dict: Copy of the candidate result, None when perceptual
+            matching is off or nothing is within max_distance
+        """
+        if not self.perceptual_enabled:
+            return None
+        phash = perceptual_hash(data, self.hash_size)
+        nearest = self._nearest(phash) if phash is not None else None
+        result = self.results.get(nearest) if nearest is not None else None
+        if result is None:
+            return None
+        with self._lock:
+            self.perceptual_candidates += 1
+        metrics.increment('image_cache.candidates')
+        return copy_result(result)
+    
+    def put(self, data: bytes, result: Dict[str, Any]) -> bool:
+        """
+        Stores the analysis result of an image.
+        
+        Args:
+            data (bytes): Uploaded file content
+            result (dict): {'columns', 'rows'} analysis result
+        
+        Returns:
+            bool: False if the result failed validation and was not stored
+        """
+        if not validate_ai_response(result)['valid']:
+            return False
+        
+        digest = exact_hash(data)
+        self.results.set(digest, copy_result(result))
+        if self.perceptual_enabled:
+            phash = perceptual_hash(data, self.hash_size)
+            if phash is not None:
+                self.perceptual.set(phash, digest)
+        return True
+    
+    def analyze(self, data: bytes, analyze: Callable[[bytes], Dict[str, Any]],
+                confirm: Optional[Callable[[bytes, Dict[str, Any]], bool]] = None) -> Dict[str, Any]:
+        """
+        Returns the cached analysis of an image, calling the model on a
+        miss.
+        
+        Args:
+            data (bytes): Uploaded file content
+            analyze (callable): Vision model call returning {'columns', 'rows'}
+            confirm (callable, optional): confirm(data, candidate) checks a
+                perceptual candidate against this upload (e.g. by OCR
+                text); without it candidates are never used
+        
+        Returns:
+            dict: Analysis result with a 'cache' key of 'exact',
+            'perceptual' (a confirmed candidate) or 'miss'
+        """
+        result, match = self.get(data)
+        if result is not None:
+            return {**result, 'cache': match}
+        
+        if confirm is not None:
+            candidate = self.candidate(data)
+            if candidate is not None and confirm(data, candidate):
+                with self._lock:
+                    self.perceptual_confirmed += 1
+                metrics.increment('image_cache.confirmed')
+                self.put(data, candidate)
+                return {**candidate, 'cache': 'perceptual'}
+        
+        result = analyze(data)
+        self.put(data, result)
+        return {**result, 'cache': 'miss'}
+    
+    def clear(self):
+        """
+        Drops every cached result; counters are kept.
+        """
+        self.results.clear()
+        self.perceptual.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the cache counters.
+        
+        Returns:
+            dict: exact_hits, misses, exact hit_rate,
+            perceptual_candidates and perceptual_confirmed,
+            perceptual_enabled and the TTLCache stats of both levels
+        """
+        with self._lock:
+            exact_hits, misses = self.exact_hits, self.misses
+            candidates, confirmed = self.perceptual_candidates, self.perceptual_confirmed
+        lookups = exact_hits + misses
+        return {
+            'exact_hits': exact_hits,
+            'misses': misses,
+            'hit_rate': exact_hits / lookups if lookups else 0.0,
+            'perceptual_candidates': candidates,
+            'perceptual_confirmed': confirmed,
+            'perceptual_enabled': self.perceptual_enabled,
+            'results': self.results.stats(),
+            'perceptual': self.perceptual.stats()
+        }
@@ -0,0 +1,265 @@
+"""
+EC - AI Cost Estimation System
+Metrics Module
+
+Lightweight instrumentation for the cost-sheet pipeline: timing spans,
+counters and histograms delivered to pluggable sinks. With no sink
+attached every call returns immediately, so instrumentation can stay in
+hot paths.
+
+Example:
+    from metrics import add_sink, PrometheusSink
+    
+    sink = add_sink(PrometheusSink())
+    generate_cost_sheet(columns, rows)
+    print(sink.render())
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional, TextIO
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+# Buckets for histograms whose name ends in 'bytes'
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+# Shared no-op context returned by span() while metrics are disabled
+_NULL_SPAN = nullcontext()
+
+class LoggingSink:
+    """
+    Writes every metric event to a logger.
+    """
+    
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        """
+        Args:
+            logger (Logger, optional): Target logger, defaults to 'metrics'
+            level (int): Log level of the records
+        """
+        self.logger = logger or logging.getLogger('metrics')
+        self.level = level
+    
+    def emit(self, event: Dict[str, Any]):
+        labels = ''.join(f" {key}={value}" for key, value in event['labels'].items())
+        self.logger.log(self.level, f"{event['type']} {event['name']}={event['value']:.6g}{labels}")
+
+class JsonLinesSink:
+    """
+    Appends every metric event as one JSON object per line.
+    """
+    
+    def __init__(self, stream: TextIO):
+        """
+        Args:
+            stream (file): Writable text stream, e.g. open('metrics.jsonl', 'a')
+        """
+        self.stream = stream
+        self._lock = threading.Lock()
+    
+    def emit(self, event: Dict[str, Any]):
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+class PrometheusSink:
+    """
+    Aggregates events in memory and renders the Prometheus text format.
+    
+    Spans are exported as histograms named '<name>_seconds'.
+    """
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS, size_buckets=SIZE_BUCKETS):
+        """
+        Args:
+            buckets (tuple): Upper bounds of the histogram buckets
+            size_buckets (tuple): Upper bounds for '*bytes' histograms
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.size_buckets = tuple(sorted(size_buckets))
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+    
+    def emit(self, event: Dict[str, Any]):
+        name = re.sub(r'[^a-zA-Z0-9_]', '_', event['name'])
+        labels = tuple(sorted(event['labels'].items()))
+        
+        with self._lock:
+            if event['type'] == 'counter':
+                key = (name + '_total', labels)
+                self.counters[key] = self.counters.get(key, 0) + event['value']
+                return
+            
+            if event['type'] == 'span':
+                name += '_seconds'
+            key = (name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                bounds = self.size_buckets if name.endswith('bytes') else self.buckets
+                histogram = {'bounds': bounds, 'buckets': [0] * len(bounds), 'count': 0, 'sum': 0.0}
+                self.histograms[key] = histogram
+            for i, bound in enumerate(histogram['bounds']):
+                if event['value'] <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['count'] += 1
+            histogram['sum'] += event['value']
+    
+    def render(self) -> str:
+        """
+        Renders all aggregated metrics.
+        
+        Returns:
+            str: Prometheus text exposition format
+        """
+        lines = []
+        typed = set()
+        
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                for bound, count in zip(histogram['bounds'], histogram['buckets']):
+                    bucket_labels = labels + (('le', repr(float(bound))),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+                inf_labels = labels + (('le', '+Inf'),)
+                lines.append(f"{name}_bucket{_format_labels(inf_labels)} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(labels) -> str:
+    """
+    Formats label pairs as {key="value",...}.
+    """
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + pairs + '}'
+
+class Metrics:
+    """
+    Dispatches spans, counters and histogram observations to sinks.
+    """
+    
+    def __init__(self):
+        self.sinks: List[Any] = []
+    
+    @property
+    def enabled(self) -> bool:
+        """True when at least one sink is attached."""
+        return bool(self.sinks)
+    
+    def add_sink(self, sink):
+        """
+        Attaches a sink; any object with an emit(event) method works.
+        
+        Args:
+            sink: Sink instance
+        
+        Returns:
+            The sink, for chaining
+        """
+        self.sinks = self.sinks + [sink]
+        return sink
+    
+    def remove_sink(self, sink):
+        """
+        Detaches a sink.
+        
+        Args:
+            sink: Sink previously passed to add_sink()
+        """
+        self.sinks = [s for s in self.sinks if s is not sink]
+    
+    def clear_sinks(self):
+        """
+        Detaches all sinks, disabling metrics.
+        """
+        self.sinks = []
+    
+    def _emit(self, event_type: str, name: str, value: float, labels: Dict[str, Any]):
+        event = {
+            'type': event_type,
+            'name': name,
+            'value': value,
+            'labels': labels,
+            'timestamp': time.time()
+        }
+        for sink in self.sinks:
+            sink.emit(event)
+    
+    def span(self, name: str, **labels):
+        """
+        Times a block of code.
+        
+        Args:
+            name (str): Span name, e.g. 'cost_sheet.save'
+            **labels: Extra dimensions attached to the measurement
+        
+        Returns:
+            Context manager; a shared no-op while metrics are disabled
+        """
+        if not self.sinks:
+            return _NULL_SPAN
+        return self._span(name, labels)
+    
+    @contextmanager
+    def _span(self, name: str, labels: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._emit('span', name, time.perf_counter() - start, labels)
+    
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        Increments a counter.
+        
+        Args:
+            name (str): Counter name
+            value (float): Amount to add
+            **labels: Extra dimensions
+        """
+        if self.sinks:
+            self._emit('counter', name, value, labels)
+    
+    def observe(self, name: str, value: float, **labels):
+        """
+        Records one histogram observation.
+        
+        Args:
+            name (str): Histogram name
+            value (float): Observed value
+            **labels: Extra dimensions
+        """
+        if self.sinks:
+            self._emit('histogram', name, value, labels)
+
+# Process-wide instance used by the pipeline
+metrics = Metrics()
+
+span = metrics.span
+increment = metrics.increment
+observe = metrics.observe
+add_sink = metrics.add_sink
+remove_sink = metrics.remove_sink
+clear_sinks = metrics.clear_sinks
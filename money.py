@@ -0,0 +1,243 @@
+"""
+EC - AI Cost Estimation System
+Money Module
+
+Fixed-point arithmetic for prices and totals. Amounts are int64 satang
+(1/100 baht) and quantities int64 millionths, so line totals, section
+sums and grand totals are exact integers. Rounding is half-up (away from
+zero) everywhere, and floats are only produced at the end, for Excel
+cells formatted with MONEY_FORMAT.
+
+Arrays come with a boolean 'valid' mask, as integers cannot hold NaN.
+"""
+
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from styles import NUMBER_FORMAT
+
+# Minor units per baht
+SATANG = 100
+
+# Fixed-point scale of quantities (6 decimals, like OCR'd W × L products)
+QUANTITY_SCALE = 10 ** 6
+
+# Excel format of money cells, same as other number cells
+MONEY_FORMAT = NUMBER_FORMAT
+
+MONEY_DTYPE = np.int64
+
+# Thousands separators, currency sign and spaces in amount text
+_AMOUNT_NOISE = re.compile(r'[,\s฿]')
+
+def parse_fixed(value: Any, scale: int) -> Optional[int]:
+    """
+    Converts one value to an integer count of 1/scale units, rounding
+    half-up.
+    
+    Text and floats are read through their decimal representation, so
+    '1.005' and 1.005 both give 101 satang.
+    
+    Args:
+        value (any): Number or text such as '1,200.50' or '฿950'
+        scale (int): Units per whole, e.g. SATANG
+    
+    Returns:
+        int: Scaled value, None when the value is missing or not a number
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value) * scale
+    if isinstance(value, (float, np.floating)):
+        text = repr(float(value))
+    else:
+        text = _AMOUNT_NOISE.sub('', str(value))
+        if text in ('', '-'):
+            return None
+    
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not number.is_finite():
+        return None
+    return int((number * scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def _round_floats(values: np.ndarray, scale: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized parse_fixed() for float arrays. Products are first rounded
+    to 6 decimals to drop binary noise (1.005 * 100 = 100.49999...),
+    which keeps the result equal to parse_fixed() for inputs with at
+    most 6 decimals.
+    """
+    valid = np.isfinite(values)
+    magnitude = np.abs(np.where(valid, values, 0.0)) * scale
+    rounded = np.floor(np.round(magnitude, 6) + 0.5)
+    return (np.sign(values, where=valid, out=np.zeros_like(values)) * rounded).astype(MONEY_DTYPE), valid
+
+def to_fixed(values: Iterable[Any], scale: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts a column of values to scaled integers.
+    
+    Args:
+        values (iterable): Numbers, text or a float array (NaN = missing)
+        scale (int): Units per whole
+    
+    Returns:
+        tuple: (int64 array, bool valid mask); invalid slots hold 0
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+        return _round_floats(values, scale)
+    
+    values = list(values)
+    fixed = np.zeros(len(values), dtype=MONEY_DTYPE)
+    valid = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        parsed = parse_fixed(value, scale)
+        if parsed is not None:
+            fixed[i] = parsed
+            valid[i] = True
+    return fixed, valid
+
+def to_satang(values: Iterable[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts prices or totals to satang.
+    
+    Args:
+        values (iterable): Amounts in baht
+    
+    Returns:
+        tuple: (int64 satang, bool valid mask)
+    """
+    return to_fixed(values, SATANG)
+
+def to_quantity(values: Iterable[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts quantities to millionths.
+    
+    Args:
+        values (iterable): Quantities
+    
+    Returns:
+        tuple: (int64 millionths, bool valid mask)
+    """
+    return to_fixed(values, QUANTITY_SCALE)
+
+def divide_half_up(numerators: np.ndarray, divisor: int) -> np.ndarray:
+    """
+    Integer division rounding half away from zero.
+    
+    Args:
+        numerators (ndarray): int64 values
+        divisor (int): Positive divisor
+    
+    Returns:
+        ndarray: int64 quotients
+    """
+    return np.sign(numerators) * ((np.abs(numerators) + divisor // 2) // divisor)
+
+def line_totals(quantities: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """
+    Computes quantity × unit price for every line. Arrays broadcast, so
+    a (scenarios × lines) price matrix against one quantity vector
+    gives every scenario at once.
+    
+    Args:
+        quantities (ndarray): int64 millionths, see to_quantity()
+        prices (ndarray): int64 satang, see to_satang()
+    
+    Returns:
+        ndarray: int64 satang, rounded half-up
+    
+    Raises:
+        OverflowError: If a total does not fit in int64
+    """
+    quantities = np.asarray(quantities, dtype=MONEY_DTYPE)
+    prices = np.asarray(prices, dtype=MONEY_DTYPE)
+    largest = int(np.abs(quantities).max(initial=0)) * int(np.abs(prices).max(initial=0))
+    if largest < 2 ** 63:
+        return divide_half_up(quantities * prices, QUANTITY_SCALE)
+    
+    # Products beyond int64: exact Python integers, slower but rare
+    quantities, prices = np.broadcast_arrays(quantities, prices)
+    half = QUANTITY_SCALE // 2
+    totals = []
+    for quantity, price in zip(quantities.ravel().tolist(), prices.ravel().tolist()):
+        product = quantity * price
+        total = (abs(product) + half) // QUANTITY_SCALE
+        totals.append(-total if product < 0 else total)
+    return np.array(totals, dtype=MONEY_DTYPE).reshape(quantities.shape)
+
+def section_totals(amounts: np.ndarray, sections: Iterable[Any],
+                   valid: Optional[np.ndarray] = None) -> Dict[Any, int]:
+    """
+    Sums amounts per section, e.g. per component type code.
+    
+    Args:
+        amounts (ndarray): int64 satang
+        sections (iterable): Section key of every line
+        valid (ndarray, optional): Lines to include, all by default
+    
+    Returns:
+        dict: Section key -> total satang, in sorted key order
+    """
+    amounts = np.asarray(amounts, dtype=MONEY_DTYPE)
+    keys, inverse = np.unique(np.asarray(list(sections), dtype=object).astype(str), return_inverse=True)
+    if valid is not None:
+        amounts = np.where(valid, amounts, 0)
+    totals = np.zeros(len(keys), dtype=MONEY_DTYPE)
+    np.add.at(totals, inverse, amounts)
+    return {key: int(total) for key, total in zip(keys.tolist(), totals.tolist())}
+
+def grand_total(amounts: np.ndarray, valid: Optional[np.ndarray] = None) -> int:
+    """
+    Sums amounts exactly.
+    
+    Args:
+        amounts (ndarray): int64 satang
+        valid (ndarray, optional): Lines to include, all by default
+    
+    Returns:
+        int: Total satang
+    """
+    amounts = np.asarray(amounts, dtype=MONEY_DTYPE)
+    if valid is not None:
+        amounts = amounts[valid]
+    return int(amounts.sum())
+
+def to_baht(amounts: np.ndarray, valid: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Converts satang to float baht for number cells written with
+    MONEY_FORMAT.
+    
+    Args:
+        amounts (ndarray): int64 satang
+        valid (ndarray, optional): Mask; invalid lines become NaN
+    
+    Returns:
+        ndarray: float64 baht
+    """
+    baht = np.asarray(amounts, dtype=MONEY_DTYPE) / SATANG
+    if valid is not None:
+        baht = np.where(valid, baht, np.nan)
+    return baht
+
+def format_money(amount: int, separator: str = '') -> str:
+    """
+    Formats satang as a 2-decimal amount without float rounding.
+    
+    Args:
+        amount (int): Satang
+        separator (str): Thousands separator, e.g. ','
+    
+    Returns:
+        str: Amount such as '1200.50'
+    """
+    amount = int(amount)
+    whole, fraction = divmod(abs(amount), SATANG)
+    sign = '-' if amount < 0 else ''
+    return f"{sign}{whole:,}.{fraction:02d}".replace(',', separator)
@@ -0,0 +1,515 @@
+"""
+EC - AI Cost Estimation System
+Pipeline Module
+
+Runs the cost estimation workflow locally as an async DAG instead of the
+Dify node chain:
+
+    START -> OCR & OBJECT ANALYSIS ----------------> PRICE-KNOWLEDGE
+          -> KNOWLEDGE RETRIEVAL (price list load) ----^        |
+          -> TEMPLATE WARM-UP ------------------> SEND TO CREATE EXCEL
+          -> STORAGE CONNECT ---------------------> CONVERT TO URL FILE -> ANSWER
+
+Every node starts as soon as its dependencies finish, so the price-list
+load, template warm-up and storage connection overlap the vision calls.
+Each node is timed under its Dify label; format_timings() prints the
+same per-node view the Dify run log shows.
+
+The vision model, pricing model, Excel service (Windmill) and storage
+are pluggable through PipelineServices. The models are always passed
+explicitly: PipelineServices.mock() wires in the local stand-ins, and
+such runs are marked as mock in the answer, file name and result.
+"""
+
+import asyncio
+import inspect
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from analysis import MockVisionModel, analyze_images
+from category_pricing import get_price_slices, price_categories
+from config import Config
+from excel import generate_cost_sheet, get_compiled_template
+from hybrid_pricing import MockPricingModel
+from metrics import metrics
+from preprocess import preprocess_images
+from price_source import get_price_source
+
+# Prefixed to the answer of runs with stand-in models
+MOCK_NOTICE = "MOCK RUN - rows and prices come from local stand-in models, not an estimate."
+
+class NodeSkipped(Exception):
+    """Raised for a node whose dependency failed or was skipped."""
+
+class PipelineNode:
+    """
+    One step of the DAG.
+    
+    func receives the run context and a dict of dependency outputs keyed
+    by node name. Coroutine functions are awaited; plain functions run
+    in a worker thread so they never block the event loop.
+    """
+    
+    def __init__(self, name: str, func: Callable, deps: Sequence[str] = (),
+                 label: Optional[str] = None, retries: int = 0):
+        """
+        Args:
+            name (str): Node name, referenced by dependents
+            func (callable): func(context, inputs) -> output dict
+            deps (sequence): Names of the nodes it waits for
+            label (str, optional): Display name, defaults to name
+            retries (int): Extra attempts after a failure
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.label = label or name
+        self.retries = retries
+
+class Pipeline:
+    """
+    Async DAG executor with per-node timing.
+    """
+    
+    def __init__(self, nodes: List[PipelineNode]):
+        """
+        Args:
+            nodes (list): Nodes in display order
+        
+        Raises:
+            ValueError: On duplicate names, unknown dependencies or cycles
+        """
+        self.nodes = {}
+        for node in nodes:
+            if node.name in self.nodes:
+                raise ValueError(f"Duplicate pipeline node: {node.name}")
+            self.nodes[node.name] = node
+        for node in nodes:
+            for dep in node.deps:
+                if dep not in self.nodes:
+                    raise ValueError(f"Node {node.name} depends on unknown node {dep}")
+        self.order = self._topological_order()
+    
+    def _topological_order(self) -> List[str]:
+        order = []
+        state = {}
+        
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Pipeline cycle: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dep in self.nodes[name].deps:
+                visit(dep, path + [name])
+            state[name] = 'done'
+            order.append(name)
+        
+        for name in self.nodes:
+            visit(name, [])
+        return order
+    
+    async def run(self, context: Any) -> Dict[str, Any]:
+        """
+        Runs every node once, each as soon as its dependencies are done.
+        
+        Args:
+            context: Passed to every node function
+        
+        Returns:
+            dict: Result with success, node 'outputs', per-node 'timings'
+            in display order (label, status 'succeeded' / 'failed' /
+            'skipped', 'start' offset and 'elapsed' in seconds, attempts,
+            tokens and error), 'errors', 'elapsed' wall time and
+            'sequential', the summed node time a strict chain would take
+        """
+        start = time.perf_counter()
+        tasks: Dict[str, asyncio.Future] = {}
+        timings: Dict[str, Dict[str, Any]] = {}
+        
+        async def execute(node):
+            inputs = {}
+            for dep in node.deps:
+                try:
+                    inputs[dep] = await tasks[dep]
+                except Exception:
+                    timings[node.name] = {'label': node.label, 'status': 'skipped',
+                                          'start': None, 'elapsed': 0.0, 'attempts': 0}
+                    raise NodeSkipped(f"{dep} did not succeed")
+            
+            started = time.perf_counter()
+            attempts = 0
+            while True:
+                attempts += 1
+                try:
+                    with metrics.span('pipeline.node', node=node.name):
+                        if inspect.iscoroutinefunction(node.func):
+                            output = await node.func(context, inputs)
+                        else:
+                            output = await asyncio.to_thread(node.func, context, inputs)
+                    break
+                except Exception as e:
+                    if attempts > node.retries:
+                        timings[node.name] = {
+                            'label': node.label, 'status': 'failed',
+                            'start': started - start, 'elapsed': time.perf_counter() - started,
+                            'attempts': attempts, 'error': str(e)
+                        }
+                        metrics.increment('pipeline.failed', node=node.name)
+                        raise
+            
+            elapsed = time.perf_counter() - started
+            timings[node.name] = {
+                'label': node.label, 'status': 'succeeded',
+                'start': started - start, 'elapsed': elapsed, 'attempts': attempts,
+                'tokens': output.get('tokens') if isinstance(output, dict) else None
+            }
+            metrics.observe('pipeline.node_seconds', elapsed, node=node.name)
+            return output
+        
+        # Dependencies first, so every awaited task already exists
+        for name in self.order:
+            tasks[name] = asyncio.ensure_future(execute(self.nodes[name]))
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        
+        outputs = {}
+        errors = {}
+        for name, task in tasks.items():
+            error = task.exception()
+            if error is None:
+                outputs[name] = task.result()
+            elif not isinstance(error, NodeSkipped):
+                errors[name] = str(error)
+        
+        return {
+            'success': len(outputs) == len(self.nodes),
+            'outputs': outputs,
+            'timings': {name: timings[name] for name in self.nodes},
+            'errors': errors,
+            'elapsed': time.perf_counter() - start,
+            'sequential': sum(timing['elapsed'] for timing in timings.values())
+        }
+
+class LocalExcelService:
+    """
+    Local stand-in for the Windmill 'create Excel' flow: generates the
+    workbook in process.
+    """
+    
+    def create(self, columns: List[str], rows: List[List[Any]],
+               price_version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Args:
+            columns (list): Priced column headers
+            rows (list): Priced rows
+            price_version (str, optional): Price snapshot of the rows
+        
+        Returns:
+            dict: generate_cost_sheet() result with the xlsx under 'content'
+        """
+        return generate_cost_sheet(columns, rows, output='bytes', price_version=price_version)
+
+class LocalStorage:
+    """
+    Local stand-in for the file storage: writes files to a directory and
+    returns file:// URLs.
+    """
+    
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory (str, optional): Target directory, defaults to
+                Config.PIPELINE['storage_dir']
+        """
+        self.directory = Path(directory or Config.PIPELINE['storage_dir'])
+    
+    def connect(self):
+        """Creates the target directory."""
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def upload(self, filename: str, content: bytes) -> str:
+        """
+        Args:
+            filename (str): File name
+            content (bytes): File content
+        
+        Returns:
+            str: URL of the stored file
+        """
+        path = self.directory / filename
+        path.write_bytes(content)
+        return path.resolve().as_uri()
+
+class PipelineServices:
+    """
+    External services of one pipeline.
+    
+    vision_model follows analysis.py, pricing_model hybrid_pricing.py;
+    excel_service needs create(columns, rows, price_version) returning a
+    generate_cost_sheet()-style result with 'content', and storage needs
+    connect() and upload(filename, content) returning a URL.
+    """
+    
+    def __init__(self, vision_model, pricing_model, excel_service=None,
+                 storage=None, price_path: Optional[str] = None, image_cache=None,
+                 preprocess: bool = True, mock: bool = False):
+        """
+        Args:
+            vision_model: Vision model of OCR & OBJECT ANALYSIS
+            pricing_model: Model of PRICE-KNOWLEDGE
+            excel_service (optional): Defaults to LocalExcelService
+            storage (optional): Defaults to LocalStorage
+            price_path (str, optional): Price file, defaults to
+                Config.PRICE_DATABASE['path']
+            image_cache (ImageAnalysisCache, optional): Used by OCR
+            preprocess (bool): Run preprocess_images() before the vision
+                model; turn off when uploads are not decodable images
+            mock (bool): The models are stand-ins; the output is marked
+        
+        Raises:
+            ValueError: If a model is missing
+        """
+        if vision_model is None or pricing_model is None:
+            raise ValueError("vision_model and pricing_model are required; "
+                             "use PipelineServices.mock() for local runs")
+        self.vision_model = vision_model
+        self.pricing_model = pricing_model
+        self.mock = mock
+        self.excel_service = excel_service or LocalExcelService()
+        self.storage = storage or LocalStorage()
+        self.price_path = price_path
+        self.image_cache = image_cache
+        self.preprocess = preprocess
+    
+    @classmethod
+    def mock(cls, vision_latency: float = 0.0, pricing_latency: float = 0.0,
+             **kwargs) -> 'PipelineServices':
+        """
+        Services with MockVisionModel and MockPricingModel, for local runs.
+        
+        Args:
+            vision_latency (float): Seconds each vision call sleeps
+            pricing_latency (float): Seconds each pricing call sleeps
+            **kwargs: Other PipelineServices options
+        
+        Returns:
+            PipelineServices: Services marked as mock
+        """
+        return cls(MockVisionModel(latency=vision_latency), MockPricingModel(latency=pricing_latency),
+                   mock=True, **kwargs)
+
+def _start(context, inputs):
+    if not context['uploads']:
+        raise ValueError("No files uploaded")
+    return {'files': len(context['uploads'])}
+
+async def _ocr(context, inputs):
+    services = context['services']
+    images = context['uploads']
+    tokens = None
+    dropped = []
+    # Upload index -> why it was left out (preprocessing or analysis)
+    skipped = {}
+    if services.preprocess:
+        prepared = await asyncio.to_thread(preprocess_images, images)
+        skipped.update(prepared.get('errors', {}))
+        if not prepared['success']:
+            raise RuntimeError(prepared['error'])
+        images = prepared['images']
+        tokens = prepared['report']['tokens_after']
+        dropped = prepared['dropped']
+    
+    result = await analyze_images(images, services.vision_model, cache=services.image_cache)
+    for index, error in result['errors'].items():
+        image = images[index]
+        if isinstance(image, dict) and image['tile'] is not None:
+            error = f"tile {image['tile']}: {error}"
+        skipped.setdefault(image['source'] if isinstance(image, dict) else index, f"Analysis failed: {error}")
+    if not result['success']:
+        raise RuntimeError(result['validation']['errors'] or result['errors'] or result['message'])
+    if skipped and not Config.PIPELINE['allow_partial_ocr']:
+        raise RuntimeError('; '.join(f"upload {index + 1}: {error}" for index, error in sorted(skipped.items())))
+    return {'columns': result['columns'], 'rows': result['rows'], 'tokens': tokens,
+            'dropped': dropped, 'skipped': dict(sorted(skipped.items())), 'analysis': result}
+
+def _retrieval(context, inputs):
+    snapshot = get_price_source(context['services'].price_path).current()
+    # Cut and index the per-category slices now, not inside PRICING
+    slices = get_price_slices(snapshot.table)
+    return {'snapshot': snapshot, 'entries': len(snapshot.table), 'slices': len(slices)}
+
+def _template(context, inputs):
+    return {'header_rows': len(get_compiled_template())}
+
+def _storage(context, inputs):
+    context['services'].storage.connect()
+    return {}
+
+async def _pricing(context, inputs):
+    ocr = inputs['ocr']
+    snapshot = inputs['retrieval']['snapshot']
+    result = await price_categories(ocr['columns'], ocr['rows'], snapshot.table,
+                                    context['services'].pricing_model)
+    if not result['success']:
+        raise RuntimeError('; '.join(f"{key}: {error}" for key, error in result['errors'].items()))
+    return {'columns': result['columns'], 'rows': result['rows'], 'split': result['split'],
+            'tokens': result['tokens']['prompt'], 'version': snapshot.version}
+
+def _excel(context, inputs):
+    pricing = inputs['pricing']
+    result = context['services'].excel_service.create(
+        pricing['columns'], pricing['rows'], pricing['version']
+    )
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    return {'filename': result['filename'], 'content': result['content']}
+
+def _url(context, inputs):
+    excel = inputs['excel']
+    filename = f"MOCK_{excel['filename']}" if context['services'].mock else excel['filename']
+    return {'url': context['services'].storage.upload(filename, excel['content'])}
+
+def _answer(context, inputs):
+    split = inputs['pricing']['split']
+    lines = [
+        f"Cost sheet: {inputs['url']['url']}",
+        f"{split.get('rows', 0)} rows, {split.get('local', 0)} priced from the price list, "
+        f"{split.get('model', 0)} by the model, {split.get('unpriced', 0)} unpriced"
+    ]
+    dropped = inputs['ocr']['dropped']
+    if dropped:
+        lines.append(f"Skipped duplicate uploads: {', '.join(str(entry['source'] + 1) for entry in dropped)}")
+    for index, error in inputs['ocr']['skipped'].items():
+        lines.append(f"Upload {index + 1} not estimated: {error}")
+    if context['services'].mock:
+        lines.insert(0, MOCK_NOTICE)
+    return {'answer': '\n'.join(lines)}
+
+def build_pipeline(retries: Optional[int] = None) -> Pipeline:
+    """
+    Declares the cost estimation DAG.
+    
+    Args:
+        retries (int, optional): Retries of the Excel node, defaults to
+            Config.PIPELINE['retries']
+    
+    Returns:
+        Pipeline: Nodes in Dify order, warm-up nodes after RETRIEVAL
+    """
+    retries = Config.PIPELINE['retries'] if retries is None else retries
+    return Pipeline([
+        PipelineNode('start', _start, label='START'),
+        PipelineNode('ocr', _ocr, ['start'], label='OCR & OBJECT ANALYSIS'),
+        PipelineNode('retrieval', _retrieval, ['start'], label='KNOWLEDGE RETRIEVAL'),
+        PipelineNode('template', _template, ['start'], label='TEMPLATE WARM-UP'),
+        PipelineNode('storage', _storage, ['start'], label='STORAGE CONNECT'),
+        PipelineNode('pricing', _pricing, ['ocr', 'retrieval'], label='PRICE-KNOWLEDGE'),
+        PipelineNode('excel', _excel, ['pricing', 'template'], label='SEND TO CREATE EXCEL',
+                     retries=retries),
+        PipelineNode('url', _url, ['excel', 'storage'], label='CONVERT TO URL FILE'),
+        PipelineNode('answer', _answer, ['url', 'pricing', 'ocr'], label='ANSWER')
+    ])
+
+async def run_pipeline(uploads: List[bytes], services: PipelineServices,
+                       pipeline: Optional[Pipeline] = None,
+                       timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Runs the cost estimation workflow for one request.
+    
+    Args:
+        uploads (list): Raw image files
+        services (PipelineServices): Models, Excel service and storage
+        pipeline (Pipeline, optional): Defaults to build_pipeline()
+        timeout (float, optional): Seconds for the whole run, defaults to
+            Config.PIPELINE['timeout']
+    
+    Returns:
+        dict: Pipeline.run() result plus 'answer' and 'url' when it
+        succeeded, or error and message; 'mock' tells whether stand-in
+        models produced it
+    """
+    pipeline = pipeline or build_pipeline()
+    context = {'uploads': list(uploads), 'services': services}
+    timeout = Config.PIPELINE['timeout'] if timeout is None else timeout
+    
+    try:
+        with metrics.span('pipeline.run'):
+            result = await asyncio.wait_for(pipeline.run(context), timeout)
+    except asyncio.TimeoutError:
+        return {
+            'success': False,
+            'error': f"Pipeline exceeded {timeout} seconds",
+            'message': 'Failed to run pipeline',
+            'mock': services.mock
+        }
+    
+    result['mock'] = services.mock
+    if result['success']:
+        result['answer'] = result['outputs']['answer']['answer']
+        result['url'] = result['outputs']['url']['url']
+        result['message'] = 'Pipeline completed successfully'
+    else:
+        result['error'] = '; '.join(f"{name}: {error}" for name, error in result['errors'].items())
+        result['message'] = 'Failed to run pipeline'
+    return result
+
+def run_cost_estimation(uploads: List[bytes], services: PipelineServices,
+                        pipeline: Optional[Pipeline] = None,
+                        timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Synchronous entry point for run_pipeline().
+    
+    Args:
+        uploads (list): Raw image files
+        services (PipelineServices): Models, Excel service and storage
+        pipeline (Pipeline, optional): Defaults to build_pipeline()
+        timeout (float, optional): Seconds for the whole run
+    
+    Returns:
+        dict: See run_pipeline()
+    """
+    return asyncio.run(run_pipeline(uploads, services, pipeline, timeout))
+
+def format_duration(seconds: float) -> str:
+    """
+    Formats a duration the way the Dify run log does.
+    
+    Args:
+        seconds (float): Duration
+    
+    Returns:
+        str: e.g. '36.882 ms' or '18.821 s'
+    """
+    if seconds < 1:
+        return f"{seconds * 1000:.3f} ms"
+    return f"{seconds:.3f} s"
+
+def format_timings(result: Dict[str, Any]) -> str:
+    """
+    Renders per-node timings, one line per node.
+    
+    Args:
+        result (dict): run_pipeline() result
+    
+    Returns:
+        str: Timing report with the wall time against a strict chain
+    """
+    lines = []
+    for timing in result.get('timings', {}).values():
+        if timing['status'] == 'skipped':
+            detail = 'skipped'
+        else:
+            detail = f"{format_duration(timing['elapsed'])} (at +{format_duration(timing['start'])})"
+            if timing['status'] == 'failed':
+                detail += f" failed: {timing.get('error')}"
+            elif timing['attempts'] > 1:
+                detail += f", {timing['attempts']} attempts"
+            if timing.get('tokens'):
+                detail += f", {timing['tokens']:,} tokens"
+        lines.append(f"{timing['label']:<24} {detail}")
+    if 'elapsed' in result:
+        lines.append(f"{'TOTAL':<24} {format_duration(result['elapsed'])} "
+                     f"(chained: {format_duration(result['sequential'])})")
+    return '\n'.join(lines)
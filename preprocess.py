@@ -0,0 +1,330 @@
+"""
+EC - AI Cost Estimation System
+Image Preprocessing Module
+
+Prepares uploads for OCR & OBJECT ANALYSIS so fewer pixels, and fewer
+vision tokens, reach the model: EXIF orientation is applied, whitespace
+borders are cropped, images are downsampled to Config.IMAGE_PREPROCESSING
+['max_side'] and re-encoded in one format. Oversized layout drawings are
+cut into overlapping tiles instead, so small text stays legible.
+Byte-identical uploads are dropped before they are decoded. Tiles are
+encoded in parallel, and a tile that fails to encode is reported in
+'errors' against its upload without failing the others.
+
+Near-duplicate detection by dHash is opt-in
+(Config.IMAGE_PREPROCESSING['duplicate_distance'] >= 0): pages of one
+component list share a layout and hash alike, so it can drop distinct
+pages. Every dropped upload is listed in the result's 'dropped'.
+
+Requires Pillow.
+"""
+
+import io
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+from image_cache import exact_hash, hamming_distance, image_dhash
+from metrics import metrics
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional for the rest of the system
+    Image = None
+
+def estimate_tokens(width: int, height: int, settings: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Estimates the vision tokens of one image: a single unit when both
+    sides fit token_small_side, otherwise one unit per token_tile_side
+    tile.
+    
+    Args:
+        width (int): Width in pixels
+        height (int): Height in pixels
+        settings (dict, optional): Defaults to Config.IMAGE_PREPROCESSING
+    
+    Returns:
+        int: Estimated tokens
+    """
+    settings = settings or Config.IMAGE_PREPROCESSING
+    if width <= settings['token_small_side'] and height <= settings['token_small_side']:
+        return settings['tokens_per_tile']
+    tile = settings['token_tile_side']
+    return math.ceil(width / tile) * math.ceil(height / tile) * settings['tokens_per_tile']
+
+def normalize_image(image):
+    """
+    Applies the EXIF orientation and flattens transparency onto white.
+    
+    Args:
+        image (PIL.Image): Decoded upload
+    
+    Returns:
+        PIL.Image: Upright RGB image
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+def content_box(image, threshold: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Finds the bounding box of pixels darker than threshold.
+    
+    Args:
+        image (PIL.Image): Image to scan
+        threshold (int): Gray level (0-255) counted as background
+    
+    Returns:
+        tuple: (left, top, right, bottom), None when the image is blank
+    """
+    return image.convert('L').point(lambda level: 255 if level < threshold else 0).getbbox()
+
+def autocrop(image, threshold: int, margin: int):
+    """
+    Crops borders lighter than threshold, keeping margin pixels around
+    the content.
+    
+    Args:
+        image (PIL.Image): RGB image
+        threshold (int): Gray level (0-255) counted as background
+        margin (int): Pixels kept around the content
+    
+    Returns:
+        PIL.Image: Cropped image; unchanged when it is blank
+    """
+    box = content_box(image, threshold)
+    if box is None:
+        return image
+    left, top, right, bottom = box
+    return image.crop((
+        max(left - margin, 0), max(top - margin, 0),
+        min(right + margin, image.width), min(bottom + margin, image.height)
+    ))
+
+def tile_boxes(width: int, height: int, size: int, overlap: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Splits an image into overlapping size × size tiles.
+    
+    Args:
+        width (int): Image width
+        height (int): Image height
+        size (int): Tile side
+        overlap (int): Pixels shared by neighbouring tiles
+    
+    Returns:
+        list: (left, top, right, bottom) boxes, row by row
+    """
+    step = max(size - overlap, 1)
+    
+    def starts(length):
+        positions = list(range(0, max(length - size, 0) + 1, step))
+        if positions[-1] + size < length:
+            positions.append(length - size)
+        return positions
+    
+    return [
+        (left, top, min(left + size, width), min(top + size, height))
+        for top in starts(height) for left in starts(width)
+    ]
+
+def _prepare(index: int, data: bytes, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Decodes, straightens and crops one upload and plans its tiles.
+    """
+    with Image.open(io.BytesIO(data)) as upload:
+        original = upload.size
+        image = normalize_image(upload)
+    image = autocrop(image, settings['whitespace_threshold'], settings['crop_margin'])
+    
+    if max(image.size) > settings['tile_threshold']:
+        boxes = tile_boxes(image.width, image.height, settings['max_side'], settings['tile_overlap'])
+    else:
+        boxes = [None]
+    
+    return {'index': index, 'original': original, 'image': image, 'boxes': boxes}
+
+def _encode(image, box, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Crops one tile (or takes the whole image), downsamples and encodes
+    it. Blank tiles are not encoded.
+    """
+    part = image.crop(box) if box is not None else image.copy()
+    if box is not None and content_box(part, settings['whitespace_threshold']) is None:
+        return None
+    part.thumbnail((settings['max_side'], settings['max_side']), Image.LANCZOS)
+    
+    buffer = io.BytesIO()
+    if settings['format'] == 'JPEG':
+        part.save(buffer, 'JPEG', quality=settings['jpeg_quality'], optimize=True)
+    else:
+        part.save(buffer, settings['format'], optimize=True)
+    
+    return {
+        'data': buffer.getvalue(),
+        'width': part.width,
+        'height': part.height,
+        'dhash': image_dhash(part)
+    }
+
+def preprocess_images(uploads: List[bytes], settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Runs the preprocessing stage over one request's uploads.
+    
+    Args:
+        uploads (list): Raw image files
+        settings (dict, optional): Overrides for Config.IMAGE_PREPROCESSING
+    
+    Returns:
+        dict: Result with success, 'images' to send to the model (each
+        with 'data', 'source' upload index, 'tile' box or None, 'width'
+        and 'height'), per-upload 'errors', the uploads 'dropped' as
+        duplicates (source, duplicate_of, match 'exact' / 'near',
+        distance), a 'report' with pixel and token totals before and
+        after, and message
+    """
+    if Image is None:
+        return {
+            'success': False,
+            'error': 'Pillow is not installed',
+            'message': 'Failed to preprocess images'
+        }
+    
+    settings = {**Config.IMAGE_PREPROCESSING, **(settings or {})}
+    start = time.perf_counter()
+    errors = {}
+    
+    limits = Config.FILE_UPLOAD
+    if len(uploads) > limits['max_files']:
+        for index in range(limits['max_files'], len(uploads)):
+            errors[index] = f"More than {limits['max_files']} files per request"
+    accepted = []
+    unique = []
+    seen_hashes = {}
+    copies = {}
+    dropped = []
+    for index, data in enumerate(uploads[:limits['max_files']]):
+        if len(data) > limits['max_file_size'] * 1024 * 1024:
+            errors[index] = f"File exceeds {limits['max_file_size']} MB"
+            continue
+        accepted.append((index, data))
+        # Exact duplicates are matched on the upload bytes, before any decoding
+        digest = exact_hash(data)
+        if digest in seen_hashes:
+            original = seen_hashes[digest]
+            copies[original] = copies.get(original, 0) + 1
+            dropped.append({'source': index, 'duplicate_of': original, 'match': 'exact', 'distance': 0})
+            continue
+        seen_hashes[digest] = index
+        unique.append((index, data))
+    
+    with metrics.span('preprocess.images'), ThreadPoolExecutor(settings['max_workers']) as executor:
+        # Decode and crop uploads in parallel, then encode every tile in parallel
+        prepared = []
+        futures = [executor.submit(_prepare, index, data, settings) for index, data in unique]
+        for (index, _), future in zip(unique, futures):
+            try:
+                prepared.append(future.result())
+            except Exception as e:
+                errors[index] = f"Unreadable image: {e}"
+        
+        tasks = [(item, box) for item in prepared for box in item['boxes']]
+        futures = [executor.submit(_encode, item['image'], box, settings) for item, box in tasks]
+        encoded = []
+        for (item, box), future in zip(tasks, futures):
+            try:
+                encoded.append((item, box, future.result()))
+            except Exception as e:
+                part = 'image' if box is None else f"tile {box}"
+                errors.setdefault(item['index'], f"Failed to encode {part}: {e}")
+    
+    images = []
+    kept_dhashes = []
+    duplicates = len(dropped)
+    blank_tiles = 0
+    for item, box, output in encoded:
+        if output is None:
+            blank_tiles += 1
+            continue
+        # Near-duplicate matching only between whole images: tiles of one
+        # drawing can look alike without repeating content
+        if box is None and settings['duplicate_distance'] >= 0:
+            duplicate_of = None
+            for other, source in kept_dhashes:
+                distance = hamming_distance(output['dhash'], other)
+                if distance <= settings['duplicate_distance']:
+                    duplicate_of = source
+                    break
+            if duplicate_of is not None:
+                duplicates += 1
+                dropped.append({
+                    'source': item['index'],
+                    'duplicate_of': duplicate_of,
+                    'match': 'near',
+                    'distance': distance
+                })
+                continue
+            kept_dhashes.append((output['dhash'], item['index']))
+        images.append({
+            'data': output['data'],
+            'source': item['index'],
+            'tile': box,
+            'width': output['width'],
+            'height': output['height']
+        })
+    
+    # Exact duplicates were never decoded: count them at their original's size
+    pixels_before = sum(
+        item['original'][0] * item['original'][1] * (1 + copies.get(item['index'], 0))
+        for item in prepared
+    )
+    tokens_before = sum(
+        estimate_tokens(*item['original'], settings) * (1 + copies.get(item['index'], 0))
+        for item in prepared
+    )
+    dropped.sort(key=lambda entry: entry['source'])
+    pixels_after = sum(image['width'] * image['height'] for image in images)
+    tokens_after = sum(estimate_tokens(image['width'], image['height'], settings) for image in images)
+    
+    report = {
+        'uploads': len(uploads),
+        'images_sent': len(images),
+        'tiles': sum(1 for image in images if image['tile'] is not None),
+        'duplicates_dropped': duplicates,
+        'near_duplicates_dropped': sum(1 for entry in dropped if entry['match'] == 'near'),
+        'blank_tiles_dropped': blank_tiles,
+        'bytes_before': sum(len(data) for _, data in accepted),
+        'bytes_after': sum(len(image['data']) for image in images),
+        'pixels_before': pixels_before,
+        'pixels_after': pixels_after,
+        'pixels_saved': pixels_before - pixels_after,
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'tokens_saved': tokens_before - tokens_after,
+        'elapsed': time.perf_counter() - start
+    }
+    metrics.increment('preprocess.pixels_saved', report['pixels_saved'])
+    metrics.increment('preprocess.tokens_saved', report['tokens_saved'])
+    
+    result = {
+        'success': bool(images) or not uploads,
+        'images': images,
+        'errors': errors,
+        'dropped': dropped,
+        'report': report,
+        'message': f"Prepared {len(images)} images from {len(uploads)} uploads, "
+                   f"about {report['tokens_saved']} vision tokens saved"
+    }
+    if report['near_duplicates_dropped']:
+        result['message'] += (
+            f"; dropped {report['near_duplicates_dropped']} near-duplicate uploads "
+            f"{[entry['source'] for entry in dropped if entry['match'] == 'near']}"
+        )
+    if not result['success']:
+        result['error'] = 'No usable images in the request'
+    return result
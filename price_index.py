@@ -0,0 +1,257 @@
+"""
+EC - AI Cost Estimation System
+Price Index Module
+
+In-process inverted index over price-list descriptions for fuzzy
+matching of OCR'd text such as "Printed vinyl" or "Wall panel".
+Documents and queries are split into character n-grams, which works for
+English words and for Thai text written without spaces alike, and
+candidates are ranked with BM25.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from pricing import PriceEntry, PriceTable, load_price_table
+from utils import normalize_text
+
+# Length of the character n-grams
+NGRAM_SIZE = 3
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Runs of Thai script; other words are split on whitespace
+THAI_RUN = re.compile(r'[฀-๿]+')
+
+# Indexes built per price table, see get_price_index()
+_index_cache = {}
+
+def tokenize(text: Any, ngram: int = NGRAM_SIZE) -> List[str]:
+    """
+    Splits text into index terms.
+    
+    Every word yields itself (prefixed 'w:') plus the character n-grams
+    of the word padded with spaces. Thai runs are separated from
+    adjacent Latin text first, so mixed strings such as 'ป้ายvinyl'
+    tokenize like 'ป้าย vinyl'.
+    
+    Args:
+        text (any): Text to tokenize
+        ngram (int): N-gram length
+    
+    Returns:
+        list: Terms, with repeats
+    """
+    normalized = THAI_RUN.sub(lambda m: f' {m.group(0)} ', normalize_text(text))
+    terms = []
+    for word in normalized.split():
+        terms.append('w:' + word)
+        padded = f' {word} '
+        if len(padded) <= ngram:
+            terms.append(padded)
+        else:
+            terms.extend(padded[i:i + ngram] for i in range(len(padded) - ngram + 1))
+    return terms
+
+def entry_text(entry: PriceEntry) -> str:
+    """
+    Text indexed for a price entry.
+    
+    Args:
+        entry (PriceEntry): Price-list item
+    
+    Returns:
+        str: Description followed by component
+    """
+    return f'{entry.description} {entry.component}'
+
+class PriceIndex:
+    """
+    BM25-ranked inverted index over price entries.
+    
+    Each posting stores its precomputed BM25 term weight, so a query is
+    one vectorized add per query term.
+    """
+    
+    def __init__(self, entries: List[PriceEntry], ngram: int = NGRAM_SIZE,
+                 k1: float = BM25_K1, b: float = BM25_B):
+        """
+        Args:
+            entries (list): Price entries to index
+            ngram (int): N-gram length
+            k1 (float): BM25 term-frequency saturation
+            b (float): BM25 length normalization
+        """
+        self.entries = entries
+        self.ngram = ngram
+        self.k1 = k1
+        self.b = b
+        
+        documents = [Counter(tokenize(entry_text(entry), ngram)) for entry in entries]
+        lengths = np.array([sum(doc.values()) for doc in documents], dtype=np.float64)
+        self.average_length = average = lengths.mean() if len(lengths) else 0.0
+        norms = k1 * (1 - b + b * lengths / average) if average else np.full(len(lengths), k1)
+        
+        postings = {}
+        for doc_id, doc in enumerate(documents):
+            for term, tf in doc.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(doc_id)
+                postings[term][1].append(tf * (k1 + 1) / (tf + norms[doc_id]))
+        
+        count = len(entries)
+        self.postings = {
+            term: (np.array(ids, dtype=np.int32), np.array(weights, dtype=np.float64))
+            for term, (ids, weights) in postings.items()
+        }
+        self.idf = {
+            term: math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            for term, (ids, _) in self.postings.items()
+        }
+        self.unseen_idf = math.log(1 + (count + 0.5) / 0.5)
+        
+        # Score of each entry's own text against itself, see search()
+        self.self_scores = np.zeros(count)
+        for term, (ids, weights) in self.postings.items():
+            self.self_scores[ids] += self.idf[term] * weights
+    
+    @classmethod
+    def from_price_table(cls, table: PriceTable, **kwargs) -> 'PriceIndex':
+        """
+        Indexes every entry of a price table.
+        
+        Args:
+            table (PriceTable): Loaded price list
+            **kwargs: PriceIndex options
+        
+        Returns:
+            PriceIndex: Built index
+        """
+        return cls(table.entries, **kwargs)
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def search(self, text: Any, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Ranks price entries against one query.
+        
+        Confidence is the score divided by the larger of two self-match
+        scores: the query scored against a document identical to itself,
+        and the entry's own text scored against the entry. An exact text
+        match is 1.0, and extra words on either side lower it, so it is
+        comparable across queries and entries.
+        
+        Args:
+            text (any): Query, e.g. a row's Description and Component
+            top_k (int): Maximum candidates
+        
+        Returns:
+            list: Candidates as {'entry', 'score', 'confidence'}, highest
+            confidence first
+        """
+        counts = Counter(tokenize(text, self.ngram))
+        if not counts or not self.entries:
+            return []
+        
+        # BM25 weights of the query's terms if it were an indexed document
+        length = sum(counts.values())
+        norm = self.k1 * (1 - self.b + self.b * length / self.average_length)
+        scores = np.zeros(len(self.entries))
+        query_score = 0.0
+        for term, tf in counts.items():
+            idf = self.idf.get(term)
+            query_score += (self.unseen_idf if idf is None else idf) * tf * (self.k1 + 1) / (tf + norm)
+            if idf is None:
+                continue
+            ids, weights = self.postings[term]
+            scores[ids] += idf * weights
+        
+        confidence = scores / np.maximum(self.self_scores, query_score)
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-confidence, top_k - 1)[:top_k]
+        top = top[np.argsort(-confidence[top], kind='stable')]
+        
+        return [
+            {
+                'entry': self.entries[i],
+                'score': float(scores[i]),
+                'confidence': float(confidence[i])
+            }
+            for i in top.tolist() if scores[i] > 0
+        ]
+    
+    def search_batch(self, queries: List[Any], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Ranks price entries for many queries.
+        
+        Args:
+            queries (list): Query texts
+            top_k (int): Maximum candidates per query
+        
+        Returns:
+            list: One candidate list per query, see search()
+        """
+        return [self.search(query, top_k) for query in queries]
+    
+    def candidates_for_rows(self, columns: List[str], rows: List[List[Any]],
+                            top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Ranks price candidates for cost-sheet rows by Description and
+        Component.
+        
+        Args:
+            columns (list): Column headers from AI analysis
+            rows (list): Positional data rows
+            top_k (int): Maximum candidates per row
+        
+        Returns:
+            list: One candidate list per row, see search()
+        """
+        index = {name: i for i, name in enumerate(columns)}
+        
+        def cell(row, name):
+            i = index.get(name)
+            return row[i] if i is not None and i < len(row) else ''
+        
+        queries = [f"{cell(row, 'Description')} {cell(row, 'Component')}" for row in rows]
+        return self.search_batch(queries, top_k)
+
+def get_price_index(table, entries: Optional[List[PriceEntry]] = None) -> PriceIndex:
+    """
+    Returns the index of a loaded price table, built once per table
+    object and shared across requests.
+    
+    Args:
+        table: PriceTable or MappedPriceTable
+        entries (list, optional): table.entries when the caller already
+            has them, so a MappedPriceTable is not decoded twice
+    
+    Returns:
+        PriceIndex: Built index
+    """
+    key = getattr(table, 'source', None) or id(table)
+    cached = _index_cache.get(key)
+    if cached is None or cached[0] is not table:
+        cached = (table, PriceIndex(entries if entries is not None else table.entries))
+        _index_cache[key] = cached
+    return cached[1]
+
+def load_price_index(path: Optional[str] = None) -> PriceIndex:
+    """
+    Returns the index for a price-list CSV, shared across requests and
+    rebuilt only when load_price_table() reloads the file.
+    
+    Args:
+        path (str, optional): CSV path, defaults to Config.PRICE_DATABASE
+    
+    Returns:
+        PriceIndex: Built index
+    """
+    return get_price_index(load_price_table(path))
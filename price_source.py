@@ -0,0 +1,353 @@
+"""
+EC - AI Cost Estimation System
+Price Source Module
+
+Versioned, hot-reloadable access to the price list. Each load produces
+an immutable PriceSnapshot; a background thread watches the file and
+swaps in a new snapshot when it changes. Callers take one snapshot at
+the start of a cost sheet and price every row against it, so a reload
+never changes prices halfway through a sheet.
+
+Example:
+    source = get_price_source().start()
+    snapshot = source.current()
+    priced = snapshot.price_rows(columns, rows)
+    generate_cost_sheet(priced['columns'], priced['rows'],
+                        price_version=snapshot.version)
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+from metrics import metrics
+from pricing import PriceTable, price_rows
+from price_store import MappedPriceTable
+
+# Loaded sources keyed by absolute path, see get_price_source()
+_sources = {}
+_sources_lock = threading.Lock()
+
+# Loads attempted while the file keeps changing underneath the loader
+RELOAD_ATTEMPTS = 3
+
+def file_version(path: str) -> str:
+    """
+    Content hash identifying one revision of a price file.
+    
+    Args:
+        path (str): Price file
+    
+    Returns:
+        str: First 16 hex digits of the file's SHA-256
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def default_loader(path: str):
+    """
+    Loads a price file by extension: compiled '.bin' stores are
+    memory-mapped, anything else is parsed as CSV.
+    
+    Args:
+        path (str): Price file
+    
+    Returns:
+        PriceTable or MappedPriceTable: Loaded table
+    """
+    if path.endswith('.bin'):
+        return MappedPriceTable(path)
+    return PriceTable.from_csv(path)
+
+def estimate_size(table) -> int:
+    """
+    Approximate heap bytes held by a loaded table.
+    
+    A mapped table lives in the shared page cache, so only its file size
+    is reported.
+    
+    Args:
+        table: PriceTable or MappedPriceTable
+    
+    Returns:
+        int: Estimated bytes
+    """
+    if isinstance(table, MappedPriceTable):
+        return os.path.getsize(table.source)
+    
+    seen = set()
+    total = 0
+    stack = [table.entries, table.by_list_id, table.by_key, table.by_description]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return total
+
+class PriceSnapshot:
+    """
+    One immutable revision of the price list.
+    
+    Attributes:
+        version (str): Content hash of the file, see file_version()
+        sequence (int): Load counter within the PriceSource, starting at 1
+        table: Loaded price table, never mutated after the swap
+        source (str): File the snapshot was loaded from
+        loaded_at (str): ISO timestamp of the load
+        load_seconds (float): Time spent loading
+        memory_bytes (int): Estimated size, see estimate_size()
+    """
+    
+    __slots__ = ('version', 'sequence', 'table', 'source', 'loaded_at',
+                 'load_seconds', 'memory_bytes', '_stamp')
+    
+    def __init__(self, version, sequence, table, source, load_seconds, memory_bytes, stamp):
+        self.version = version
+        self.sequence = sequence
+        self.table = table
+        self.source = source
+        self.loaded_at = datetime.now().isoformat()
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self._stamp = stamp
+    
+    def lookup(self, list_id: Any, component: Any, description: Any, unit: Any = None):
+        """
+        Resolves one row, see PriceTable.lookup().
+        """
+        return self.table.lookup(list_id, component, description, unit)
+    
+    def price_rows(self, columns: List[str], rows: List[List[Any]]) -> Dict[str, Any]:
+        """
+        Prices rows against this snapshot, see PriceTable.price_rows().
+        
+        Args:
+            columns (list): Column headers from AI analysis
+            rows (list): Positional data rows
+        
+        Returns:
+            dict: Priced rows and match statistics, plus 'price_version'
+        """
+        result = price_rows(self.table, columns, rows)
+        result['price_version'] = self.version
+        return result
+    
+    def info(self) -> Dict[str, Any]:
+        """
+        Returns the snapshot metadata.
+        
+        Returns:
+            dict: version, sequence, source, loaded_at, entries,
+            load_seconds and memory_bytes
+        """
+        return {
+            'version': self.version,
+            'sequence': self.sequence,
+            'source': self.source,
+            'loaded_at': self.loaded_at,
+            'entries': len(self.table),
+            'load_seconds': self.load_seconds,
+            'memory_bytes': self.memory_bytes
+        }
+
+class PriceSource:
+    """
+    Holds the current PriceSnapshot of a price file and reloads it when
+    the file changes.
+    
+    The snapshot reference is replaced in one assignment, so readers
+    always see either the old or the new snapshot, never a mix.
+    """
+    
+    def __init__(self, path: Optional[str] = None, loader: Callable[[str], Any] = default_loader,
+                 interval: Optional[float] = None):
+        """
+        Args:
+            path (str, optional): Price file, defaults to Config.PRICE_DATABASE
+            loader (callable): Builds a table from a path
+            interval (float, optional): Seconds between file checks,
+                defaults to Config.PRICE_DATABASE['reload_interval']
+        """
+        self.path = os.path.abspath(path or Config.PRICE_DATABASE['path'])
+        self.loader = loader
+        self.interval = interval if interval is not None else Config.PRICE_DATABASE['reload_interval']
+        self._snapshot = None
+        self._sequence = 0
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+        self._failed_stamp = None
+    
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    
+    def current(self) -> PriceSnapshot:
+        """
+        Returns the snapshot to price with, loading the file on first use.
+        
+        Returns:
+            PriceSnapshot: Current snapshot
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            result = self.reload()
+            if not result['success']:
+                raise RuntimeError(result['error'])
+            snapshot = self._snapshot
+        return snapshot
+    
+    def reload(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Loads the file into a new snapshot if it changed since the last
+        load. A failed load keeps the previous snapshot and is not
+        retried until the file changes again.
+        
+        Args:
+            force (bool): Reload even when the file looks unchanged
+        
+        Returns:
+            dict: Result with success, 'reloaded' flag, snapshot info and
+            message
+        """
+        with self._reload_lock:
+            stamp = None
+            try:
+                stamp = self._stamp()
+                previous = self._snapshot
+                if not force and stamp == self._failed_stamp:
+                    return {
+                        'success': False,
+                        'reloaded': False,
+                        'error': self.last_error,
+                        'message': 'Price list unchanged since the failed load'
+                    }
+                if previous is not None and not force and previous._stamp == stamp:
+                    return {
+                        'success': True,
+                        'reloaded': False,
+                        **previous.info(),
+                        'message': 'Price list unchanged'
+                    }
+                
+                start = time.perf_counter()
+                with metrics.span('pricing.reload'):
+                    for _ in range(RELOAD_ATTEMPTS):
+                        version = file_version(self.path)
+                        if previous is not None and previous.version == version and not force:
+                            # Touched but identical: keep the snapshot, remember the stamp
+                            previous._stamp = stamp
+                            return {
+                                'success': True,
+                                'reloaded': False,
+                                **previous.info(),
+                                'message': 'Price list unchanged'
+                            }
+                        table = self.loader(self.path)
+                        # The loader reads the file again: keep the table only if
+                        # it was not rewritten in between, so version matches data
+                        if file_version(self.path) == version:
+                            break
+                        # Discarded attempt: release a mapped table before retrying
+                        close = getattr(table, 'close', None)
+                        if close is not None:
+                            close()
+                        stamp = self._stamp()
+                    else:
+                        raise RuntimeError(
+                            f"Price file changed during {RELOAD_ATTEMPTS} load attempts"
+                        )
+                load_seconds = time.perf_counter() - start
+                memory_bytes = estimate_size(table)
+                
+                self._sequence += 1
+                snapshot = PriceSnapshot(
+                    version, self._sequence, table, self.path, load_seconds, memory_bytes, stamp
+                )
+                self._snapshot = snapshot
+                self.last_error = None
+                self._failed_stamp = None
+                metrics.increment('pricing.reloads')
+                metrics.observe('pricing.snapshot_bytes', memory_bytes)
+                
+                return {
+                    'success': True,
+                    'reloaded': True,
+                    **snapshot.info(),
+                    'message': f"Loaded price list version {version} ({len(table)} entries)"
+                }
+            
+            except Exception as e:
+                self.last_error = str(e)
+                self._failed_stamp = stamp
+                metrics.increment('pricing.reload_failed')
+                return {
+                    'success': False,
+                    'reloaded': False,
+                    'error': str(e),
+                    'message': f"Failed to reload price list {self.path}"
+                }
+    
+    def start(self) -> 'PriceSource':
+        """
+        Loads the file and starts the background watcher thread.
+        
+        Returns:
+            PriceSource: self, for chaining
+        """
+        self.current()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name='price-reload', daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stops the watcher thread; the current snapshot stays usable.
+        
+        Args:
+            timeout (float, optional): Seconds to wait for the thread
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.reload()
+
+def get_price_source(path: Optional[str] = None) -> PriceSource:
+    """
+    Returns the process-wide PriceSource for a price file.
+    
+    Args:
+        path (str, optional): Price file, defaults to Config.PRICE_DATABASE
+    
+    Returns:
+        PriceSource: Shared source, not started
+    """
+    path = os.path.abspath(path or Config.PRICE_DATABASE['path'])
+    with _sources_lock:
+        source = _sources.get(path)
+        if source is None:
+            source = PriceSource(path)
+            _sources[path] = source
+        return source
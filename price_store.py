@@ -0,0 +1,359 @@
+"""
+EC - AI Cost Estimation System
+Price Store Module
+
+Compiled binary form of the price list. Each worker opens the file with
+mmap, so all of them share one copy through the OS page cache, and the
+startup cost is reading a header instead of parsing the CSV.
+
+File layout (little-endian, sections 8-byte aligned):
+    header       magic, format version, entry count, hash slots, section offsets
+    prices       float64[count]
+    strings      uint32[count, 4, 2], (offset, length) into the pool for
+                 list_id, component, description and unit
+    3 indexes    int32[slots] open-addressing hash tables over list_id,
+                 component + description and description; -1 marks an empty slot
+    pool         UTF-8 string bytes
+
+Usage:
+    python price_store.py Price-ncc-doc.csv Price-ncc-doc.bin
+"""
+
+import mmap
+import os
+import struct
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from pricing import PriceEntry, PriceTable, price_rows, select_by_unit
+from utils import normalize_text
+
+MAGIC = b'ECPT'
+FORMAT_VERSION = 1
+
+# magic, version, count, slots, then offsets of prices, strings, the
+# three indexes and the pool, and the pool size
+HEADER = struct.Struct('<4sIII7Q')
+
+STRING_FIELDS = ('list_id', 'component', 'description', 'unit')
+
+# Joins component and description into one index key
+KEY_SEPARATOR = '\x1f'
+
+EMPTY_SLOT = -1
+
+# Open stores keyed by path, with the file stamp they were opened at
+_store_cache = {}
+
+def hash_key(key: str) -> int:
+    """
+    FNV-1a 64-bit hash of a string; stable across processes, unlike
+    hash().
+    
+    Args:
+        key (str): Index key
+    
+    Returns:
+        int: Hash value
+    """
+    value = 0xcbf29ce484222325
+    for byte in key.encode('utf-8'):
+        value = ((value ^ byte) * 0x100000001b3) & 0xffffffffffffffff
+    return value
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+def _build_index(keys: List[Optional[str]], slots: int) -> np.ndarray:
+    """
+    Builds a linear-probing hash table; entries sharing a key keep their
+    file order along the probe sequence. None keys are not indexed.
+    """
+    table = np.full(slots, EMPTY_SLOT, dtype='<i4')
+    mask = slots - 1
+    for i, key in enumerate(keys):
+        if key is None:
+            continue
+        slot = hash_key(key) & mask
+        while table[slot] != EMPTY_SLOT:
+            slot = (slot + 1) & mask
+        table[slot] = i
+    return table
+
+def write_price_store(entries: List[PriceEntry], path: str):
+    """
+    Writes price entries in the binary format.
+    
+    The file is written next to the target and renamed into place, so
+    workers that already mapped the old file keep a consistent view.
+    
+    Args:
+        entries (list): Price entries
+        path (str): Output file
+    """
+    count = len(entries)
+    slots = 8
+    while slots < count * 2:
+        slots *= 2
+    
+    pool = bytearray()
+    strings = np.zeros((count, len(STRING_FIELDS), 2), dtype='<u4')
+    for i, entry in enumerate(entries):
+        for j, name in enumerate(STRING_FIELDS):
+            data = getattr(entry, name).encode('utf-8')
+            strings[i, j] = (len(pool), len(data))
+            pool += data
+    
+    prices = np.array([entry.price for entry in entries], dtype='<f8')
+    indexes = [
+        _build_index([entry.list_id or None for entry in entries], slots),
+        _build_index([entry.component + KEY_SEPARATOR + entry.description for entry in entries], slots),
+        _build_index([entry.description for entry in entries], slots)
+    ]
+    
+    sections = [prices.tobytes(), strings.tobytes()] + [index.tobytes() for index in indexes]
+    offsets = []
+    position = _align(HEADER.size)
+    for section in sections:
+        offsets.append(position)
+        position = _align(position + len(section))
+    pool_offset = position
+    
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, count, slots, *offsets, pool_offset, len(pool))
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        for offset, section in zip(offsets, sections):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(section)
+        f.write(b'\0' * (pool_offset - f.tell()))
+        f.write(pool)
+    os.replace(temp_path, path)
+
+def compile_price_list(csv_path: Optional[str] = None, path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Converts the price-list CSV to the binary format.
+    
+    Args:
+        csv_path (str, optional): Source CSV, defaults to Config.PRICE_DATABASE
+        path (str, optional): Output file, defaults to Config.PRICE_DATABASE
+    
+    Returns:
+        dict: Result with success status, entry count and output path
+    """
+    csv_path = csv_path or Config.PRICE_DATABASE['path']
+    path = path or Config.PRICE_DATABASE['binary_path']
+    
+    try:
+        table = PriceTable.from_csv(csv_path)
+        write_price_store(table.entries, path)
+        return {
+            'success': True,
+            'path': path,
+            'entries': len(table),
+            'message': f"Compiled {len(table)} price entries to {path}"
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'message': f"Failed to compile price list {csv_path}"
+        }
+
+class MappedPriceTable:
+    """
+    Read-only price table backed by a memory-mapped binary file.
+    
+    Offers the same lookup interface as PriceTable; entries are decoded
+    only when a lookup touches them.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Binary price file written by write_price_store()
+        
+        Raises:
+            ValueError: If the file is not a price store of this version
+        """
+        self.source = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        header = HEADER.unpack_from(self._mmap, 0)
+        magic, version, count, slots = header[:4]
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} price store")
+        
+        prices_at, strings_at, list_id_at, key_at, description_at, pool_at, pool_size = header[4:]
+        buffer = self._mmap
+        self.count = count
+        self.prices = np.frombuffer(buffer, dtype='<f8', count=count, offset=prices_at)
+        self.strings = np.frombuffer(
+            buffer, dtype='<u4', count=count * len(STRING_FIELDS) * 2, offset=strings_at
+        ).reshape(count, len(STRING_FIELDS), 2)
+        self._list_id_index = np.frombuffer(buffer, dtype='<i4', count=slots, offset=list_id_at)
+        self._key_index = np.frombuffer(buffer, dtype='<i4', count=slots, offset=key_at)
+        self._description_index = np.frombuffer(buffer, dtype='<i4', count=slots, offset=description_at)
+        self._pool_at = pool_at
+        self._mask = slots - 1
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def _string(self, index: int, field: int) -> str:
+        offset, length = self.strings[index, field].tolist()
+        start = self._pool_at + offset
+        return self._mmap[start:start + length].decode('utf-8')
+    
+    def entry(self, index: int) -> PriceEntry:
+        """
+        Decodes one entry.
+        
+        Args:
+            index (int): Entry position in the file
+        
+        Returns:
+            PriceEntry: Decoded entry
+        """
+        return PriceEntry(
+            *(self._string(index, field) for field in range(len(STRING_FIELDS))),
+            float(self.prices[index])
+        )
+    
+    @property
+    def entries(self) -> List[PriceEntry]:
+        """All entries, decoded; for building derived indexes."""
+        return [self.entry(i) for i in range(self.count)]
+    
+    def _probe(self, index: np.ndarray, key: str, fields: Tuple[int, ...], first: bool = False) -> List[PriceEntry]:
+        """
+        Collects the entries whose key fields equal key, in file order.
+        """
+        found = []
+        slot = hash_key(key) & self._mask
+        while True:
+            position = int(index[slot])
+            if position == EMPTY_SLOT:
+                return found
+            if KEY_SEPARATOR.join(self._string(position, field) for field in fields) == key:
+                found.append(self.entry(position))
+                if first:
+                    return found
+            slot = (slot + 1) & self._mask
+    
+    def get(self, list_id: str) -> Optional[PriceEntry]:
+        """
+        Looks an item up by its list_id.
+        
+        Args:
+            list_id (str): Item code, e.g. '100-01-01'
+        
+        Returns:
+            PriceEntry: Matching entry or None
+        """
+        if not list_id:
+            return None
+        found = self._probe(self._list_id_index, str(list_id).strip(), (0,), first=True)
+        return found[0] if found else None
+    
+    def match(self, component: Any, description: Any, unit: Any = None) -> Optional[PriceEntry]:
+        """
+        Looks an item up by normalized component and description, see
+        PriceTable.match().
+        
+        Args:
+            component (any): Component or work type
+            description (any): Item description
+            unit (any, optional): Unit of measurement
+        
+        Returns:
+            PriceEntry: Matching entry or None
+        """
+        description = normalize_text(description)
+        if not description:
+            return None
+        unit = normalize_text(unit)
+        
+        key = normalize_text(component) + KEY_SEPARATOR + description
+        entry = select_by_unit(self._probe(self._key_index, key, (1, 2)), unit)
+        if entry is None:
+            entry = select_by_unit(self._probe(self._description_index, description, (2,)), unit)
+        return entry
+    
+    def lookup(self, list_id: Any, component: Any, description: Any,
+               unit: Any = None) -> Tuple[Optional[PriceEntry], Optional[str]]:
+        """
+        Resolves one row: list_id first, then component and description.
+        
+        Args:
+            list_id (any): Item code
+            component (any): Component or work type
+            description (any): Item description
+            unit (any, optional): Unit of measurement
+        
+        Returns:
+            tuple: (entry or None, 'list_id' / 'description' or None)
+        """
+        entry = self.get(list_id)
+        if entry is not None and select_by_unit([entry], normalize_text(unit)) is not None:
+            return entry, 'list_id'
+        entry = self.match(component, description, unit)
+        if entry is not None:
+            return entry, 'description'
+        return None, None
+    
+    def price_rows(self, columns: List[str], rows: List[List[Any]]) -> Dict[str, Any]:
+        """
+        Fills price_per_unit and total_cost, see PriceTable.price_rows().
+        
+        Args:
+            columns (list): Column headers from AI analysis
+            rows (list): Positional data rows
+        
+        Returns:
+            dict: Priced rows and match statistics
+        """
+        return price_rows(self, columns, rows)
+    
+    def close(self):
+        """
+        Releases the mapping; numeric views must not be used afterwards.
+        """
+        self.prices = self.strings = None
+        self._list_id_index = self._key_index = self._description_index = None
+        self._mmap.close()
+
+def open_price_store(path: Optional[str] = None) -> MappedPriceTable:
+    """
+    Returns the mapped table for a binary price file, reopening it only
+    when the file is replaced.
+    
+    Args:
+        path (str, optional): Binary file, defaults to Config.PRICE_DATABASE
+    
+    Returns:
+        MappedPriceTable: Mapped table
+    """
+    path = os.path.abspath(path or Config.PRICE_DATABASE['binary_path'])
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    
+    cached = _store_cache.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, MappedPriceTable(path))
+        _store_cache[path] = cached
+    
+    return cached[1]
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        print("Usage: python price_store.py [prices.csv] [prices.bin]")
+        sys.exit(2)
+    result = compile_price_list(*sys.argv[1:])
+    print(result['message'] if result['success'] else f"{result['message']}: {result['error']}")
+    sys.exit(0 if result['success'] else 1)
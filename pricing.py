@@ -0,0 +1,339 @@
+"""
+EC - AI Cost Estimation System
+Local Pricing Module
+
+Loads the price list (Price-ncc-doc.csv) into an indexed in-memory table
+and prices cost-sheet rows in one batch call. Only rows that cannot be
+matched are left for the PRICE-KNOWLEDGE model step.
+"""
+
+import csv
+import os
+import re
+import time
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from metrics import metrics
+from money import format_money, line_totals, to_quantity, to_satang
+from table import parse_number
+from utils import normalize_text
+
+# One price-list item; text fields are normalized, price is in baht
+PriceEntry = namedtuple('PriceEntry', ['list_id', 'component', 'description', 'unit', 'price'])
+
+# Accepted CSV headers per field, compared after normalize_text()
+FIELD_ALIASES = {
+    'list_id': ['list id', 'item code', 'code', 'id'],
+    'component': ['component', 'type', 'category'],
+    'description': ['description', 'descriptions', 'item', 'name'],
+    'unit': ['unit', 'units'],
+    'price': ['price per unit', 'price of unit', 'unit price', 'price']
+}
+
+# Loaded tables keyed by path, with the file stamp they were read at
+_table_cache = {}
+
+def parse_price(value: Any) -> float:
+    """
+    Converts a price cell such as '1,200.00' or '฿950' to float.
+    
+    Args:
+        value (any): Raw price
+    
+    Returns:
+        float: Price, NaN when it is not a number
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    return parse_number(re.sub(r'[^\d.\-]', '', str(value or '')) or None)
+
+def resolve_fields(header: List[str]) -> Dict[str, int]:
+    """
+    Maps price-list fields to CSV column positions.
+    
+    Args:
+        header (list): CSV header row
+    
+    Returns:
+        dict: Field name -> column index for every field found
+    """
+    normalized = [normalize_text(name) for name in header]
+    fields = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                fields[field] = normalized.index(alias)
+                break
+    return fields
+
+class PriceTable:
+    """
+    Immutable price list indexed by list_id, by (component, description)
+    and by description alone.
+    """
+    
+    def __init__(self, entries: List[PriceEntry], source: Optional[str] = None):
+        """
+        Args:
+            entries (list): Price entries
+            source (str, optional): Where the entries were loaded from
+        """
+        self.entries = entries
+        self.source = source
+        self.by_list_id = {}
+        self.by_key = {}
+        self.by_description = {}
+        
+        for entry in entries:
+            if entry.list_id:
+                self.by_list_id.setdefault(entry.list_id, entry)
+            self.by_key.setdefault((entry.component, entry.description), []).append(entry)
+            self.by_description.setdefault(entry.description, []).append(entry)
+    
+    @classmethod
+    def from_csv(cls, path: Optional[str] = None, encoding: Optional[str] = None) -> 'PriceTable':
+        """
+        Loads a price-list CSV.
+        
+        Rows without a description or a numeric price are skipped.
+        
+        Args:
+            path (str, optional): CSV path, defaults to Config.PRICE_DATABASE
+            encoding (str, optional): File encoding
+        
+        Returns:
+            PriceTable: Indexed table
+        
+        Raises:
+            ValueError: If the header has no description or price column
+        """
+        path = path or Config.PRICE_DATABASE['path']
+        encoding = encoding or Config.PRICE_DATABASE['encoding']
+        
+        with open(path, newline='', encoding=encoding) as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            fields = resolve_fields(header)
+            if 'description' not in fields or 'price' not in fields:
+                raise ValueError(f"Price list {path} needs description and price columns, got {header}")
+            
+            def field(row, name):
+                index = fields.get(name)
+                return row[index] if index is not None and index < len(row) else ''
+            
+            entries = []
+            for row in reader:
+                description = normalize_text(field(row, 'description'))
+                price = parse_price(field(row, 'price'))
+                if not description or np.isnan(price):
+                    continue
+                entries.append(PriceEntry(
+                    field(row, 'list_id').strip(),
+                    normalize_text(field(row, 'component')),
+                    description,
+                    normalize_text(field(row, 'unit')),
+                    price
+                ))
+        
+        return cls(entries, source=path)
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def get(self, list_id: str) -> Optional[PriceEntry]:
+        """
+        Looks an item up by its list_id.
+        
+        Args:
+            list_id (str): Item code, e.g. '100-01-01'
+        
+        Returns:
+            PriceEntry: Matching entry or None
+        """
+        return self.by_list_id.get(str(list_id).strip()) if list_id else None
+    
+    def match(self, component: Any, description: Any, unit: Any = None) -> Optional[PriceEntry]:
+        """
+        Looks an item up by normalized component and description.
+        
+        Falls back to the description alone when the component does not
+        match. If a unit is given, entries priced in another unit are
+        not returned.
+        
+        Args:
+            component (any): Component or work type
+            description (any): Item description
+            unit (any, optional): Unit of measurement
+        
+        Returns:
+            PriceEntry: Matching entry or None
+        """
+        description = normalize_text(description)
+        if not description:
+            return None
+        unit = normalize_text(unit)
+        
+        candidates = self.by_key.get((normalize_text(component), description))
+        entry = select_by_unit(candidates, unit)
+        if entry is None:
+            entry = select_by_unit(self.by_description.get(description), unit)
+        return entry
+    
+    def lookup(self, list_id: Any, component: Any, description: Any,
+               unit: Any = None) -> Tuple[Optional[PriceEntry], Optional[str]]:
+        """
+        Resolves one row: list_id first, then component and description.
+        
+        Args:
+            list_id (any): Item code
+            component (any): Component or work type
+            description (any): Item description
+            unit (any, optional): Unit of measurement
+        
+        Returns:
+            tuple: (entry or None, 'list_id' / 'description' or None)
+        """
+        entry = self.get(list_id)
+        if entry is not None and select_by_unit([entry], normalize_text(unit)) is not None:
+            return entry, 'list_id'
+        entry = self.match(component, description, unit)
+        if entry is not None:
+            return entry, 'description'
+        return None, None
+    
+    def price_rows(self, columns: List[str], rows: List[List[Any]]) -> Dict[str, Any]:
+        """
+        Fills price_per_unit and total_cost for every row it can match.
+        
+        Args:
+            columns (list): Column headers from AI analysis
+            rows (list): Positional data rows
+        
+        Returns:
+            dict: Priced 'columns' and 'rows', 'matched' count, the
+            'unmatched' row indexes to send to the model, match 'methods'
+            and 'elapsed' seconds
+        """
+        return price_rows(self, columns, rows)
+
+def select_by_unit(candidates: Optional[List[PriceEntry]], unit: str) -> Optional[PriceEntry]:
+    """
+    Picks the candidate priced in the requested unit.
+    
+    Args:
+        candidates (list): Entries sharing a key
+        unit (str): Normalized unit, '' when unknown
+    
+    Returns:
+        PriceEntry: Same-unit entry, else one without a unit, else None;
+        the first candidate when no unit is requested
+    """
+    if not candidates:
+        return None
+    if not unit:
+        return candidates[0]
+    for entry in candidates:
+        if entry.unit == unit:
+            return entry
+    for entry in candidates:
+        if not entry.unit:
+            return entry
+    return None
+
+def price_rows(matcher, columns: List[str], rows: List[List[Any]]) -> Dict[str, Any]:
+    """
+    Prices positional rows in one batch with any matcher exposing
+    lookup(list_id, component, description, unit).
+    
+    Totals are quantity × unit price in fixed-point satang, rounded
+    half-up to 2 decimals. Rows whose quantity is not a number keep
+    their price but get '-' as total.
+    
+    Args:
+        matcher: PriceTable or compatible object
+        columns (list): Column headers from AI analysis
+        rows (list): Positional data rows
+    
+    Returns:
+        dict: See PriceTable.price_rows()
+    """
+    start = time.perf_counter()
+    
+    with metrics.span('pricing.local'):
+        columns = list(columns)
+        for name in ('price_per_unit', 'total_cost'):
+            if name not in columns:
+                columns.append(name)
+        index = {name: i for i, name in enumerate(columns)}
+        
+        def cell(row, name):
+            i = index.get(name)
+            return row[i] if i is not None and i < len(row) else None
+        
+        priced = []
+        prices = np.full(len(rows), np.nan)
+        quantities = [None] * len(rows)
+        unmatched = []
+        methods = {'list_id': 0, 'description': 0}
+        
+        for i, row in enumerate(rows):
+            row = list(row) + ['-'] * (len(columns) - len(row))
+            priced.append(row)
+            entry, method = matcher.lookup(
+                cell(row, 'list_id'), cell(row, 'Component'),
+                cell(row, 'Description'), cell(row, 'Unit')
+            )
+            if entry is None:
+                unmatched.append(i)
+                continue
+            methods[method] = methods.get(method, 0) + 1
+            prices[i] = entry.price
+            quantities[i] = cell(row, 'Quantity')
+        
+        satang, priced_mask = to_satang(prices)
+        quantities, has_quantity = to_quantity(quantities)
+        totals = line_totals(quantities, satang)
+        price_index = index['price_per_unit']
+        total_index = index['total_cost']
+        for i in np.flatnonzero(priced_mask).tolist():
+            priced[i][price_index] = format_money(satang[i])
+            priced[i][total_index] = format_money(totals[i]) if has_quantity[i] else '-'
+    
+    matched = len(rows) - len(unmatched)
+    metrics.increment('pricing.matched', matched)
+    metrics.increment('pricing.unmatched', len(unmatched))
+    
+    return {
+        'columns': columns,
+        'rows': priced,
+        'matched': matched,
+        'unmatched': unmatched,
+        'methods': methods,
+        'elapsed': time.perf_counter() - start
+    }
+
+def load_price_table(path: Optional[str] = None) -> PriceTable:
+    """
+    Returns the price table for a CSV, reloading it only when the file
+    changes.
+    
+    Args:
+        path (str, optional): CSV path, defaults to Config.PRICE_DATABASE
+    
+    Returns:
+        PriceTable: Indexed table
+    """
+    path = os.path.abspath(path or Config.PRICE_DATABASE['path'])
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    
+    cached = _table_cache.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, PriceTable.from_csv(path))
+        _table_cache[path] = cached
+    
+    return cached[1]
@@ -0,0 +1,304 @@
+"""
+EC - AI Cost Estimation System
+Scenarios Module
+
+What-if pricing: one processed sheet priced under several price lists or
+discount tiers at once. Unit prices form a (scenarios × lines) satang
+matrix; line totals, section totals by Config.COMPONENT_TYPES and grand
+totals for every scenario come out of a single broadcast multiply and
+one matrix product, then go into a comparison workbook.
+
+Example:
+    result = compare_price_lists(columns, rows, {
+        'Standard': load_price_table('standard.csv'),
+        'Partner': load_price_table('partner.csv')
+    }, discounts={'Standard -10%': ('Standard', 10)})
+    generate_scenario_workbook(result, filename='What_If.xlsx')
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import openpyxl
+
+from config import Config
+from excel import default_filename, process_ai_analyzed_data, save_cost_sheet
+from metrics import metrics
+from money import (
+    MONEY_DTYPE, divide_half_up, line_totals, to_baht, to_quantity, to_satang
+)
+from styles import get_style_registry
+from utils import OTHER_SECTION, line_sections
+
+# Discount precision: percentages are applied in basis points
+BASIS_POINTS = 10000
+
+def section_matrix(sections: List[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Builds the one-hot (lines × sections) matrix used to sum line totals
+    per section with one matrix product.
+    
+    Args:
+        sections (list): Section key per line
+    
+    Returns:
+        tuple: (section keys in COMPONENT_TYPES order, int64 matrix)
+    """
+    keys = [code for code in Config.COMPONENT_TYPES if code in sections]
+    if OTHER_SECTION in sections:
+        keys.append(OTHER_SECTION)
+    position = {key: i for i, key in enumerate(keys)}
+    
+    matrix = np.zeros((len(sections), len(keys)), dtype=MONEY_DTYPE)
+    matrix[np.arange(len(sections)), [position[section] for section in sections]] = 1
+    return keys, matrix
+
+def apply_discount(prices: np.ndarray, percent: float) -> np.ndarray:
+    """
+    Discounts unit prices, rounding half-up to the satang.
+    
+    Args:
+        prices (ndarray): int64 satang
+        percent (float): Discount, e.g. 10 for 10% off; negative for a markup
+    
+    Returns:
+        ndarray: Discounted int64 satang
+    """
+    factor = BASIS_POINTS - int(round(percent * BASIS_POINTS / 100))
+    return divide_half_up(np.asarray(prices, dtype=MONEY_DTYPE) * factor, BASIS_POINTS)
+
+def price_matrix(columns: List[str], rows: List[List[Any]],
+                 price_lists: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Looks every line up in every price list.
+    
+    Args:
+        columns (list): Column headers
+        rows (list): Positional data rows
+        price_lists (dict): Scenario name -> matcher with lookup()
+    
+    Returns:
+        tuple: (int64 satang matrix, bool priced mask), both
+        (len(price_lists) × len(rows))
+    """
+    index = {name: i for i, name in enumerate(columns)}
+    
+    def cell(row, name):
+        i = index.get(name)
+        return row[i] if i is not None and i < len(row) else None
+    
+    keys = [
+        (cell(row, 'list_id'), cell(row, 'Component'), cell(row, 'Description'), cell(row, 'Unit'))
+        for row in rows
+    ]
+    prices = np.full((len(price_lists), len(rows)), np.nan)
+    for s, matcher in enumerate(price_lists.values()):
+        for i, key in enumerate(keys):
+            entry, _ = matcher.lookup(*key)
+            if entry is not None:
+                prices[s, i] = entry.price
+    
+    satang, priced = to_satang(prices.ravel())
+    return satang.reshape(prices.shape), priced.reshape(prices.shape)
+
+def compute_scenarios(quantities: np.ndarray, quantity_valid: np.ndarray,
+                      prices: np.ndarray, priced: np.ndarray,
+                      sections: List[str]) -> Dict[str, Any]:
+    """
+    Prices every scenario in one pass.
+    
+    Lines without a quantity or without a price in a scenario count as
+    zero in that scenario's totals and are reported as unpriced.
+    
+    Args:
+        quantities (ndarray): int64 millionths per line, see money.to_quantity()
+        quantity_valid (ndarray): Lines with a quantity
+        prices (ndarray): (scenarios × lines) int64 satang
+        priced (ndarray): (scenarios × lines) mask of found prices
+        sections (list): Section key per line
+    
+    Returns:
+        dict: 'lines' and 'line_valid' (scenarios × lines), 'sections'
+        keys, 'section_totals' (scenarios × sections), 'grand_totals'
+        and 'unpriced' per scenario, all in satang
+    """
+    valid = priced & quantity_valid[np.newaxis, :]
+    lines = np.where(valid, line_totals(quantities[np.newaxis, :], prices), 0)
+    keys, membership = section_matrix(sections)
+    section_totals = lines @ membership
+    
+    return {
+        'lines': lines,
+        'line_valid': valid,
+        'sections': keys,
+        'section_totals': section_totals,
+        'grand_totals': section_totals.sum(axis=1),
+        'unpriced': (~valid).sum(axis=1)
+    }
+
+def compare_price_lists(columns: List[str], rows: List[List[Any]], price_lists: Dict[str, Any],
+                        discounts: Optional[Dict[str, Tuple[str, float]]] = None,
+                        include_sheet: bool = False) -> Dict[str, Any]:
+    """
+    Prices one sheet under several price lists and discount tiers.
+    
+    Args:
+        columns (list): Column headers from AI analysis
+        rows (list): Data rows from AI analysis
+        price_lists (dict): Scenario name -> matcher with lookup()
+        discounts (dict, optional): Scenario name -> (base scenario, percent)
+        include_sheet (bool): Add the sheet's own price_per_unit as scenario 'Sheet'
+    
+    Returns:
+        dict: Result with success, 'scenarios' names, the processed 'table',
+        compute_scenarios() arrays and 'elapsed' seconds
+    """
+    start = time.perf_counter()
+    
+    try:
+        with metrics.span('scenarios.compute'):
+            table = process_ai_analyzed_data(columns, rows)
+            if 'Quantity' in table:
+                quantities, quantity_valid = to_quantity(table['Quantity'])
+            else:
+                quantities, quantity_valid = to_quantity([None] * len(table))
+            
+            names = list(price_lists)
+            prices, priced = price_matrix(table.columns, list(table.iter_rows()), price_lists)
+            
+            if include_sheet and 'price_per_unit' in table:
+                sheet_prices, sheet_priced = to_satang(table['price_per_unit'])
+                names.append('Sheet')
+                prices = np.vstack([prices, sheet_prices])
+                priced = np.vstack([priced, sheet_priced])
+            
+            for name, (base, percent) in (discounts or {}).items():
+                if base not in names:
+                    raise ValueError(f"Discount {name!r} refers to unknown scenario {base!r}")
+                s = names.index(base)
+                names.append(name)
+                prices = np.vstack([prices, apply_discount(prices[s], percent)])
+                priced = np.vstack([priced, priced[s]])
+            
+            list_ids = table.cell_values('list_id') if 'list_id' in table else [''] * len(table)
+            result = compute_scenarios(quantities, quantity_valid, prices, priced, line_sections(list_ids))
+        
+        return {
+            'success': True,
+            'scenarios': names,
+            'table': table,
+            'prices': prices,
+            'priced': priced,
+            **result,
+            'elapsed': time.perf_counter() - start,
+            'message': f"Priced {len(table)} lines under {len(names)} scenarios"
+        }
+    
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to compute price scenarios'
+        }
+
+def build_scenario_workbook(result: Dict[str, Any]) -> openpyxl.Workbook:
+    """
+    Lays a compare_price_lists() result out as a workbook: a 'Summary'
+    sheet with section and grand totals per scenario, and a 'Lines'
+    sheet with every line's unit price and total per scenario.
+    
+    Args:
+        result (dict): Successful compare_price_lists() result
+    
+    Returns:
+        Workbook: Comparison workbook
+    """
+    wb = openpyxl.Workbook()
+    styles = get_style_registry(wb)
+    names = result['scenarios']
+    
+    summary = wb.active
+    summary.title = 'Summary'
+    summary.append(['Price Scenario Comparison'])
+    styles.apply(summary['A1'], 'title')
+    summary.append([])
+    summary.append(['Section'] + names)
+    for cell in summary[3]:
+        styles.apply(cell, 'header')
+    
+    section_totals = to_baht(result['section_totals'])
+    for k, key in enumerate(result['sections']):
+        label = f"{key} {Config.COMPONENT_TYPES[key]}" if key in Config.COMPONENT_TYPES else 'Other'
+        summary.append([label] + section_totals[:, k].tolist())
+        for cell in summary[summary.max_row][1:]:
+            styles.apply(cell, 'number')
+    
+    summary.append(['Grand Total'] + to_baht(result['grand_totals']).tolist())
+    for cell in summary[summary.max_row]:
+        styles.apply(cell, 'total')
+    summary.append(['Unpriced lines'] + result['unpriced'].tolist())
+    summary.column_dimensions['A'].width = 40
+    
+    lines = wb.create_sheet('Lines')
+    table = result['table']
+    base_columns = [col for col in ('list_id', 'Description', 'Quantity', 'Unit') if col in table]
+    header = base_columns + [f"{name} {label}" for name in names for label in ('price', 'total')]
+    lines.append(header)
+    for cell in lines[1]:
+        styles.apply(cell, 'header')
+    
+    base_values = [table.cell_values(col) for col in base_columns]
+    unit_prices = to_baht(result['prices'], result['priced'])
+    line_values = to_baht(result['lines'], result['line_valid'])
+    for i in range(len(table)):
+        values = [column[i] for column in base_values]
+        for s in range(len(names)):
+            values.extend([unit_prices[s, i], line_values[s, i]])
+        lines.append(['-' if isinstance(value, float) and np.isnan(value) else value for value in values])
+        for cell in lines[lines.max_row][len(base_columns):]:
+            if isinstance(cell.value, float):
+                styles.apply(cell, 'number')
+        if 'Quantity' in base_columns:
+            quantity = lines.cell(row=lines.max_row, column=base_columns.index('Quantity') + 1)
+            if isinstance(quantity.value, float):
+                styles.apply(quantity, 'number')
+    
+    return wb
+
+def generate_scenario_workbook(result: Dict[str, Any], filename: Optional[str] = None,
+                               output=None) -> Dict[str, Any]:
+    """
+    Saves the comparison workbook of a compare_price_lists() result.
+    
+    Args:
+        result (dict): compare_price_lists() result
+        filename (str, optional): File name, defaults to a timestamped name
+        output: Output target, see excel.generate_cost_sheet()
+    
+    Returns:
+        dict: Result with file information and grand totals per scenario
+    """
+    try:
+        if not result.get('success'):
+            raise ValueError(result.get('error', 'Scenario computation failed'))
+        
+        wb = build_scenario_workbook(result)
+        if filename is None:
+            filename = default_filename('Cost_Scenarios')
+        
+        response = {
+            'success': True,
+            'filename': filename,
+            'grand_totals': dict(zip(result['scenarios'], to_baht(result['grand_totals']).tolist())),
+            'message': 'Scenario comparison generated successfully'
+        }
+        save_cost_sheet(wb, filename, output, response, mode='scenarios')
+        return response
+    
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to generate scenario comparison'
+        }
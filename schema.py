@@ -0,0 +1,201 @@
+"""
+EC - AI Cost Estimation System
+Schema Module
+
+JSON Schema for AI responses, built from Config: list_id restricted to
+the COMPONENT_TYPES codes, Unit to VALID_UNITS, and the numeric columns
+to values float() accepts. Validators are compiled once and reused,
+so a response with thousands of rows is checked in one call with every
+error reported against its row index.
+
+Used by utils.validate_ai_response(strict=True).
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from jsonschema import Draft202012Validator
+
+from config import Config
+from utils import list_id_pattern
+
+# Placeholder the AI uses for a missing value
+MISSING_VALUE = '-'
+
+# Text float() reads as a number, or the placeholder
+NUMBER_TEXT = r'^\s*(?:-|[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*$'
+DIMENSION_TEXT = r'^\s*(?:-|\+?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*$'
+
+_validators: Dict[tuple, Draft202012Validator] = {}
+
+def cell_schemas(config=Config) -> Dict[str, Dict[str, Any]]:
+    """
+    Builds the schema of every known column.
+    
+    Args:
+        config: Configuration class
+    
+    Returns:
+        dict: Column name -> cell schema
+    """
+    cells = {
+        'list_id': {'type': 'string', 'pattern': list_id_pattern(list(config.COMPONENT_TYPES))},
+        'Component': {'type': 'string'},
+        'Description': {'type': 'string'},
+        'Unit': {'enum': list(config.VALID_UNITS) + [MISSING_VALUE, None]}
+    }
+    for column in config.NUMERIC_COLUMNS:
+        if column in config.DIMENSIONS:
+            cells[column] = {'type': ['number', 'string', 'null'], 'minimum': 0, 'pattern': DIMENSION_TEXT}
+        else:
+            cells[column] = {'type': ['number', 'string', 'null'], 'pattern': NUMBER_TEXT}
+    return cells
+
+def build_response_schema(columns: Optional[Sequence[str]] = None, config=Config) -> Dict[str, Any]:
+    """
+    Builds the response schema.
+    
+    Positional rows are checked cell by cell against columns; dict rows
+    by key. Unknown columns are not constrained. The full schema can be
+    handed to models that accept a response schema.
+    
+    Args:
+        columns (sequence, optional): Column layout of positional rows
+        config: Configuration class
+    
+    Returns:
+        dict: JSON Schema (draft 2020-12)
+    """
+    cells = cell_schemas(config)
+    row_array = {'type': 'array'}
+    if columns is not None:
+        row_array['prefixItems'] = [cells.get(column, {}) for column in columns]
+        row_array['maxItems'] = len(columns)
+    
+    return {
+        '$schema': 'https://json-schema.org/draft/2020-12/schema',
+        'type': 'object',
+        'required': ['columns', 'rows'],
+        'properties': {
+            'columns': {'type': 'array', 'items': {'type': 'string'}},
+            'rows': {
+                'type': 'array',
+                'items': {
+                    'if': {'type': 'array'},
+                    'then': row_array,
+                    'else': {'type': 'object', 'properties': cells}
+                }
+            }
+        }
+    }
+
+def get_validator(kind: str, column: Optional[str] = None) -> Draft202012Validator:
+    """
+    Returns a compiled validator, building it on first use.
+    
+    Args:
+        kind (str): 'response' for the envelope, 'row' for dict rows or
+            'cell' for the cells of one column
+        column (str, optional): Column name for 'cell'
+    
+    Returns:
+        Draft202012Validator: Reusable validator
+    """
+    key = (kind, column)
+    validator = _validators.get(key)
+    if validator is None:
+        if kind == 'response':
+            schema = build_response_schema()
+            schema['properties']['rows'] = {'type': 'array'}
+        elif kind == 'row':
+            schema = build_response_schema()['properties']['rows']['items']['else']
+        else:
+            schema = cell_schemas().get(column, {})
+        Draft202012Validator.check_schema(schema)
+        validator = Draft202012Validator(schema)
+        _validators[key] = validator
+    return validator
+
+def clear_validator_cache():
+    """
+    Drops the compiled validators, e.g. after Config changed.
+    """
+    _validators.clear()
+
+def cell_errors(column: str, value: Any, memo: Dict[tuple, List[str]]) -> List[str]:
+    """
+    Validates one cell, once per distinct value of a column.
+    
+    Args:
+        column (str): Column name
+        value (any): Cell value
+        memo (dict): Messages per (column, type, value), shared across
+            the cells of one response; unhashable values are not memoized
+    
+    Returns:
+        list: Error messages, empty when the cell is valid
+    """
+    try:
+        key = (column, type(value), value)
+        hash(key)
+    except TypeError:
+        return [error.message for error in get_validator('cell', column).iter_errors(value)]
+    messages = memo.get(key)
+    if messages is None:
+        messages = [error.message for error in get_validator('cell', column).iter_errors(value)]
+        memo[key] = messages
+    return messages
+
+def validate_response_schema(response_data: Any, fail_fast: bool = False) -> Dict[str, Any]:
+    """
+    Validates an AI response against the schema.
+    
+    The envelope is checked as a whole; positional rows are checked
+    cell by cell, each distinct value of a column only once, which keeps
+    large responses with repetitive units, codes and sizes fast.
+    
+    Args:
+        response_data (any): Parsed AI response
+        fail_fast (bool): Stop at the first error
+    
+    Returns:
+        dict: 'valid', 'errors' messages and 'row_errors' with the
+        'row' index, 'column' (None for whole-row errors) and 'message'
+        of every row error
+    """
+    errors: List[str] = []
+    row_errors: List[Dict[str, Any]] = []
+    
+    def result():
+        return {'valid': not errors, 'errors': errors, 'row_errors': row_errors}
+    
+    def add(row, column, message):
+        row_errors.append({'row': row, 'column': column, 'message': message})
+        where = f"Row {row}" + (f", {column}" if column is not None else '')
+        errors.append(f"{where}: {message}")
+        return fail_fast
+    
+    for error in get_validator('response').iter_errors(response_data):
+        location = '.'.join(str(part) for part in error.absolute_path) or 'response'
+        errors.append(f"{location}: {error.message}")
+        if fail_fast:
+            return result()
+    if errors:
+        return result()
+    
+    columns = response_data['columns']
+    memo = {}
+    for i, row in enumerate(response_data['rows']):
+        if isinstance(row, list):
+            if len(row) > len(columns) and add(i, None, f"{len(row)} cells for {len(columns)} columns"):
+                return result()
+            for column, value in zip(columns, row):
+                for message in cell_errors(column, value, memo):
+                    if add(i, column, message):
+                        return result()
+        else:
+            for error in get_validator('row').iter_errors(row):
+                column = error.absolute_path[0] if error.absolute_path else None
+                if add(i, column, error.message):
+                    return result()
+    
+    return result()
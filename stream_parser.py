@@ -0,0 +1,430 @@
+"""
+EC - AI Cost Estimation System
+Stream Parser Module
+
+Incremental parsing of the AI JSON response while the model is still
+streaming it. A small state machine walks the top-level object; every
+element of the 'rows' array is decoded with json.JSONDecoder.raw_decode()
+as soon as it is complete, validated cell by cell against the schema
+(schema.py) like utils.validate_ai_response(strict=True) would, and
+handed to the caller, so the cost sheet can be written while the rest
+of the response is generated.
+
+Example:
+    writer = CostSheetStreamWriter()
+    for chunk in model_stream:
+        writer.feed(chunk)
+    result = writer.finish(output='bytes')
+"""
+
+import codecs
+import json
+import time
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Union
+
+from compact import expand_rows, row_code_errors
+from excel import StreamingCostSheet, default_filename, save_cost_sheet, set_document_property
+from metrics import metrics
+from schema import cell_errors
+
+# Rows buffered before they are written to the sheet
+STREAM_FLUSH_ROWS = 50
+
+_WHITESPACE = ' \t\r\n'
+
+class StreamParseError(ValueError):
+    """Raised when the streamed response is not a valid AI response."""
+
+class StreamingResponseParser:
+    """
+    Incremental parser for {'columns': [...], 'rows': [...], ...}.
+    
+    feed() accepts text or UTF-8 bytes in chunks of any size (a chunk may
+    end inside a string, number or multi-byte character) and returns the
+    rows completed by that chunk. Text before the opening brace, such as
+    a Markdown code fence, is skipped.
+    
+    Rows are returned positional, aligned to 'columns'; dict rows are
+    converted. Rows that arrive before 'columns' are held back until it
+    does. Rows that are not a list or dict, have more cells than there
+    are columns or, with validate on, fail the schema are reported in
+    'errors' and skipped; schema failures are also listed in
+    'row_errors' as by schema.validate_response_schema().
+    
+    A compact response must send 'dictionaries' before 'rows': rows are
+    handed out as they arrive and their codes can only be checked and
+    decoded with the dictionaries already parsed. Rows with invalid
+    codes are skipped like schema failures, and dictionaries that
+    arrive after the first row are reported in 'errors'.
+    """
+    
+    def __init__(self, validate: bool = True):
+        """
+        Args:
+            validate (bool): Check every row against the schema
+        """
+        self.validate = validate
+        self.columns: Optional[List[str]] = None
+        self.fields: Dict[str, Any] = {}
+        self.errors: List[str] = []
+        self.row_errors: List[Dict[str, Any]] = []
+        self._memo = {}
+        self.row_count = 0
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._state = 'start'
+        self._key = None
+        self._index = 0
+        self._pending = []
+    
+    @property
+    def done(self) -> bool:
+        """True once the closing brace of the response was parsed."""
+        return self._state == 'done'
+    
+    def feed(self, chunk: Union[str, bytes]) -> List[List[Any]]:
+        """
+        Parses the next chunk of the response.
+        
+        Args:
+            chunk (str or bytes): Next piece of the streamed response
+        
+        Returns:
+            list: Rows completed by this chunk, possibly empty
+        """
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        if self._state == 'done' or not chunk:
+            return []
+        self._buffer += chunk
+        return self._parse()
+    
+    def close(self) -> List[List[Any]]:
+        """
+        Ends the stream.
+        
+        Returns:
+            list: Rows still held back, when 'columns' never arrived
+        
+        Raises:
+            StreamParseError: If the response is incomplete or malformed
+        """
+        rows = self.feed(self._utf8.decode(b'', final=True))
+        if self._state != 'done':
+            excerpt = self._buffer.strip()[:40]
+            raise StreamParseError(
+                f"Response ended while parsing {self._state}" + (f" near {excerpt!r}" if excerpt else '')
+            )
+        if 'rows' not in self.fields:
+            raise StreamParseError("Missing required key: rows")
+        if self.columns is None:
+            raise StreamParseError("Missing required key: columns")
+        return rows
+    
+    def _decode(self, pos: int):
+        """
+        Decodes one JSON value at pos; None while it is still incomplete.
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            return None
+        # A number or literal at the end of the buffer may continue
+        if end == len(self._buffer) and not isinstance(value, (str, list, dict)):
+            return None
+        return value, end
+    
+    def _parse(self) -> List[List[Any]]:
+        buffer = self._buffer
+        pos = 0
+        rows = []
+        
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buffer) or self._state == 'done':
+                break
+            char = buffer[pos]
+            
+            if self._state == 'start':
+                brace = buffer.find('{', pos)
+                if brace < 0:
+                    pos = len(buffer)
+                    break
+                pos = brace + 1
+                self._state = 'key'
+            
+            elif self._state == 'key':
+                if char == ',':
+                    pos += 1
+                    continue
+                if char == '}':
+                    pos += 1
+                    self._state = 'done'
+                    continue
+                decoded = self._decode(pos)
+                if decoded is None:
+                    break
+                self._key, pos = decoded
+                if not isinstance(self._key, str):
+                    raise StreamParseError(f"Expected an object key at offset {pos}")
+                self._state = 'colon'
+            
+            elif self._state == 'colon':
+                if char != ':':
+                    raise StreamParseError(f"Expected ':' after key {self._key!r}")
+                pos += 1
+                self._state = 'value'
+            
+            elif self._state == 'value':
+                if self._key == 'rows':
+                    if char != '[':
+                        raise StreamParseError("Rows must be a list")
+                    pos += 1
+                    self.fields['rows'] = None
+                    self._state = 'rows'
+                    continue
+                decoded = self._decode(pos)
+                if decoded is None:
+                    break
+                value, pos = decoded
+                self.fields[self._key] = value
+                if self._key == 'dictionaries' and self._index:
+                    self.errors.append(
+                        f"'dictionaries' arrived after {self._index} rows; "
+                        f"compact responses must send it before 'rows'"
+                    )
+                if self._key == 'columns':
+                    rows.extend(self._set_columns(value))
+                self._state = 'key'
+            
+            elif self._state == 'rows':
+                if char == ',':
+                    pos += 1
+                    continue
+                if char == ']':
+                    pos += 1
+                    self._state = 'key'
+                    continue
+                decoded = self._decode(pos)
+                if decoded is None:
+                    break
+                value, pos = decoded
+                row = self._accept(value)
+                if row is not None:
+                    rows.append(row)
+        
+        self._buffer = buffer[pos:]
+        return rows
+    
+    def _set_columns(self, columns: Any) -> List[List[Any]]:
+        """
+        Records the columns and releases the rows held back for them.
+        """
+        if not isinstance(columns, list):
+            raise StreamParseError("Columns must be a list")
+        self.columns = columns
+        pending, self._pending = self._pending, []
+        return [row for row in (self._accept(value, index) for index, value in pending) if row is not None]
+    
+    def _accept(self, value: Any, index: Optional[int] = None) -> Optional[List[Any]]:
+        """
+        Checks one row and aligns it to the columns.
+        """
+        if index is None:
+            index = self._index
+            self._index += 1
+        if self.columns is None:
+            self._pending.append((index, value))
+            return None
+        
+        if isinstance(value, dict):
+            value = [value.get(column, '-') for column in self.columns]
+        elif not isinstance(value, list):
+            self.errors.append(f"Row {index} is not a list or dictionary")
+            return None
+        elif len(value) > len(self.columns):
+            self.errors.append(f"Row {index} has {len(value)} cells for {len(self.columns)} columns")
+            return None
+        
+        if self.validate and not self._valid(index, value):
+            return None
+        self.row_count += 1
+        return value
+    
+    def _valid(self, index: int, row: List[Any]) -> bool:
+        """
+        Checks the codes and cells of one aligned row against the schema.
+        """
+        dictionaries = self.fields.get('dictionaries')
+        code_errors = row_code_errors(self.columns, row, dictionaries if isinstance(dictionaries, dict) else None)
+        for column, message in code_errors:
+            self.row_errors.append({'row': index, 'column': column, 'message': message})
+            self.errors.append(f"Row {index}, {column}: {message}")
+        if code_errors:
+            return False
+        
+        decoded = expand_rows(self.columns, [row], dictionaries)[0]
+        valid = True
+        for column, value in zip(self.columns, decoded):
+            for message in cell_errors(column, value, self._memo):
+                self.row_errors.append({'row': index, 'column': column, 'message': message})
+                self.errors.append(f"Row {index}, {column}: {message}")
+                valid = False
+        return valid
+
+class CostSheetStreamWriter:
+    """
+    Writes a cost sheet from a streamed AI response.
+    
+    The write-only sheet is opened as soon as 'columns' is parsed and
+    rows are appended every flush_rows rows, so by the time the model
+    finishes only the last chunk and the save are left.
+    """
+    
+    def __init__(self, flush_rows: int = STREAM_FLUSH_ROWS, validate: bool = True):
+        """
+        Args:
+            flush_rows (int): Rows buffered before each write
+            validate (bool): Skip rows that fail the schema
+        """
+        self.flush_rows = flush_rows
+        self.parser = StreamingResponseParser(validate)
+        self.sheet: Optional[StreamingCostSheet] = None
+        self.first_row_at: Optional[float] = None
+        self._rows = []
+        self._start = time.perf_counter()
+    
+    def feed(self, chunk: Union[str, bytes]):
+        """
+        Parses a chunk and writes any full batch of rows.
+        
+        Args:
+            chunk (str or bytes): Next piece of the streamed response
+        """
+        with metrics.span('cost_sheet.stream_parse'):
+            rows = self.parser.feed(chunk)
+        self._add(rows)
+    
+    def _add(self, rows: List[List[Any]], final: bool = False):
+        if rows and self.first_row_at is None:
+            self.first_row_at = time.perf_counter() - self._start
+        self._rows.extend(rows)
+        if self.parser.columns is None:
+            return
+        if self.sheet is None:
+            with metrics.span('cost_sheet.template', mode='stream'):
+                self.sheet = StreamingCostSheet(self.parser.columns)
+        if self._rows and (final or len(self._rows) >= self.flush_rows):
+            # Compact responses send 'dictionaries' before 'rows'
+            self.sheet.dictionaries = self.parser.fields.get('dictionaries')
+            self.sheet.append_rows(self._rows)
+            self._rows = []
+    
+    def finish(self, filename: Optional[str] = None, output=None,
+               price_version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ends the stream and saves the cost sheet.
+        
+        Args:
+            filename (str, optional): File name, defaults to a timestamped name
+            output: Output target, see excel.generate_cost_sheet()
+            price_version (str, optional): Price snapshot the rows were priced with
+        
+        Returns:
+            dict: Result with file information, 'rows' written, skipped
+            row 'errors' and schema 'row_errors', 'first_row_seconds'
+            and 'elapsed'
+        """
+        try:
+            self._add(self.parser.close(), final=True)
+            
+            if price_version is not None:
+                set_document_property(self.sheet.wb, 'price_version', price_version)
+            if filename is None:
+                filename = default_filename()
+            
+            result = {
+                'success': True,
+                'filename': filename,
+                'rows': self.sheet.row_count,
+                'errors': self.parser.errors,
+                'row_errors': self.parser.row_errors,
+                'styles_created': self.sheet.styles.created,
+                'message': 'Cost sheet generated successfully'
+            }
+            if price_version is not None:
+                result['price_version'] = price_version
+            
+            save_cost_sheet(self.sheet, filename, output, result, 'stream')
+            result['first_row_seconds'] = self.first_row_at
+            result['elapsed'] = time.perf_counter() - self._start
+            
+            metrics.increment('cost_sheet.rows', self.sheet.row_count, mode='stream')
+            metrics.increment('cost_sheet.generated', mode='stream')
+            return result
+        
+        except Exception as e:
+            metrics.increment('cost_sheet.failed', mode='stream')
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Failed to generate cost sheet'
+            }
+
+def stream_cost_sheet(chunks: Iterable[Union[str, bytes]], filename: Optional[str] = None,
+                      output=None, price_version: Optional[str] = None,
+                      flush_rows: int = STREAM_FLUSH_ROWS) -> Dict[str, Any]:
+    """
+    Builds a cost sheet from a streamed AI response.
+    
+    Args:
+        chunks (iterable): Response text or bytes as it arrives
+        filename (str, optional): File name, defaults to a timestamped name
+        output: Output target, see excel.generate_cost_sheet()
+        price_version (str, optional): Price snapshot the rows were priced with
+        flush_rows (int): Rows buffered before each write
+    
+    Returns:
+        dict: See CostSheetStreamWriter.finish()
+    """
+    writer = CostSheetStreamWriter(flush_rows)
+    try:
+        for chunk in chunks:
+            writer.feed(chunk)
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to generate cost sheet'
+        }
+    return writer.finish(filename, output, price_version)
+
+async def astream_cost_sheet(chunks: AsyncIterable[Union[str, bytes]], filename: Optional[str] = None,
+                             output=None, price_version: Optional[str] = None,
+                             flush_rows: int = STREAM_FLUSH_ROWS) -> Dict[str, Any]:
+    """
+    Async variant of stream_cost_sheet() for async model streams.
+    
+    Args:
+        chunks (async iterable): Response text or bytes as it arrives
+        filename (str, optional): File name, defaults to a timestamped name
+        output: Output target, see excel.generate_cost_sheet()
+        price_version (str, optional): Price snapshot the rows were priced with
+        flush_rows (int): Rows buffered before each write
+    
+    Returns:
+        dict: See CostSheetStreamWriter.finish()
+    """
+    writer = CostSheetStreamWriter(flush_rows)
+    try:
+        async for chunk in chunks:
+            writer.feed(chunk)
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to generate cost sheet'
+        }
+    return writer.finish(filename, output, price_version)
@@ -0,0 +1,171 @@
+"""
+EC - AI Cost Estimation System
+Style Registry Module
+
+Declares every distinct cost-sheet cell style once, keyed by its role,
+and registers each one at most once per workbook as a NamedStyle.
+"""
+
+from weakref import WeakKeyDictionary
+from typing import Dict, Any, Optional
+
+from openpyxl.styles import NamedStyle, Font, PatternFill, Border, Side, Alignment
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+from config import Config
+
+# Column roles for data cells
+NUMBER_COLUMNS = Config.NUMERIC_COLUMNS
+TEXT_COLUMNS = ['Description', 'Component']
+
+# Number format shared by dimensions, quantities and prices
+NUMBER_FORMAT = '#,##0.00'
+
+# Prefix for the named styles written into the workbook
+STYLE_PREFIX = 'cost_sheet_'
+
+# Style definitions as (cache key, definitions); see get_style_definitions()
+_definitions_cache = None
+
+# Registry per workbook, released together with the workbook
+_registries = WeakKeyDictionary()
+
+def build_style_definitions(template_config: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Builds the attributes of every cost-sheet style role.
+    
+    Args:
+        template_config (dict): Excel template configuration
+    
+    Returns:
+        dict: NamedStyle keyword arguments keyed by role
+    """
+    font_family = template_config['font_family']
+    
+    # Font configurations
+    title_font = Font(name=font_family, size=template_config['title_font_size'], bold=True)
+    header_font = Font(name=font_family, size=template_config['header_font_size'], bold=True)
+    
+    # Fill configurations
+    total_fill = PatternFill(start_color='808080', end_color='808080', fill_type='solid')
+    
+    # Border configuration
+    thin_border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    
+    return {
+        'title': {'font': title_font, 'border': thin_border},
+        'header': {'font': header_font, 'border': thin_border},
+        'number': {'font': DEFAULT_FONT, 'border': DEFAULT_BORDER, 'number_format': NUMBER_FORMAT},
+        'text': {
+            'font': DEFAULT_FONT,
+            'border': DEFAULT_BORDER,
+            'alignment': Alignment(wrap_text=True, vertical='top')
+        },
+        'total': {
+            'font': header_font,
+            'fill': total_fill,
+            'border': thin_border,
+            'number_format': NUMBER_FORMAT
+        }
+    }
+
+def get_style_definitions() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the style definitions, building them once per process.
+    
+    The cache is keyed on the contents of Config.EXCEL_TEMPLATE, so font
+    changes there are picked up automatically.
+    
+    Returns:
+        dict: NamedStyle keyword arguments keyed by role
+    """
+    global _definitions_cache
+    
+    key = tuple(sorted(Config.EXCEL_TEMPLATE.items()))
+    cache = _definitions_cache
+    if cache is None or cache[0] != key:
+        cache = (key, build_style_definitions(Config.EXCEL_TEMPLATE))
+        _definitions_cache = cache
+    
+    return cache[1]
+
+def get_column_role(col_name: str) -> Optional[str]:
+    """
+    Maps a data column to its style role.
+    
+    Args:
+        col_name (str): Column name
+    
+    Returns:
+        str: 'number', 'text' or None for unstyled columns
+    """
+    if col_name in NUMBER_COLUMNS:
+        return 'number'
+    if col_name in TEXT_COLUMNS:
+        return 'text'
+    return None
+
+class StyleRegistry:
+    """
+    Registers cost-sheet styles on a workbook the first time a role is used.
+    """
+    
+    def __init__(self, wb):
+        """
+        Args:
+            wb: openpyxl workbook (regular or write-only)
+        """
+        self.wb = wb
+        self.created = 0
+        self._names = {}
+    
+    def name(self, role: str) -> str:
+        """
+        Returns the named style for a role, registering it if needed.
+        
+        Args:
+            role (str): Style role, e.g. 'header' or 'number'
+        
+        Returns:
+            str: Name of the workbook named style
+        """
+        name = self._names.get(role)
+        if name is None:
+            name = STYLE_PREFIX + role
+            if name not in self.wb.named_styles:
+                self.wb.add_named_style(NamedStyle(name=name, **get_style_definitions()[role]))
+                self.created += 1
+            self._names[role] = name
+        return name
+    
+    def apply(self, cell, role: str):
+        """
+        Applies a role's named style to a cell.
+        
+        Args:
+            cell: openpyxl cell object (regular or write-only)
+            role (str): Style role
+        """
+        cell.style = self.name(role)
+
+def get_style_registry(wb) -> StyleRegistry:
+    """
+    Returns the style registry of a workbook, creating it on first use.
+    
+    Args:
+        wb: openpyxl workbook
+    
+    Returns:
+        StyleRegistry: Registry bound to the workbook
+    """
+    registry = _registries.get(wb)
+    if registry is None:
+        registry = StyleRegistry(wb)
+        _registries[wb] = registry
+    return registry
@@ -0,0 +1,169 @@
+"""
+EC - AI Cost Estimation System
+Columnar Table Module
+
+Holds AI-analyzed rows as one array per column so the processing stages
+and the Excel writers work on whole columns instead of per-row dicts.
+"""
+
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from compact import decode_values
+from config import Config
+
+def parse_number(value: Any) -> float:
+    """
+    Converts a cell value to float.
+    
+    Args:
+        value (any): Raw value from AI analysis
+    
+    Returns:
+        float: Parsed value, NaN when it is not a number
+    """
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return math.nan
+
+class CostTable:
+    """
+    Column-oriented container for cost-sheet rows.
+    
+    Numeric columns (Config.NUMERIC_COLUMNS) are float64 arrays with NaN
+    for missing values; any other column is a plain list. Unparseable
+    text found in a numeric column is kept aside so it is written back
+    unchanged instead of being lost.
+    """
+    
+    def __init__(self, columns: List[str], data: Dict[str, Any], length: int,
+                 text: Dict[str, Dict[int, Any]] = None):
+        """
+        Args:
+            columns (list): Column names in sheet order
+            data (dict): Column values keyed by column name
+            length (int): Number of rows
+            text (dict, optional): Raw text of unparseable numeric cells,
+                as {column: {row index: value}}
+        """
+        self.columns = list(columns)
+        self.data = data
+        self.length = length
+        self.text = text or {}
+    
+    @classmethod
+    def from_rows(cls, columns: List[str], rows: Iterable[List[Any]],
+                  dictionaries: Optional[Dict[str, List[Any]]] = None) -> 'CostTable':
+        """
+        Builds the table from positional AI rows in one pass per column.
+        
+        Args:
+            columns (list): Column headers from AI analysis
+            rows (iterable): Data rows from AI analysis
+            dictionaries (dict, optional): Distinct values of
+                dictionary-coded columns, see compact.py
+        
+        Returns:
+            CostTable: Columnar table, missing cells filled with '-'
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        data = {}
+        text = {}
+        
+        for i, col in enumerate(columns):
+            values = [row[i] if i < len(row) else '-' for row in rows]
+            if dictionaries and col in dictionaries:
+                values = decode_values(values, dictionaries[col])
+            if col not in Config.NUMERIC_COLUMNS:
+                data[col] = values
+                continue
+            
+            numbers = np.fromiter((parse_number(v) for v in values), dtype=np.float64, count=len(values))
+            data[col] = numbers
+            text[col] = {
+                j: values[j] for j in np.flatnonzero(np.isnan(numbers)).tolist()
+                if values[j] != '-'
+            }
+        
+        return cls(columns, data, len(rows), text)
+    
+    def __len__(self) -> int:
+        return self.length
+    
+    def __contains__(self, col: str) -> bool:
+        return col in self.data
+    
+    def __getitem__(self, col: str):
+        return self.data[col]
+    
+    def __setitem__(self, col: str, values):
+        self.data[col] = values
+    
+    def is_numeric(self, col: str) -> bool:
+        """
+        Tells whether a column is stored as a float array.
+        
+        Args:
+            col (str): Column name
+        
+        Returns:
+            bool: True for float64 columns
+        """
+        return isinstance(self.data.get(col), np.ndarray)
+    
+    def cell_values(self, col: str) -> List[Any]:
+        """
+        Returns a column as the values written to the worksheet.
+        
+        NaN becomes the original text of the cell, or '-' when there was
+        none.
+        
+        Args:
+            col (str): Column name
+        
+        Returns:
+            list: Cell values in row order
+        """
+        if col not in self.data:
+            return ['-'] * self.length
+        if not self.is_numeric(col):
+            return self.data[col]
+        
+        values = self.data[col].tolist()
+        text = self.text.get(col, {})
+        for i in np.flatnonzero(np.isnan(self.data[col])).tolist():
+            values[i] = text.get(i, '-')
+        return values
+    
+    def iter_rows(self) -> Iterator[List[Any]]:
+        """
+        Yields each row as worksheet values in column order.
+        
+        Yields:
+            list: One value per column
+        """
+        for values in zip(*(self.cell_values(col) for col in self.columns)):
+            yield list(values)
+    
+    def row(self, index: int) -> Dict[str, Any]:
+        """
+        Returns one row keyed by column name.
+        
+        Args:
+            index (int): Row index
+        
+        Returns:
+            dict: Row values as written to the worksheet
+        """
+        row_data = {}
+        for col in self.columns:
+            value = self.data[col][index]
+            if self.is_numeric(col):
+                value = float(value)
+                if math.isnan(value):
+                    value = self.text.get(col, {}).get(index, '-')
+            row_data[col] = value
+        return row_data
@@ -0,0 +1,69 @@
+"""
+EC - AI Cost Estimation System
+Pipeline Tests
+"""
+
+import io
+
+import pytest
+
+from analysis import MockVisionModel
+from config import Config
+from hybrid_pricing import MockPricingModel
+from pipeline import LocalStorage, PipelineServices, run_cost_estimation
+
+Image = pytest.importorskip('PIL.Image')
+ImageDraw = pytest.importorskip('PIL.ImageDraw')
+
+PRICES = (
+    "Item Code,Component,Description,Unit,Price per unit\n"
+    "100-01-01,Flooring,Carpet flooring,sqm,150.00\n"
+    "103-01-01,Electrical,Spotlight LED,unit,450\n"
+)
+
+
+def drawing(background):
+    image = Image.new('RGB', (800, 600), background)
+    ImageDraw.Draw(image).rectangle((50, 50, 700, 500), outline='black', width=5)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class FailingVisionModel(MockVisionModel):
+    """Fails on red drawings, analyzes the rest."""
+    
+    async def analyze(self, data):
+        with Image.open(io.BytesIO(data)) as image:
+            red, green, _ = image.convert('RGB').getpixel((0, 0))
+        if red > 200 and green < 50:
+            raise RuntimeError('vision model unavailable')
+        return await super().analyze(data)
+
+
+@pytest.fixture
+def services(tmp_path):
+    price_path = tmp_path / 'prices.csv'
+    price_path.write_text(PRICES)
+    return PipelineServices(FailingVisionModel(), MockPricingModel(),
+                            storage=LocalStorage(str(tmp_path / 'out')), price_path=str(price_path))
+
+
+def test_skipped_uploads_are_listed_in_the_answer(services):
+    result = run_cost_estimation([drawing('white'), b'not an image', drawing('red')], services)
+    
+    assert result['success'], result.get('error')
+    skipped = result['outputs']['ocr']['skipped']
+    assert sorted(skipped) == [1, 2]
+    assert 'Unreadable image' in skipped[1]
+    assert 'vision model unavailable' in skipped[2]
+    assert 'Upload 2 not estimated: Unreadable image' in result['answer']
+    assert 'Upload 3 not estimated: Analysis failed' in result['answer']
+
+
+def test_partial_ocr_fails_when_not_allowed(services, monkeypatch):
+    monkeypatch.setitem(Config.PIPELINE, 'allow_partial_ocr', False)
+    result = run_cost_estimation([drawing('white'), b'not an image', drawing('red')], services)
+    
+    assert not result['success']
+    assert 'upload 2' in result['error'] and 'upload 3' in result['error']
@@ -0,0 +1,63 @@
+"""
+EC - AI Cost Estimation System
+Utils Tests
+"""
+
+import itertools
+import math
+import warnings
+
+import numpy as np
+
+from utils import (
+    calculate_quantity, parse_dimension_column, process_dimensions_batch, validate_dimensions
+)
+
+VALUES = ['2.5', '0', '-', '', None, 'nan', 'inf', '-2', 'abc', 3]
+COMPONENTS = ['Flooring', 'Structure', 'Graphic']
+UNITS = ['sqm', 'unit', 'm']
+
+
+def scalar_quantity(component, width, length, height, unit):
+    dims = validate_dimensions(width, length, height)
+    try:
+        return calculate_quantity(component, dims['width'], dims['length'], dims['height'], unit)
+    except TypeError:
+        return math.nan
+
+
+def same(a, b):
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+
+def test_parse_dimension_column_matches_validate_dimensions():
+    parsed = parse_dimension_column(VALUES)
+    for i, value in enumerate(VALUES):
+        dims = validate_dimensions(value, '1')
+        if dims['width'] is None:
+            assert parsed['missing'][i] or parsed['invalid'][i]
+        else:
+            assert not parsed['missing'][i]
+            assert same(parsed['values'][i], dims['width'])
+        assert parsed['invalid'][i] == (not dims['valid'])
+
+
+def test_process_dimensions_batch_matches_scalar():
+    grid = list(itertools.product(COMPONENTS, VALUES, VALUES, VALUES, UNITS))
+    components, widths, lengths, heights, units = (list(column) for column in zip(*grid))
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        result = process_dimensions_batch(components, widths, lengths, heights, units)
+    
+    for i, row in enumerate(grid):
+        assert same(result['quantity'][i], scalar_quantity(*row)), row
+
+
+def test_positive_only_matches_excel_validation():
+    result = process_dimensions_batch(['Structure'] * 4, ['2', '-1', '0', 'nan'], ['3'] * 4,
+                                      ['-2', '1', '1', '1'], positive_only=True)
+    assert np.isnan(result['width'][1:]).all()
+    assert result['missing']['width'].tolist() == [False, True, True, True]
+    assert result['quantity'][0] == 6.0
+    assert result['valid'].all()
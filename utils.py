@@ -6,14 +6,43 @@ Helper functions and utilities for the cost estimation system.
 
 import re
 import json
-from typing import Dict, List, Any, Optional
+import unicodedata
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 from datetime import datetime
 import logging
 
+import numpy as np
+
+from compact import dictionary_errors, expand_response
+from config import Config
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# list_id format: XXX-XX-XX (type code, component code, item number)
+LIST_ID_PATTERN = r'^\d{3}-\d{2}-\d{2}$'
+
+# Section for lines whose list_id has no known type code
+OTHER_SECTION = 'other'
+
+def list_id_pattern(type_codes: Optional[Sequence[str]] = None) -> str:
+    """
+    Builds the list_id regular expression, optionally restricted to
+    known type codes.
+    
+    Args:
+        type_codes (sequence, optional): Allowed type codes, e.g.
+            Config.COMPONENT_TYPES; any three digits when omitted
+    
+    Returns:
+        str: Anchored pattern
+    """
+    if not type_codes:
+        return LIST_ID_PATTERN
+    codes = '|'.join(re.escape(code) for code in type_codes)
+    return rf'^(?:{codes})-\d{{2}}-\d{{2}}$'
+
 def validate_list_id(list_id: str) -> bool:
     """
     Validates the format of list_id.
@@ -25,8 +54,7 @@ def validate_list_id(list_id: str) -> bool:
         bool: True if valid, False otherwise
     """
     # Expected format: XXX-XX-XX (e.g., 100-01-01)
-    pattern = r'^\d{3}-\d{2}-\d{2}$'
-    return bool(re.match(pattern, list_id))
+    return bool(re.match(LIST_ID_PATTERN, list_id))
 
 def parse_list_id(list_id: str) -> Dict[str, str]:
     """
@@ -48,6 +76,38 @@ def parse_list_id(list_id: str) -> Dict[str, str]:
         'item_number': parts[2]
     }
 
+def list_id_sort_key(list_id: Any) -> Tuple:
+    """
+    Orders rows by type code, component code and item number; rows
+    without a valid list_id go last.
+    
+    Args:
+        list_id (any): Row list_id
+    
+    Returns:
+        tuple: Sort key
+    """
+    parts = parse_list_id(str(list_id))
+    if not parts:
+        return (1,)
+    return (0, parts['type_code'], parts['component_code'], parts['item_number'])
+
+def line_sections(list_ids: List[Any]) -> List[str]:
+    """
+    Maps every line to its Config.COMPONENT_TYPES code.
+    
+    Args:
+        list_ids (list): list_id of every line
+    
+    Returns:
+        list: Type code per line, OTHER_SECTION when unknown
+    """
+    sections = []
+    for list_id in list_ids:
+        type_code = parse_list_id(str(list_id)).get('type_code')
+        sections.append(type_code if type_code in Config.COMPONENT_TYPES else OTHER_SECTION)
+    return sections
+
 def calculate_surface_area(width: float, length: float, height: float = None) -> float:
     """
     Calculates surface area based on dimensions.
@@ -137,6 +197,195 @@ def calculate_quantity(component_type: str, width: float, length: float,
     else:
         return 0.0
 
+def parse_dimension_column(values: Sequence[Any]) -> Dict[str, np.ndarray]:
+    """
+    Converts a column of dimension strings to floats in one pass.
+    
+    Follows validate_dimensions(): falsy values (None, '', 0) and '-'
+    are missing, anything float() rejects is invalid, and text such as
+    'nan' or 'inf' is a present value. The conversion runs as one
+    object-array cast; cells are only visited one by one to locate
+    invalid values when the cast fails.
+    
+    Args:
+        values (sequence): Raw dimension values
+        
+    Returns:
+        dict: 'values' (float array, NaN when missing or invalid),
+        'missing' and 'invalid' (bool masks of missing values and of
+        values float() rejected)
+    """
+    count = len(values)
+    cells = np.empty(count, dtype=object)
+    cells[:] = list(values)
+    parsed = np.full(count, np.nan)
+    invalid = np.zeros(count, dtype=bool)
+    
+    missing = np.equal(cells, None) | np.equal(cells, '') | np.equal(cells, '-') | np.equal(cells, 0)
+    present = ~missing
+    try:
+        parsed[present] = cells[present].astype(np.float64)
+    except (ValueError, TypeError):
+        for i in np.flatnonzero(present).tolist():
+            try:
+                parsed[i] = float(cells[i])
+            except (ValueError, TypeError):
+                invalid[i] = True
+    
+    return {'values': parsed, 'missing': missing, 'invalid': invalid}
+
+def validate_dimensions_batch(widths: Sequence[Any], lengths: Sequence[Any],
+                              heights: Optional[Sequence[Any]] = None,
+                              positive_only: bool = False) -> Dict[str, Any]:
+    """
+    Validates and converts whole dimension columns at once.
+    
+    Batch counterpart of validate_dimensions(); values it would return as
+    None (missing or invalid) are NaN here and flagged in 'missing',
+    since a present value may be NaN too ('nan').
+    
+    Args:
+        widths (sequence): Width column
+        lengths (sequence): Length column
+        heights (sequence, optional): Height column
+        positive_only (bool): Treat values that are not > 0 (zero,
+            negative, NaN) as missing, like excel.validate_dimensions()
+        
+    Returns:
+        dict: Converted 'width', 'length' and 'height' arrays, their
+        'missing' masks by name, a 'valid' mask and 'errors' as
+        {row index: [messages]} for invalid rows
+    """
+    columns = {
+        'width': parse_dimension_column(widths),
+        'length': parse_dimension_column(lengths),
+        'height': parse_dimension_column(heights if heights is not None else [None] * len(widths))
+    }
+    raw = {'width': widths, 'length': lengths, 'height': heights}
+    
+    if positive_only:
+        for column in columns.values():
+            with np.errstate(invalid='ignore'):
+                dropped = ~column['missing'] & ~column['invalid'] & ~(column['values'] > 0)
+            column['values'][dropped] = np.nan
+            column['missing'] = column['missing'] | dropped
+    
+    result = {name: column['values'] for name, column in columns.items()}
+    result['missing'] = {name: column['missing'] | column['invalid'] for name, column in columns.items()}
+    invalid = columns['width']['invalid'] | columns['length']['invalid'] | columns['height']['invalid']
+    result['valid'] = ~invalid
+    
+    errors = {}
+    for name, column in columns.items():
+        for i in np.flatnonzero(column['invalid']).tolist():
+            errors.setdefault(i, []).append(f"Invalid {name}: {raw[name][i]}")
+    result['errors'] = dict(sorted(errors.items()))
+    
+    return result
+
+def calculate_surface_area_batch(widths: np.ndarray, lengths: np.ndarray,
+                                 heights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Calculates surface areas for whole dimension columns.
+    
+    Batch counterpart of calculate_surface_area(); rows whose height is
+    NaN use width × length.
+    
+    Args:
+        widths (array): Widths in meters
+        lengths (array): Lengths in meters
+        heights (array, optional): Heights in meters
+        
+    Returns:
+        array: Calculated surface areas
+    """
+    widths = np.asarray(widths, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.float64)
+    with np.errstate(invalid='ignore', over='ignore'):
+        floor_area = widths * lengths
+    if heights is None:
+        return floor_area
+    
+    perimeter = 2 * (widths + lengths)
+    heights = np.asarray(heights, dtype=np.float64)
+    with np.errstate(invalid='ignore', over='ignore'):
+        return np.where(np.isnan(heights), floor_area, perimeter * heights)
+
+def calculate_quantity_batch(component_types: Sequence[str], widths: np.ndarray,
+                             lengths: np.ndarray, heights: Optional[np.ndarray] = None,
+                             units: Any = 'sqm',
+                             height_missing: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Calculates quantities for whole columns at once.
+    
+    Batch counterpart of calculate_quantity(). A height listed in
+    height_missing, or zero, counts as no height; any other height,
+    NaN included, is used as calculate_quantity() would. Rows with a
+    missing width or length yield NaN for 'sqm'.
+    
+    Args:
+        component_types (sequence): Component type per row
+        widths (array): Widths in meters
+        lengths (array): Lengths in meters
+        heights (array, optional): Heights in meters
+        units (sequence or str): Unit per row, or one unit for all rows
+        height_missing (array, optional): Mask of rows without a height,
+            defaults to the NaN heights
+        
+    Returns:
+        array: Calculated quantities
+    """
+    widths = np.asarray(widths, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.float64)
+    count = len(widths)
+    if heights is None:
+        heights = np.full(count, np.nan)
+    heights = np.asarray(heights, dtype=np.float64)
+    units = np.asarray([units] * count if isinstance(units, str) else units, dtype=object)
+    
+    components = np.asarray(component_types, dtype=str)
+    is_flooring = np.char.find(components, 'Flooring') >= 0
+    is_structure = np.char.find(components, 'Structure') >= 0
+    if height_missing is None:
+        height_missing = np.isnan(heights)
+    has_height = ~height_missing & (heights != 0)
+    
+    # For walls/structures, calculate surface area
+    use_surface = ~is_flooring & is_structure & has_height
+    with np.errstate(invalid='ignore', over='ignore'):
+        surface = 2 * (widths + lengths) * heights
+        sqm = np.where(use_surface, surface, widths * lengths)
+    
+    return np.select([units == 'sqm', units == 'unit'], [sqm, 1.0], default=0.0)
+
+def process_dimensions_batch(component_types: Sequence[str], widths: Sequence[Any],
+                             lengths: Sequence[Any], heights: Optional[Sequence[Any]] = None,
+                             units: Any = 'sqm', positive_only: bool = False) -> Dict[str, Any]:
+    """
+    Validates dimension columns and calculates quantities in one pass.
+    
+    Per row this gives what validate_dimensions() followed by
+    calculate_quantity() gives, with NaN where the scalar calculation
+    would fail on a missing width or length.
+    
+    Args:
+        component_types (sequence): Component type per row
+        widths (sequence): Width column
+        lengths (sequence): Length column
+        heights (sequence, optional): Height column
+        units (sequence or str): Unit per row, or one unit for all rows
+        positive_only (bool): See validate_dimensions_batch()
+        
+    Returns:
+        dict: validate_dimensions_batch() result plus a 'quantity' array
+    """
+    result = validate_dimensions_batch(widths, lengths, heights, positive_only)
+    result['quantity'] = calculate_quantity_batch(
+        component_types, result['width'], result['length'], result['height'], units,
+        result['missing']['height']
+    )
+    return result
+
 def format_currency(amount: float) -> str:
     """
     Formats currency amount with proper formatting.
@@ -169,6 +418,25 @@ def sanitize_text(text: str) -> str:
     sanitized = re.sub(r'[<>"\']', '', str(text))
     return sanitized.strip()
 
+def normalize_text(text: Any) -> str:
+    """
+    Normalizes free text for matching (case, width, punctuation, spacing).
+    
+    Thai characters, including combining vowels and tone marks, are kept.
+    
+    Args:
+        text (any): Text to normalize
+        
+    Returns:
+        str: Normalized text, '' for empty input
+    """
+    if text is None:
+        return ''
+    
+    normalized = unicodedata.normalize('NFKC', str(text)).casefold()
+    normalized = re.sub(r'[^\w\u0E00-\u0E7F]+', ' ', normalized)
+    return normalized.replace('_', ' ').strip()
+
 def generate_timestamp() -> str:
     """
     Generates a timestamp string for file naming.
@@ -178,12 +446,20 @@ def generate_timestamp() -> str:
     """
     return datetime.now().strftime('%Y%m%d_%H%M%S')
 
-def validate_ai_response(response_data: Dict[str, Any]) -> Dict[str, Any]:
+def validate_ai_response(response_data: Dict[str, Any], strict: bool = False,
+                         fail_fast: bool = False) -> Dict[str, Any]:
     """
     Validates AI response data structure.
     
+    Rows may be row objects or positional arrays; a compact response
+    may dictionary-code columns under 'dictionaries', see compact.py.
+    
     Args:
         response_data (dict): AI response data
+        strict (bool): Also check every row against the schema built from
+            Config (list_id format, units, numeric values), see schema.py;
+            row errors are listed under 'row_errors'
+        fail_fast (bool): With strict, stop at the first row error
         
     Returns:
         dict: Validation result
@@ -221,8 +497,24 @@ def validate_ai_response(response_data: Dict[str, Any]) -> Dict[str, Any]:
         else:
             # Check each row
             for i, row in enumerate(response_data['rows']):
-                if not isinstance(row, dict):
-                    result['warnings'].append(f"Row {i} is not a dictionary")
+                if not isinstance(row, (dict, list)):
+                    result['warnings'].append(f"Row {i} is not a dictionary or list")
+    
+    # Validate dictionaries of a compact response
+    errors = dictionary_errors(response_data)
+    if errors:
+        result['valid'] = False
+        result['errors'].extend(errors)
+    
+    if strict and result['valid']:
+        from schema import validate_response_schema
+        
+        if 'dictionaries' in response_data:
+            response_data = expand_response(response_data)
+        checked = validate_response_schema(response_data, fail_fast=fail_fast)
+        result['valid'] = checked['valid']
+        result['errors'].extend(checked['errors'])
+        result['row_errors'] = checked['row_errors']
     
     return result
 